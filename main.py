@@ -5,18 +5,37 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from src.api.v1.api import router as v1_router
 from src.db.session import Base, engine
+from src.db.schema import add_missing_columns
 import src.db.models as models
 from src.core.config import cors as cors_config
+from src.ai.client_registry import client_registry
+from src.ai.rag.compaction import get_compactor
+from src.ai.rag.vector_store import get_async_vector_store
+from src.services.warmup import start_warmup
+from src.utils.executors import shutdown_executors
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理：启动时创建表"""
-    # 启动时：使用异步引擎创建所有表
+    # 启动时：使用异步引擎创建所有表，并为已有的表补齐新增的列（create_all 不会修改已有的表）
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        added = await conn.run_sync(add_missing_columns)
+    if added:
+        print(f"Added columns: {', '.join(added)}")
+    # 启动向量删除标记的后台清除任务
+    compactor = get_compactor()
+    compactor.start()
+    # 后台预热向量索引和模型客户端，完成前 /api/v1/health/ready 返回 503
+    warmup_task = start_warmup()
     yield
-    # 关闭时：可以在这里添加清理逻辑
+    # 关闭时：停止后台任务并释放阻塞任务线程池
+    warmup_task.cancel()
+    await compactor.stop()
+    await get_async_vector_store().aclose()
+    await client_registry.aclose()
+    shutdown_executors()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -3,7 +3,7 @@ AI 核心能力层
 
 包含：
 - llm: 大语言模型服务
-- embedding: 向量嵌入服务（预留）
+- embedding: 向量嵌入服务
 - rag: RAG 相关功能
 - agent: 智能体框架（预留）
 """
@@ -0,0 +1,186 @@
+"""
+模型客户端注册表 - 在应用范围内复用 Embedding / LLM 客户端
+
+按 (类型, api_key, base_url, model) 缓存客户端，复用其 HTTP 连接池和 keep-alive 连接，
+避免每个请求都重新握手。空闲超时的条目会被淘汰，模型配置变更时按凭据失效。
+被淘汰 / 失效的客户端延迟 AI_CLIENT_CLOSE_DELAY 秒后关闭连接池（正在使用它的请求可以先完成）。
+"""
+import asyncio
+import inspect
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.core.config import ai_client as ai_client_config
+
+
+ClientKey = Tuple[str, Optional[str], Optional[str], Optional[str]]
+
+
+async def _close_client(client: Any) -> None:
+    """
+    关闭客户端持有的连接池
+
+    ChatOpenAI 关闭其专属的 http_async_client，AsyncOpenAI 等带 close() 的客户端直接关闭；
+    不持有连接的对象（如 RAGService，其 Embedding 客户端单独登记在注册表中）跳过。
+    """
+    try:
+        http_client = getattr(client, "http_async_client", None)
+        if http_client is not None:
+            await http_client.aclose()
+            return
+        close = getattr(client, "close", None)
+        if close is not None:
+            result = close()
+            if inspect.isawaitable(result):
+                await result
+    except Exception as e:
+        print(f"Failed to close client {type(client).__name__}: {e}")
+
+
+class ClientRegistry:
+    """客户端注册表"""
+
+    def __init__(self, idle_ttl: float, max_entries: int, close_delay: float):
+        """
+        初始化注册表
+
+        Args:
+            idle_ttl: 空闲超时时间（秒），超时未使用的客户端会被淘汰
+            max_entries: 最大条目数，超出时淘汰最久未使用的客户端
+            close_delay: 被移除的客户端延迟关闭的时间（秒）
+        """
+        self.idle_ttl = idle_ttl
+        self.max_entries = max_entries
+        self.close_delay = close_delay
+        self._entries: Dict[ClientKey, Tuple[Any, float]] = {}
+        # 已移除、等待关闭的客户端: (客户端, 移除时间)
+        self._retired: List[Tuple[Any, float]] = []
+        self._close_task: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+
+    def get_or_create(
+        self,
+        kind: str,
+        api_key: Optional[str],
+        base_url: Optional[str],
+        model: Optional[str],
+        factory: Callable[[], Any],
+    ) -> Any:
+        """
+        获取客户端，不存在时调用 factory 创建
+
+        Args:
+            kind: 客户端类型（如 embedding / chat / rag）
+            api_key: API 密钥
+            base_url: API 基础 URL
+            model: 模型名称
+            factory: 创建客户端的函数
+        """
+        key = (kind, api_key, base_url, model)
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                client = entry[0]
+            else:
+                client = factory()
+                if len(self._entries) >= self.max_entries:
+                    oldest = min(self._entries, key=lambda k: self._entries[k][1])
+                    self._retire(oldest, now)
+            self._entries[key] = (client, now)
+        self._schedule_close()
+        return client
+
+    def invalidate(self, api_key: Optional[str], base_url: Optional[str]) -> int:
+        """
+        使指定凭据的所有客户端失效（模型配置更新 / 删除时调用）
+
+        正在使用旧客户端的请求不受影响，旧客户端在 close_delay 秒后关闭。
+
+        Returns:
+            被移除的条目数
+        """
+        with self._lock:
+            keys = [
+                key for key in self._entries
+                if key[1] == api_key and key[2] == base_url
+            ]
+            now = time.monotonic()
+            for key in keys:
+                self._retire(key, now)
+        self._schedule_close()
+        return len(keys)
+
+    def _evict_idle(self, now: float) -> None:
+        expired = [
+            key for key, (_, last_used) in self._entries.items()
+            if now - last_used > self.idle_ttl
+        ]
+        for key in expired:
+            self._retire(key, now)
+
+    def _retire(self, key: ClientKey, now: float) -> None:
+        """移除条目并登记为待关闭（调用方持有锁）"""
+        client, _ = self._entries.pop(key)
+        self._retired.append((client, now))
+
+    def _schedule_close(self) -> None:
+        """
+        在事件循环中启动延迟关闭任务
+
+        不在事件循环线程中调用时（如通过 to_thread 创建服务）不启动，留到下一次在事件循环中调用时处理。
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        with self._lock:
+            if self._retired and (self._close_task is None or self._close_task.done()):
+                self._close_task = loop.create_task(self._close_retired())
+
+    async def _close_retired(self) -> None:
+        """关闭移除时间超过 close_delay 的客户端，直到没有待关闭的客户端"""
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                due = [client for client, retired_at in self._retired if now - retired_at >= self.close_delay]
+                self._retired = [
+                    (client, retired_at) for client, retired_at in self._retired
+                    if now - retired_at < self.close_delay
+                ]
+                wait = min((self.close_delay - (now - t) for _, t in self._retired), default=None)
+            for client in due:
+                await _close_client(client)
+            if wait is None:
+                return
+            await asyncio.sleep(wait)
+
+    async def aclose(self) -> None:
+        """关闭所有客户端（应用退出时调用）"""
+        with self._lock:
+            clients = [client for client, _ in self._entries.values()]
+            clients += [client for client, _ in self._retired]
+            self._entries.clear()
+            self._retired.clear()
+        if self._close_task is not None:
+            self._close_task.cancel()
+        for client in clients:
+            await _close_client(client)
+
+    def stats(self) -> dict:
+        """返回注册表统计信息"""
+        with self._lock:
+            kinds: Dict[str, int] = {}
+            for key in self._entries:
+                kinds[key[0]] = kinds.get(key[0], 0) + 1
+        return {"size": sum(kinds.values()), "by_kind": kinds}
+
+
+# 全局注册表
+client_registry = ClientRegistry(
+    idle_ttl=ai_client_config.idle_ttl,
+    max_entries=ai_client_config.max_entries,
+    close_delay=ai_client_config.close_delay,
+)
@@ -1,6 +1,27 @@
 from .base import BaseEmbedding
+from .cache import (
+    EmbeddingCache,
+    CachedEmbedding,
+    QueryVectorCache,
+    get_embedding_cache,
+    get_query_vector_cache,
+)
+from .local import HashingEmbedding, SentenceTransformerEmbedding
+from .rate_limiter import AdaptiveRateLimiter, get_rate_limiter, get_rate_limiter_stats
 
-__all__ = ["BaseEmbedding"]
+__all__ = [
+    "BaseEmbedding",
+    "EmbeddingCache",
+    "CachedEmbedding",
+    "QueryVectorCache",
+    "get_embedding_cache",
+    "get_query_vector_cache",
+    "HashingEmbedding",
+    "SentenceTransformerEmbedding",
+    "AdaptiveRateLimiter",
+    "get_rate_limiter",
+    "get_rate_limiter_stats",
+]
 
 
 
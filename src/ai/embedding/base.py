@@ -1,21 +1,25 @@
 from abc import ABC, abstractmethod
 from typing import List
 
+import numpy as np
+
 
 class BaseEmbedding(ABC):
-    """Embedding 抽象基类（预留）"""
+    """
+    Embedding 抽象基类
+    
+    向量统一使用 float32 的 np.ndarray 表示，批量结果为连续的 (n, dim) 矩阵。
+    """
+    
+    # 模型名称，用于区分不同模型产生的向量（如缓存键）
+    model_name: str
     
     @abstractmethod
-    async def embed_text(self, text: str) -> List[float]:
-        """将单个文本转换为向量"""
+    async def embed_text(self, text: str) -> np.ndarray:
+        """将单个文本转换为 (dim,) 向量"""
         pass
     
     @abstractmethod
-    async def embed_texts(self, texts: List[str]) -> List[List[float]]:
-        """批量将文本转换为向量"""
+    async def embed_texts(self, texts: List[str]) -> np.ndarray:
+        """批量将文本转换为 (n, dim) 矩阵"""
         pass
-
-
-
-
-
@@ -0,0 +1,246 @@
+"""
+Embedding 缓存 - 以 (模型名, 规范化文本哈希) 为键的本地持久化向量缓存
+"""
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.ai.embedding.base import BaseEmbedding
+from src.core.config import embedding as embedding_config
+
+
+def normalize_text(text: str) -> str:
+    """规范化文本：NFKC 归一化并折叠空白，避免仅格式不同的文本重复嵌入"""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def text_hash(text: str) -> str:
+    """计算规范化文本的 SHA-256 哈希"""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    基于 SQLite 的 Embedding 缓存
+
+    - 向量以 float32 二进制存储，读取时直接映射为 np.ndarray
+    - 超过 max_entries 时按最近访问时间淘汰（LRU）
+    - 记录命中 / 未命中次数
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        """
+        初始化缓存
+
+        Args:
+            path: SQLite 数据库文件路径
+            max_entries: 最大缓存条数
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings (last_access)"
+        )
+        self._conn.commit()
+
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+        """批量查询缓存，返回命中的 {hash: vector}，并刷新命中条目的访问时间"""
+        if not hashes:
+            return {}
+
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            # SQLite 单条语句的参数数量有限，分段查询
+            for i in range(0, len(hashes), 500):
+                part = hashes[i:i + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *part],
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, key) for key in found],
+                )
+                self._conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(set(hashes)) - len(found)
+        return found
+
+    def put_many(self, model: str, items: Dict[str, np.ndarray]) -> None:
+        """批量写入缓存，超出容量时淘汰最久未访问的条目"""
+        if not items:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (model, key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                    for key, vector in items.items()
+                ],
+            )
+            overflow = self._count() - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN ("
+                    "SELECT rowid FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                    (overflow,),
+                )
+            self._conn.commit()
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def stats(self) -> dict:
+        """返回缓存统计信息"""
+        with self._lock:
+            size = self._count()
+        total = self.hits + self.misses
+        return {
+            "size": size,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class CachedEmbedding(BaseEmbedding):
+    """带缓存的 Embedding：先查缓存，只对未命中的文本调用底层服务"""
+
+    def __init__(self, embedding: BaseEmbedding, cache: EmbeddingCache):
+        self._embedding = embedding
+        self._cache = cache
+
+    @property
+    def model_name(self) -> str:
+        return self._embedding.model_name
+
+    async def embed_text(self, text: str) -> np.ndarray:
+        vectors = await self.embed_texts([text])
+        return vectors[0]
+
+    async def embed_texts(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        hashes = [text_hash(text) for text in texts]
+        # SQLite 读写是阻塞操作，放到线程中执行
+        cached = await asyncio.to_thread(self._cache.get_many, self.model_name, hashes)
+
+        # 未命中的文本去重后再嵌入
+        missing: Dict[str, str] = {}
+        for key, text in zip(hashes, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        if missing:
+            vectors = await self._embedding.embed_texts(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            await asyncio.to_thread(self._cache.put_many, self.model_name, fresh)
+            cached.update(fresh)
+
+        return np.vstack([cached[key] for key in hashes])
+
+
+class QueryVectorCache:
+    """
+    进程内查询向量缓存（LRU + TTL）
+
+    用于高频重复的问题（如"这个文件讲了什么"），命中时无需任何 I/O。
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        """
+        初始化缓存
+
+        Args:
+            max_size: 最大条目数
+            ttl: 条目存活时间（秒）
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items: "OrderedDict[Tuple[str, str], Tuple[float, np.ndarray]]" = OrderedDict()
+
+    def get(self, model: str, query: str) -> Optional[np.ndarray]:
+        """查询缓存，过期条目视为未命中"""
+        key = (model, normalize_text(query))
+        item = self._items.get(key)
+        if item is None:
+            return None
+        expires_at, vector = item
+        if expires_at < time.monotonic():
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return vector
+
+    def put(self, model: str, query: str, vector: np.ndarray) -> None:
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        key = (model, normalize_text(query))
+        self._items[key] = (time.monotonic() + self.ttl, vector)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+_query_vector_cache: Optional[QueryVectorCache] = None
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """获取全局 Embedding 缓存实例，未启用时返回 None"""
+    global _embedding_cache
+    if not embedding_config.cache_enabled:
+        return None
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache(
+            path=embedding_config.cache_path,
+            max_entries=embedding_config.cache_max_entries,
+        )
+    return _embedding_cache
+
+
+def get_query_vector_cache() -> QueryVectorCache:
+    """获取全局查询向量缓存实例"""
+    global _query_vector_cache
+    if _query_vector_cache is None:
+        _query_vector_cache = QueryVectorCache(
+            max_size=embedding_config.query_cache_size,
+            ttl=embedding_config.query_cache_ttl,
+        )
+    return _query_vector_cache
@@ -0,0 +1,121 @@
+"""
+本地 Embedding 后端 - 在进程内用 CPU 计算向量，无需网络请求
+
+- HashingEmbedding: 基于字符 n-gram 特征哈希的确定性向量，无需模型文件，适合测试与离线压测
+- SentenceTransformerEmbedding: 基于 sentence-transformers 的本地模型（可选依赖）
+"""
+import asyncio
+import hashlib
+from typing import Dict, List
+
+import numpy as np
+
+from src.ai.embedding.base import BaseEmbedding
+
+
+class HashingEmbedding(BaseEmbedding):
+    """
+    特征哈希 Embedding
+
+    将文本的字符 1~3-gram 哈希到固定维度并做 L2 归一化。相同文本总是得到相同向量，
+    字面相近的文本余弦相似度较高，中文无需分词。
+    """
+
+    def __init__(self, dimension: int = 512, ngram_range: tuple = (1, 3)):
+        """
+        初始化哈希 Embedding
+
+        Args:
+            dimension: 向量维度
+            ngram_range: 字符 n-gram 的长度范围（闭区间）
+        """
+        self.dimension = dimension
+        self.ngram_range = ngram_range
+        self.model_name = f"hashing-{dimension}"
+
+    def _bucket(self, token: str) -> tuple:
+        """返回 token 对应的维度下标和符号（使用稳定哈希，不受 PYTHONHASHSEED 影响）"""
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        return value % self.dimension, 1.0 if (value >> 63) & 1 else -1.0
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        text = " ".join(text.lower().split())
+        low, high = self.ngram_range
+        buckets = [
+            self._bucket(text[i:i + n])
+            for n in range(low, high + 1)
+            for i in range(len(text) - n + 1)
+        ]
+        if buckets:
+            indices, signs = zip(*buckets)
+            np.add.at(vector, np.fromiter(indices, dtype=np.int64), np.fromiter(signs, dtype=np.float32))
+
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return vector
+        return vector / norm
+
+    async def embed_text(self, text: str) -> np.ndarray:
+        return self._embed(text)
+
+    async def embed_texts(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        # 大批量时计算量不可忽略，放到线程中避免阻塞事件循环
+        return await asyncio.to_thread(lambda: np.vstack([self._embed(text) for text in texts]))
+
+
+class SentenceTransformerEmbedding(BaseEmbedding):
+    """基于 sentence-transformers 的本地模型 Embedding（CPU 推理）"""
+
+    # 同一模型在进程内只加载一次
+    _models: Dict[tuple, object] = {}
+
+    def __init__(self, model_name: str, device: str = "cpu", batch_size: int = 32):
+        """
+        初始化本地模型 Embedding
+
+        Args:
+            model_name: 模型名称或本地路径（如 BAAI/bge-small-zh-v1.5）
+            device: 推理设备
+            batch_size: 推理批大小
+        """
+        self.model_name = model_name
+        self.device = device
+        self.batch_size = batch_size
+
+    def _get_model(self):
+        key = (self.model_name, self.device)
+        model = self._models.get(key)
+        if model is None:
+            try:
+                from sentence_transformers import SentenceTransformer
+            except ImportError as e:
+                raise ImportError(
+                    "使用 sentence_transformers 后端需要安装 sentence-transformers: "
+                    "uv add sentence-transformers"
+                ) from e
+            model = SentenceTransformer(self.model_name, device=self.device)
+            self._models[key] = model
+        return model
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        vectors = self._get_model().encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+        )
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+
+    async def embed_text(self, text: str) -> np.ndarray:
+        vectors = await self.embed_texts([text])
+        return vectors[0]
+
+    async def embed_texts(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        return await asyncio.to_thread(self._encode, texts)
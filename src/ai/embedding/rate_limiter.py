@@ -0,0 +1,126 @@
+"""
+自适应限流器 - 按 API Key 对 Embedding 请求做令牌桶限流
+
+采用 AIMD 策略调整速率：请求成功时线性提高速率，遇到 429 时成倍降低速率，
+从而在配额允许范围内尽可能提高吞吐，同时避免大批量上传时被限流导致文件处理失败。
+"""
+import asyncio
+import time
+from typing import Dict, Optional
+
+from src.core.config import embedding as embedding_config
+
+
+class AdaptiveRateLimiter:
+    """令牌桶 + AIMD 自适应限流器"""
+
+    def __init__(
+        self,
+        rate: float,
+        min_rate: float,
+        max_rate: float,
+        increase_step: float = 1.0,
+        decrease_factor: float = 0.5,
+    ):
+        """
+        初始化限流器
+
+        Args:
+            rate: 初始速率（请求/秒）
+            min_rate: 最低速率
+            max_rate: 最高速率
+            increase_step: 每秒成功请求带来的速率增量（加性增）
+            decrease_factor: 遇到限流时的速率乘数（乘性减）
+        """
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+
+        self._tokens = 1.0
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._last_decrease_at = 0.0
+        self._waiting = 0
+        self._throttled = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def capacity(self) -> float:
+        """桶容量：允许约 1 秒的突发"""
+        return max(1.0, self.rate)
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated_at
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        """获取一个令牌，必要时等待（按到达顺序排队）"""
+        self._waiting += 1
+        try:
+            async with self._lock:
+                while True:
+                    now = time.monotonic()
+                    if now < self._blocked_until:
+                        await asyncio.sleep(self._blocked_until - now)
+                        continue
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    await asyncio.sleep((1 - self._tokens) / self.rate)
+        finally:
+            self._waiting -= 1
+
+    def on_success(self) -> None:
+        """请求成功：加性提高速率"""
+        self.rate = min(self.max_rate, self.rate + self.increase_step / self.rate)
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> None:
+        """
+        请求被限流：乘性降低速率，并在 retry_after 秒内暂停发放令牌
+
+        同一时刻在途的多个请求可能同时收到 429，一个速率周期内只降速一次。
+        """
+        now = time.monotonic()
+        self._throttled += 1
+        if now - self._last_decrease_at >= 1 / self.rate:
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            self._tokens = 0.0
+            self._last_decrease_at = now
+        if retry_after:
+            self._blocked_until = max(self._blocked_until, now + retry_after)
+
+    def stats(self) -> dict:
+        """返回当前速率与排队情况"""
+        return {
+            "rate": round(self.rate, 3),
+            "queue_depth": self._waiting,
+            "throttled": self._throttled,
+        }
+
+
+_rate_limiters: Dict[Optional[str], AdaptiveRateLimiter] = {}
+
+
+def get_rate_limiter(api_key: Optional[str]) -> AdaptiveRateLimiter:
+    """获取指定 API Key 的限流器（同一 Key 在进程内共享配额）"""
+    limiter = _rate_limiters.get(api_key)
+    if limiter is None:
+        limiter = AdaptiveRateLimiter(
+            rate=embedding_config.rate_limit,
+            min_rate=embedding_config.rate_limit_min,
+            max_rate=embedding_config.rate_limit_max,
+        )
+        _rate_limiters[api_key] = limiter
+    return limiter
+
+
+def get_rate_limiter_stats() -> list:
+    """返回所有限流器的状态（API Key 只保留末 4 位）"""
+    return [
+        {"api_key": f"***{api_key[-4:]}" if api_key else None, **limiter.stats()}
+        for api_key, limiter in _rate_limiters.items()
+    ]
@@ -1,7 +1,9 @@
 from typing import AsyncGenerator, List, Optional
 
+import httpx
 from langchain_openai import ChatOpenAI
 
+from src.ai.client_registry import client_registry
 from src.core.config import llm as llm_config
 from src.db.models.model_config import ModelConfig
 from src.db.models.message import Message
@@ -9,26 +11,47 @@ from src.ai.llm.prompt import SUMMARY_PROMPT, SYSTEM_PROMPT_BASE
 from .base import BaseLLM
 
 
+# 与 openai SDK 的默认值一致（openai.DEFAULT_TIMEOUT / DEFAULT_CONNECTION_LIMITS）
+_CHAT_TIMEOUT = httpx.Timeout(600, connect=5.0)
+_CHAT_LIMITS = httpx.Limits(max_connections=1000, max_keepalive_connections=100)
+
+
 class ChatModel(BaseLLM):
     """聊天模型实现"""
     
     def __init__(self, model_config: Optional[ModelConfig] = None):
         if model_config:
-            self.client = ChatOpenAI(
-                api_key=model_config.api_key,
-                base_url=model_config.base_url,
-                model=model_config.model_name,
-            )
+            api_key = model_config.api_key
+            base_url = model_config.base_url
+            model_name = model_config.model_name
         else:
             # check if env config is valid
             if not llm_config.api_key:
                 raise ValueError("No LLM configuration found. Please configure a model in settings or provide environment variables.")
-                
-            self.client = ChatOpenAI(
-                api_key=llm_config.api_key,  # type: ignore
-                base_url=llm_config.base_url,
-                model=llm_config.model_name,
-            )
+            
+            api_key = llm_config.api_key
+            base_url = llm_config.base_url
+            model_name = llm_config.model_name
+        
+        # 相同凭据和模型复用同一个客户端，避免每个请求重新建立连接
+        self.client = client_registry.get_or_create(
+            "chat",
+            api_key,
+            base_url,
+            model_name,
+            lambda: ChatOpenAI(
+                api_key=api_key,  # type: ignore
+                base_url=base_url,
+                model=model_name,
+                # 使用专属的连接池（默认会共享进程级缓存的 httpx 客户端），淘汰时可以单独关闭；
+                # 超时和连接数沿用 openai SDK 的默认值，长回复不会被 httpx 默认的 5 秒超时中断
+                http_async_client=httpx.AsyncClient(
+                    timeout=_CHAT_TIMEOUT,
+                    limits=_CHAT_LIMITS,
+                    follow_redirects=True,
+                ),
+            ),
+        )
         self.system_prompt = SYSTEM_PROMPT_BASE
     
     async def generate(self, messages: List[dict]) -> str:
@@ -1,13 +1,27 @@
-from src.ai.rag.vector_store import ChromaVectorStore, get_vector_store
+from src.ai.rag.vector_store import (
+    ChromaVectorStore,
+    AsyncVectorStore,
+    SearchRequest,
+    SearchHit,
+    VectorWriteError,
+    get_vector_store,
+    get_async_vector_store,
+)
 from src.ai.rag.chunking import FileChunker
-from src.ai.rag.embedding import Embedding
+from src.ai.rag.embedding import AsyncEmbedding, create_embedding
 from src.ai.rag.retriever import DocumentRetriever, RetrievalResult, get_retriever
 
 __all__ = [
     "ChromaVectorStore",
+    "AsyncVectorStore",
+    "SearchRequest",
+    "SearchHit",
+    "VectorWriteError",
     "get_vector_store", 
+    "get_async_vector_store",
     "FileChunker",
-    "Embedding",
+    "AsyncEmbedding",
+    "create_embedding",
     "DocumentRetriever",
     "RetrievalResult",
     "get_retriever",
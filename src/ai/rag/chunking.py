@@ -2,7 +2,7 @@
 文档分块器 - 将长文档切分为适合向量化的片段
 """
 from pathlib import Path
-from typing import List, Optional
+from typing import Iterator, List, Optional
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import (
@@ -14,6 +14,21 @@ from langchain_community.document_loaders import (
     JSONLoader
 )
 
+from src.ai.embedding.cache import text_hash
+
+
+def chunk_id(metadata: dict) -> str:
+    """
+    根据分块来源和内容生成确定性 ID：(来源类型, 文件 ID, 分块序号, 内容哈希)
+
+    同一文件重新处理时，内容未变化的分块得到相同的 ID，可以跳过向量化；
+    内容变化的分块得到新 ID，旧 ID 在处理完成后作为过期分块删除。
+    """
+    return (
+        f"{metadata.get('source_type')}-{metadata.get('file_id')}-"
+        f"{metadata.get('chunk_index')}-{metadata['content_hash'][:16]}"
+    )
+
 
 class FileChunker():
     def __init__(self, chunk_size: int = 512, chunk_overlap: int = 50):
@@ -24,8 +39,8 @@ class FileChunker():
             chunk_overlap=chunk_overlap
         )
 
-    def _load_document(self, doc_path: Path) -> List[Document]:
-        """根据文件类型加载文档"""
+    def _get_loader(self, doc_path: Path):
+        """根据文件类型创建文档加载器"""
         file_suffix = doc_path.suffix.lower()
         
         if file_suffix == '.pdf':
@@ -49,7 +64,69 @@ class FileChunker():
         else:
             raise ValueError(f'不支持的文件类型: {file_suffix}')
         
-        return loader.load()
+        return loader
+
+    def _load_document(self, doc_path: Path) -> List[Document]:
+        """根据文件类型加载文档"""
+        return self._get_loader(doc_path).load()
+
+    def _iter_chunks(self, doc_path: Path, metadata: dict) -> Iterator[Document]:
+        """
+        惰性加载并分块文档
+        
+        逐页（逐个源文档）加载、切分并产出分块，内存占用与单页大小相关而不是整个文件。
+        
+        Args:
+            doc_path: 文件路径
+            metadata: 附加到每个分块上的元数据
+        """
+        chunk_index = 0
+        for doc in self._get_loader(doc_path).lazy_load():
+            for chunk in self.text_splitter.split_documents([doc]):
+                chunk.metadata.update(metadata)
+                chunk.metadata["chunk_index"] = chunk_index
+                chunk.metadata["content_hash"] = text_hash(chunk.page_content)
+                chunk_index += 1
+                yield chunk
+
+    def iter_conversation_file(
+        self, 
+        doc_path: Path, 
+        file_id: int,
+        conversation_id: int,
+        user_id: int,
+        file_name: Optional[str] = None
+    ) -> Iterator[Document]:
+        """
+        惰性分块会话文件，参数同 split_conversation_file
+        """
+        # 使用传入的文件名，如果没有则使用路径中的文件名
+        return self._iter_chunks(doc_path, {
+            "source_type": "conversation_file",
+            "file_id": file_id,
+            "conversation_id": conversation_id,
+            "user_id": user_id,
+            "file_name": file_name or doc_path.name,
+        })
+
+    def iter_knowledge_base_file(
+        self, 
+        doc_path: Path,
+        file_id: int,
+        knowledge_base_id: int,
+        user_id: int,
+        file_name: Optional[str] = None
+    ) -> Iterator[Document]:
+        """
+        惰性分块知识库文件，参数同 split_knowledge_base_file
+        """
+        return self._iter_chunks(doc_path, {
+            "source_type": "knowledge_base",
+            "file_id": file_id,
+            "knowledge_base_id": knowledge_base_id,
+            "user_id": user_id,
+            "file_name": file_name or doc_path.name,
+        })
 
     def split_conversation_file(
         self, 
@@ -69,23 +146,9 @@ class FileChunker():
             user_id: 用户 ID
             file_name: 文件名（用于在 RAG 检索结果中显示来源）
         """
-        docs = self._load_document(doc_path)
-        chunked_documents = self.text_splitter.split_documents(docs)
-        
-        # 使用传入的文件名，如果没有则使用路径中的文件名
-        actual_file_name = file_name or doc_path.name
-        
-        for i, chunk in enumerate(chunked_documents):
-            chunk.metadata.update({
-                "source_type": "conversation_file",
-                "file_id": file_id,
-                "conversation_id": conversation_id,
-                "user_id": user_id,
-                "chunk_index": i,
-                "file_name": actual_file_name,
-            })
-        
-        return chunked_documents
+        return list(self.iter_conversation_file(
+            doc_path, file_id, conversation_id, user_id, file_name
+        ))
 
     def split_knowledge_base_file(
         self, 
@@ -105,20 +168,9 @@ class FileChunker():
             user_id: 用户 ID
             file_name: 文件名（可选，用于溯源）
         """
-        docs = self._load_document(doc_path)
-        chunked_documents = self.text_splitter.split_documents(docs)
-        
-        for i, chunk in enumerate(chunked_documents):
-            chunk.metadata.update({
-                "source_type": "knowledge_base",
-                "file_id": file_id,
-                "knowledge_base_id": knowledge_base_id,
-                "user_id": user_id,
-                "chunk_index": i,
-                "file_name": file_name or doc_path.name,
-            })
-        
-        return chunked_documents
+        return list(self.iter_knowledge_base_file(
+            doc_path, file_id, knowledge_base_id, user_id, file_name
+        ))
 
 
 if __name__ == '__main__':
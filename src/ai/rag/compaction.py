@@ -0,0 +1,71 @@
+"""
+后台清除任务 - 定期物理清除已标记删除的范围
+"""
+import asyncio
+from typing import Optional
+
+from src.ai.rag.vector_store import AsyncVectorStore, get_async_vector_store
+from src.core.config.database import chroma_settings
+
+
+class TombstoneCompactor:
+    """后台清除任务：按固定间隔运行，有新的删除标记时可提前唤醒"""
+
+    def __init__(self, store: AsyncVectorStore, interval: float):
+        """
+        初始化清除任务
+
+        Args:
+            store: 向量存储
+            interval: 清除间隔（秒）
+        """
+        self._store = store
+        self.interval = interval
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def notify(self) -> None:
+        """有新的删除标记，提前唤醒清除任务"""
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                purged = await self._store.compact()
+                if purged:
+                    print(f"Compacted {purged} deleted vector scope(s)")
+            except Exception as e:
+                print(f"Vector compaction failed: {e}")
+
+    def start(self) -> None:
+        """启动后台任务（应用启动时调用）"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            # 启动时清除上次退出前未完成的删除
+            self.notify()
+
+    async def stop(self) -> None:
+        """停止后台任务（应用退出时调用）"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+_compactor: Optional[TombstoneCompactor] = None
+
+
+def get_compactor() -> TombstoneCompactor:
+    """获取后台清除任务单例"""
+    global _compactor
+    if _compactor is None:
+        _compactor = TombstoneCompactor(get_async_vector_store(), chroma_settings.compaction_interval)
+    return _compactor
@@ -0,0 +1,136 @@
+"""
+RAG 上下文筛选 - 决定哪些检索结果注入提示词
+
+检索总是返回 top_k 个结果，即使问题与文档无关（如寒暄）。注入前按以下规则筛选：
+1. 相似度下限：余弦相似度（vector_score）低于 min_score 的结果丢弃
+2. 相对下限：余弦相似度低于最佳向量结果 relative_score_cutoff 倍的结果丢弃
+3. token 预算：按排名依次放入，放不下的分块跳过，总量不超过 context_max_tokens
+
+规则 1、2 只作用于有 vector_score 的结果。只有词法命中的结果（vector_score 为 None）
+只有 RRF 融合分数，与余弦相似度不在同一量纲，因此不参与分数下限判断，也不参与最佳分数的计算，
+但同样受 top_k 和 token 预算限制。
+
+因此实际注入的分块数随结果质量自适应，最多 top_k 个。
+配置默认取自 RAG_* 环境变量，知识库可以单独覆盖（knowledge_base.retrieval_settings）。
+
+一次检索涉及多个知识库时，每个结果按其所属知识库的配置筛选：覆盖了配置的知识库，其结果的数量和 token 数
+分别不超过该知识库的 top_k 和 context_max_tokens（可以收紧，也可以放宽）；会话文件和未覆盖配置的知识库
+共用部署级配置的限额。所有结果合计不超过各相关配置中最宽松的 top_k 和 token 预算。
+"""
+import math
+import re
+from dataclasses import dataclass, fields, replace
+from typing import Dict, List, Optional
+
+from src.ai.llm.prompt.rag import format_file_chunk
+from src.ai.rag.retriever import RetrievalResult, result_scope
+from src.core.config import rag as rag_config
+
+
+# 中日韩字符按每字 1 个 token 估算，其余字符按每 4 个 1 个 token 估算
+_CJK_PATTERN = re.compile(r"[　-鿿가-힯豈-﫿＀-￯]")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本的 token 数（不依赖具体模型的分词器）"""
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+@dataclass
+class ContextPolicy:
+    """上下文筛选配置"""
+    top_k: int
+    min_score: float
+    relative_score_cutoff: float
+    context_max_tokens: int
+
+    @classmethod
+    def from_settings(cls, overrides: Optional[dict] = None) -> "ContextPolicy":
+        """
+        部署级配置（RAG_*），再用 overrides 中非空的字段覆盖
+
+        Args:
+            overrides: 知识库的 retrieval_settings（可选）
+        """
+        policy = cls(
+            top_k=rag_config.top_k,
+            min_score=rag_config.min_score,
+            relative_score_cutoff=rag_config.relative_score_cutoff,
+            context_max_tokens=rag_config.context_max_tokens,
+        )
+        if not overrides:
+            return policy
+        names = {f.name for f in fields(cls)}
+        return replace(policy, **{k: v for k, v in overrides.items() if k in names and v is not None})
+
+
+def select_context(
+    results: List[RetrievalResult],
+    policy: ContextPolicy,
+    knowledge_base_policies: Optional[Dict[int, ContextPolicy]] = None,
+    separator: str = "\n\n---\n\n"
+) -> List[RetrievalResult]:
+    """
+    筛选注入提示词的检索结果
+
+    每个结果按所属知识库的配置判断（会话文件使用 policy）：分数下限只作用于有 vector_score 的结果，
+    只有词法命中的结果跳过分数下限；同一配置下的结果合计不超过该配置的 top_k 和 token 预算，
+    全部结果合计不超过所有相关配置中最宽松的 top_k 和 token 预算。
+
+    Args:
+        results: 检索结果（按排名排列）
+        policy: 部署级配置
+        knowledge_base_policies: {知识库 ID: 配置}（可选）
+        separator: format_rag_context 使用的分隔符，计入 token 预算
+
+    Returns:
+        保留的结果，保持原有顺序
+    """
+    if not results:
+        return []
+    knowledge_base_policies = knowledge_base_policies or {}
+
+    def policy_of(result: RetrievalResult) -> ContextPolicy:
+        key, value = result_scope(result.metadata)
+        if key == "knowledge_base_id":
+            return knowledge_base_policies.get(value, policy)
+        return policy
+
+    policies = [policy_of(result) for result in results]
+    top_k = max(p.top_k for p in policies)
+    max_tokens = 0 if any(p.context_max_tokens == 0 for p in policies) else max(p.context_max_tokens for p in policies)
+    vector_scores = [result.vector_score for result in results if result.vector_score is not None]
+    best = max(vector_scores) if vector_scores else 0.0
+
+    selected: List[RetrievalResult] = []
+    used_tokens = 0
+    # 每个配置下已选结果的数量和 token 数（按配置对象区分：各知识库的覆盖配置各自计数）
+    policy_counts: Dict[int, int] = {}
+    policy_tokens: Dict[int, int] = {}
+    separator_tokens = estimate_tokens(separator)
+    for result, result_policy in zip(results, policies):
+        if len(selected) >= top_k:
+            break
+        group = id(result_policy)
+        if policy_counts.get(group, 0) >= result_policy.top_k:
+            continue
+        relevance = result.vector_score
+        if relevance is not None and (
+            relevance < result_policy.min_score or relevance < best * result_policy.relative_score_cutoff
+        ):
+            continue
+        if max_tokens or result_policy.context_max_tokens:
+            chunk = format_file_chunk(result.content, result.metadata.get("file_name"), result.metadata.get("page"))
+            tokens = estimate_tokens(chunk) + (separator_tokens if selected else 0)
+            if max_tokens and used_tokens + tokens > max_tokens:
+                continue
+            if result_policy.context_max_tokens and (
+                policy_tokens.get(group, 0) + tokens > result_policy.context_max_tokens
+            ):
+                continue
+            used_tokens += tokens
+            policy_tokens[group] = policy_tokens.get(group, 0) + tokens
+        selected.append(result)
+        policy_counts[group] = policy_counts.get(group, 0) + 1
+    return selected
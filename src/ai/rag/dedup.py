@@ -0,0 +1,199 @@
+"""
+分块去重 - 在向量化之前合并完全重复和近似重复的分块
+
+PDF / PPTX 导出的文档常在每页重复页眉、页脚、标题页和模板文字，
+这些分块只需嵌入和存储一次。每组重复分块保留第一次出现的分块作为代表，
+其余出现位置的来源信息记录在代表分块的元数据中。
+"""
+import hashlib
+import json
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.ai.embedding.cache import normalize_text, text_hash
+
+
+# 记录到 occurrences 中的来源字段
+PROVENANCE_KEYS = ("file_id", "file_name", "chunk_index", "page")
+
+# splitmix64 终结函数的乘数
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+
+def _mix64(values: np.ndarray) -> np.ndarray:
+    """splitmix64 终结函数：对 uint64 做雪崩混合（乘法按 2^64 取模回绕）"""
+    values = values ^ (values >> np.uint64(30))
+    values = values * _MIX_1
+    values = values ^ (values >> np.uint64(27))
+    values = values * _MIX_2
+    return values ^ (values >> np.uint64(31))
+
+
+class ChunkDeduplicator:
+    """
+    分块去重器
+
+    - 完全重复：规范化文本的哈希相同
+    - 近似重复：字符 shingle 集合的 Jaccard 相似度不低于阈值。MinHash + LSH 分桶只用于找候选，
+      合并前按 shingle 集合计算精确的 Jaccard 相似度确认，估计误差不会导致不相关的分块被合并
+
+    去重器是有状态的：同一实例多次调用 deduplicate 时，后续分块也会与之前出现过的分块比较。
+    被合并的分块不单独存储，只保存在代表分块（及其 file_id）下，所以去重范围必须与删除粒度一致：
+    每个文件使用一个实例，删除 / 重新处理某个文件时不会影响其他文件的内容。
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.9,
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle_size: int = 5,
+        seed: int = 1,
+    ):
+        """
+        初始化去重器
+
+        Args:
+            threshold: 近似重复的 Jaccard 相似度阈值
+            num_perm: MinHash 排列数
+            bands: LSH 分段数（num_perm 需能被整除）
+            shingle_size: 字符 shingle 长度
+            seed: 哈希函数随机种子
+        """
+        if num_perm % bands != 0:
+            raise ValueError("num_perm 必须能被 bands 整除")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        # 每个"排列"是一个独立的 64 位哈希：shingle 的 64 位哈希与随机种子异或后做 splitmix64 混合
+        rng = np.random.default_rng(seed)
+        self._seeds = rng.integers(0, np.iinfo(np.uint64).max, size=num_perm, dtype=np.uint64, endpoint=True)
+
+        self._exact: Dict[str, Document] = {}
+        # 已写入向量存储的代表分块 -> 向量 ID，以及写入后又合并了新重复项的代表分块
+        self._stored_ids: Dict[int, str] = {}
+        self._dirty: Dict[int, Document] = {}
+        self._signatures: List[np.ndarray] = []
+        self._signature_shingles: List[FrozenSet[str]] = []
+        self._signature_owners: List[Document] = []
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+
+    def _shingles(self, text: str) -> FrozenSet[str]:
+        """文本的字符 shingle 集合"""
+        n = self.shingle_size
+        return frozenset(text[i:i + n] for i in range(max(1, len(text) - n + 1)))
+
+    def _signature(self, shingles: FrozenSet[str]) -> np.ndarray:
+        """计算 shingle 集合的 MinHash 签名"""
+        hashes = np.fromiter(
+            (
+                int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+                for s in shingles
+            ),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        return _mix64(hashes[:, None] ^ self._seeds[None, :]).min(axis=0)
+
+    def _find_near_duplicate(self, signature: np.ndarray, shingles: FrozenSet[str]) -> Optional[Document]:
+        """通过 LSH 分桶查找候选，按精确 Jaccard 相似度确认近似重复的代表分块"""
+        candidates = set()
+        for band, bucket in enumerate(self._buckets):
+            key = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            candidates.update(bucket.get(key, ()))
+        best, best_score = None, self.threshold
+        for index in sorted(candidates):
+            other = self._signature_shingles[index]
+            score = len(shingles & other) / len(shingles | other)
+            if score >= best_score:
+                best, best_score = self._signature_owners[index], score
+        return best
+
+    def _index_signature(self, signature: np.ndarray, shingles: FrozenSet[str], owner: Document) -> None:
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        self._signature_shingles.append(shingles)
+        self._signature_owners.append(owner)
+        for band, bucket in enumerate(self._buckets):
+            key = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            bucket.setdefault(key, []).append(index)
+
+    @staticmethod
+    def _provenance(chunk: Document) -> dict:
+        return {key: chunk.metadata[key] for key in PROVENANCE_KEYS if key in chunk.metadata}
+
+    def _absorb(self, representative: Document, duplicate: Document) -> None:
+        """把重复分块的来源信息合并到代表分块的元数据中"""
+        metadata = representative.metadata
+        occurrences = json.loads(metadata["occurrences"])
+        occurrences.append(self._provenance(duplicate))
+        metadata["occurrences"] = json.dumps(occurrences, ensure_ascii=False)
+        metadata["duplicate_count"] = len(occurrences)
+        if id(representative) in self._stored_ids:
+            self._dirty[id(representative)] = representative
+
+    def mark_stored(self, chunks: List[Document], vector_ids: List[str]) -> None:
+        """记录代表分块写入向量存储后的 ID，之后合并的重复项可通过 pop_updated 回写元数据"""
+        for chunk, vector_id in zip(chunks, vector_ids):
+            self._stored_ids[id(chunk)] = vector_id
+
+    def pop_updated(self) -> Tuple[List[str], List[dict]]:
+        """
+        取出写入后又合并了新重复项的代表分块
+
+        流式入库时，后续批次（或后续文件）中的重复项会更新已写入分块的 occurrences，
+        调用方需要把这些元数据回写到向量存储。
+
+        Returns:
+            (向量 ID 列表, 最新元数据列表)
+        """
+        ids = [self._stored_ids[key] for key in self._dirty]
+        metadatas = [chunk.metadata for chunk in self._dirty.values()]
+        self._dirty.clear()
+        return ids, metadatas
+
+    def deduplicate(self, chunks: List[Document]) -> List[Document]:
+        """
+        对分块去重
+
+        Args:
+            chunks: 分块列表（需已包含来源元数据）
+
+        Returns:
+            本次新出现的代表分块列表（保持原有顺序）。代表分块的元数据增加：
+            - duplicate_count: 该内容出现的总次数
+            - occurrences: 所有出现位置的来源信息（JSON 字符串，Chroma 元数据只支持标量）
+        """
+        unique: List[Document] = []
+        for chunk in chunks:
+            text = normalize_text(chunk.page_content)
+            key = text_hash(text)
+
+            representative = self._exact.get(key)
+            signature = shingles = None
+            if representative is None and text:
+                shingles = self._shingles(text)
+                signature = self._signature(shingles)
+                representative = self._find_near_duplicate(signature, shingles)
+
+            if representative is not None:
+                self._absorb(representative, chunk)
+                self._exact.setdefault(key, representative)
+                continue
+
+            chunk.metadata["occurrences"] = json.dumps(
+                [self._provenance(chunk)], ensure_ascii=False
+            )
+            chunk.metadata["duplicate_count"] = 1
+            self._exact[key] = chunk
+            if signature is not None:
+                self._index_signature(signature, shingles, chunk)
+            unique.append(chunk)
+
+        return unique
@@ -1,43 +1,198 @@
+import asyncio
+import base64
+import random
 from typing import List, Optional
-from openai import OpenAI
 
+import numpy as np
+from openai import (
+    APIConnectionError,
+    AsyncOpenAI,
+    InternalServerError,
+    RateLimitError,
+)
+
+from src.ai.client_registry import client_registry
+from src.ai.embedding.base import BaseEmbedding
+from src.ai.embedding.cache import CachedEmbedding, get_embedding_cache
+from src.ai.embedding.local import HashingEmbedding, SentenceTransformerEmbedding
+from src.ai.embedding.rate_limiter import AdaptiveRateLimiter, get_rate_limiter
 from src.core.config import embedding as embedding_config
 
 
-class Embedding():
-    """文本嵌入服务"""
-    
+def _decode_embeddings(data) -> np.ndarray:
+    """
+    将接口返回的 embedding 列表解码为 (n, dim) 的 float32 矩阵
+
+    请求时使用 base64 编码，直接从字节构造数组，避免逐个创建 Python float；
+    若服务端忽略该参数返回浮点列表，也能正确处理。接口不保证 data 的顺序，按 index 还原。
+    """
+    ordered = sorted(data, key=lambda item: item.index)
+    rows = [
+        np.frombuffer(base64.b64decode(item.embedding), dtype=np.float32)
+        if isinstance(item.embedding, str)
+        else np.asarray(item.embedding, dtype=np.float32)
+        for item in ordered
+    ]
+    return np.vstack(rows)
+
+
+class AsyncEmbedding(BaseEmbedding):
+    """基于 AsyncOpenAI 的异步文本嵌入服务，不阻塞事件循环"""
+
     def __init__(
         self,
         api_key: Optional[str] = None,
         base_url: Optional[str] = None,
-        model_name: Optional[str] = None
+        model_name: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        client: Optional[AsyncOpenAI] = None,
+        rate_limiter: Optional[AdaptiveRateLimiter] = None
     ):
         """
-        初始化嵌入服务
-        
+        初始化异步嵌入服务
+
         Args:
             api_key: API 密钥，如果未提供则从环境变量读取
             base_url: API 基础 URL，如果未提供则从环境变量读取
             model_name: 模型名称，如果未提供则从环境变量读取
+            batch_size: 单次请求的文本条数，如果未提供则从环境变量读取
+            max_concurrency: 同时在途的批次数，如果未提供则从环境变量读取
+            client: 复用的 AsyncOpenAI 客户端（可选），提供时忽略 api_key / base_url
+            rate_limiter: 限流器（可选），默认使用该 API Key 共享的限流器
+        """
+        # 重试由本类统一处理（需要感知 429 来调整速率），关闭客户端自带的重试
+        self.client = client or AsyncOpenAI(
+            api_key=api_key or embedding_config.api_key,
+            base_url=base_url or embedding_config.base_url,
+            max_retries=0,
+        )
+        self.model_name = model_name or embedding_config.model_name
+        self.batch_size = batch_size or embedding_config.batch_size
+        self.max_concurrency = max_concurrency or embedding_config.max_concurrency
+        self.rate_limiter = rate_limiter or get_rate_limiter(self.client.api_key)
+        self.max_retries = embedding_config.max_retries
+
+    @staticmethod
+    def _retry_after(error: RateLimitError) -> Optional[float]:
+        """读取 429 响应中的 Retry-After 头（秒）"""
+        try:
+            return float(error.response.headers.get("retry-after"))
+        except (TypeError, ValueError):
+            return None
+
+    def _backoff(self, attempt: int) -> float:
+        """指数退避 + 全抖动"""
+        delay = min(
+            embedding_config.retry_max_delay,
+            embedding_config.retry_base_delay * (2 ** attempt),
+        )
+        return random.uniform(0, delay)
+
+    async def _create(self, input):
+        """
+        调用 Embedding 接口，经过限流器并对可恢复错误重试
+
+        可恢复错误：429 限流、连接错误 / 超时、5xx 服务端错误
+        """
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire()
+            try:
+                completion = await self.client.embeddings.create(
+                    model=self.model_name,
+                    input=input,
+                    encoding_format="base64",
+                )
+            except RateLimitError as e:
+                self.rate_limiter.on_throttle(self._retry_after(e))
+                error: Exception = e
+            except (APIConnectionError, InternalServerError) as e:
+                error = e
+            else:
+                self.rate_limiter.on_success()
+                return completion
+
+            if attempt == self.max_retries:
+                raise error
+            await asyncio.sleep(self._backoff(attempt))
+
+    async def embed_text(self, text: str) -> np.ndarray:
+        completion = await self._create([text])
+        return _decode_embeddings(completion.data)[0]
+
+    async def _embed_batch(self, batch: List[str]) -> np.ndarray:
+        """一次请求嵌入一批文本，按输入顺序返回"""
+        completion = await self._create(batch)
+        return _decode_embeddings(completion.data)
+
+    async def embed_texts(self, texts: List[str]) -> np.ndarray:
+        """
+        批量嵌入文本，返回 (n, dim) 的 float32 矩阵
+
+        按 batch_size 切分，用信号量限制同时在途的批次数，结果与输入顺序一致。
         """
-        # 优先使用传入的参数，否则使用环境变量配置
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(batch: List[str]) -> np.ndarray:
+            async with semaphore:
+                return await self._embed_batch(batch)
+
+        batches = [
+            texts[i:i + self.batch_size]
+            for i in range(0, len(texts), self.batch_size)
+        ]
+        # gather 按传入顺序返回结果
+        results = await asyncio.gather(*(run(batch) for batch in batches))
+        return np.vstack(results)
+
+
+def create_embedding(
+    api_key: Optional[str] = None,
+    base_url: Optional[str] = None,
+    model_name: Optional[str] = None
+) -> BaseEmbedding:
+    """
+    根据 EMBEDDING_BACKEND 配置创建 Embedding 实例
+
+    远程和本地模型后端会包一层持久化缓存；哈希后端计算成本极低，不走缓存。
+    api_key / base_url / model_name 仅对 openai 后端生效。
+
+    Args:
+        api_key: API 密钥
+        base_url: API 基础 URL
+        model_name: 远程模型名称
+    """
+    backend = embedding_config.backend
+    if backend == "hashing":
+        return HashingEmbedding(dimension=embedding_config.hashing_dimension)
+
+    if backend == "sentence_transformers":
+        embedding: BaseEmbedding = SentenceTransformerEmbedding(
+            model_name=embedding_config.local_model_name,
+            device=embedding_config.local_device,
+        )
+    else:
         effective_api_key = api_key or embedding_config.api_key
         effective_base_url = base_url or embedding_config.base_url
         effective_model_name = model_name or embedding_config.model_name
-        
-        self.client = OpenAI(
-            api_key=effective_api_key,
-            base_url=effective_base_url,
-        )
-        self.mode_name = effective_model_name
-
-    def embed_text(self, chunk: str) -> List[float]:
-        completion = self.client.embeddings.create(
-            model=self.mode_name,
-            input=chunk,
+        # 相同凭据复用同一个 AsyncOpenAI 客户端及其连接池
+        client = client_registry.get_or_create(
+            "embedding",
+            effective_api_key,
+            effective_base_url,
+            effective_model_name,
+            lambda: AsyncOpenAI(
+                api_key=effective_api_key,
+                base_url=effective_base_url,
+                max_retries=0,
+            ),
         )
-        return completion.data[0].embedding
+        embedding = AsyncEmbedding(model_name=effective_model_name, client=client)
 
-    def embed_texts(self, chunks: List[str]) -> List[List[float]]:
-        return [self.embed_text(chunk) for chunk in chunks]
+    cache = get_embedding_cache()
+    if cache is not None:
+        embedding = CachedEmbedding(embedding, cache)
+    return embedding
@@ -0,0 +1,170 @@
+"""
+精确检索索引 - 对小范围（单个会话 / 小知识库）的向量做暴力余弦 top-k
+
+会话通常只有几十个分块，在全局 HNSW 上做带过滤的近似检索既慢又可能漏召回。
+范围足够小时把它的向量缓存为连续的 float32 矩阵，一次矩阵乘法即可得到精确结果。
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from src.ai.rag.filters import metadata_tags
+
+
+# 每个缓存范围的固定开销估计（字节），“范围过大”的标记也计入，避免无限累积
+_ENTRY_OVERHEAD = 1024
+
+
+@dataclass
+class ScopeMatrix:
+    """一个检索范围的缓存数据"""
+    tags: Optional[frozenset]  # 范围标签，用于写入时失效；None 表示未限定范围
+    ids: List[str]
+    documents: List[str]
+    metadatas: List[dict]
+    matrix: Optional[np.ndarray]  # (n, dim) 已 L2 归一化；None 表示范围超过阈值，应走 HNSW
+
+    @property
+    def is_small(self) -> bool:
+        return self.matrix is not None
+
+    @property
+    def nbytes(self) -> int:
+        """缓存占用的近似字节数：向量矩阵 + 文本，另加每个范围的固定开销"""
+        matrix_bytes = self.matrix.nbytes if self.matrix is not None else 0
+        return matrix_bytes + sum(len(document) for document in self.documents) + _ENTRY_OVERHEAD
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class ExactIndex:
+    """按过滤条件缓存小范围向量矩阵的 LRU 索引（按总字节数限制容量）"""
+
+    def __init__(self, threshold: int, max_bytes: int):
+        """
+        初始化精确检索索引
+
+        Args:
+            threshold: 范围内向量数量不超过该值时使用精确检索（0 表示禁用）
+            max_bytes: 缓存矩阵和文本的总字节数上限
+        """
+        self.threshold = threshold
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, ScopeMatrix]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # 每次写入失效时递增，加载期间发生写入的结果不放入缓存
+        self._generation = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    @property
+    def nbytes(self) -> int:
+        """当前缓存占用的近似字节数"""
+        return self._bytes
+
+    def get(self, key: str) -> Optional[ScopeMatrix]:
+        """获取缓存的范围数据"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, entry: ScopeMatrix, generation: int) -> None:
+        """缓存范围数据；加载期间发生过写入、或单个范围就超过容量时丢弃"""
+        with self._lock:
+            if generation != self._generation or entry.nbytes > self.max_bytes:
+                return
+            self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.nbytes
+
+    def build(
+        self,
+        tags: Optional[frozenset],
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[dict],
+        embeddings: Optional[np.ndarray],
+    ) -> ScopeMatrix:
+        """根据范围内的全部向量构建缓存数据，数量超过阈值时只记录“范围过大”"""
+        if len(ids) > self.threshold:
+            return ScopeMatrix(tags, [], [], [], None)
+        if len(ids) == 0:
+            matrix = np.empty((0, 0), dtype=np.float32)
+        else:
+            matrix = np.ascontiguousarray(_normalize(embeddings))
+        return ScopeMatrix(tags, ids, documents, metadatas, matrix)
+
+    def invalidate(self, metadatas: Optional[List[dict]] = None) -> None:
+        """
+        写入后使相关范围失效
+
+        Args:
+            metadatas: 写入分块的元数据；为 None 时（如按 ID 删除，无法确定范围）清空全部缓存
+        """
+        with self._lock:
+            self._generation += 1
+            if metadatas is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+            written = frozenset().union(*(metadata_tags(m) for m in metadatas)) if metadatas else frozenset()
+            for key in [
+                key for key, entry in self._entries.items()
+                if entry.tags is None or entry.tags & written
+            ]:
+                self._remove(key)
+
+    @staticmethod
+    def search(entry: ScopeMatrix, queries: np.ndarray, top_k: int) -> List[List[Tuple[int, float]]]:
+        """
+        精确 top-k 检索
+
+        Args:
+            entry: 范围数据
+            queries: (m, dim) 查询向量
+            top_k: 返回数量
+
+        Returns:
+            每个查询的 (行下标, 余弦距离) 列表，按距离升序
+        """
+        n = len(entry.ids)
+        if n == 0:
+            return [[] for _ in range(len(queries))]
+
+        similarities = _normalize(queries) @ entry.matrix.T  # (m, n)
+        k = min(top_k, n)
+        if k < n:
+            candidates = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.broadcast_to(np.arange(n), (len(queries), n))
+
+        results = []
+        for row, columns in zip(similarities, candidates):
+            order = columns[np.argsort(-row[columns], kind="stable")]
+            results.append([(int(i), float(1.0 - row[i])) for i in order])
+        return results
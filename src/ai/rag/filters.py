@@ -0,0 +1,128 @@
+"""
+元数据过滤条件工具 - 解析 Chroma 风格的 where 条件
+"""
+from typing import List, Optional
+
+
+# 决定向量所属范围（分区）的元数据字段
+SCOPE_KEYS = ("knowledge_base_id", "conversation_id")
+# 范围字段对应的分区名前缀
+PARTITION_PREFIXES = {"knowledge_base_id": "kb", "conversation_id": "conv"}
+
+
+def scope_values(where: Optional[dict], key: str) -> Optional[list]:
+    """
+    从过滤条件中提取指定字段的取值（支持等值、$eq、$in 以及 $and / $or 嵌套），无法确定时返回 None
+
+    $or 只有在每个分支都限定了该字段时才能确定，结果为各分支取值的并集。
+    """
+    if not where:
+        return None
+    if key in where:
+        condition = where[key]
+        if not isinstance(condition, dict):
+            return [condition]
+        if "$eq" in condition:
+            return [condition["$eq"]]
+        if "$in" in condition:
+            return list(condition["$in"])
+        return None
+    for sub in where.get("$and", []):
+        values = scope_values(sub, key)
+        if values is not None:
+            return values
+    if where.get("$or"):
+        union: list = []
+        for sub in where["$or"]:
+            values = scope_values(sub, key)
+            if values is None:
+                return None
+            union.extend(value for value in values if value not in union)
+        return union
+    return None
+
+
+def scope_tags(where: Optional[dict]) -> Optional[frozenset]:
+    """
+    过滤条件覆盖的范围标签集合，如 {("knowledge_base_id", 1), ("conversation_id", 2)}
+
+    $or 的各分支可以限定不同的范围字段（如会话 + 知识库的多范围检索），结果为各分支标签的并集；
+    过滤条件未限定范围（或某个 $or 分支未限定）时返回 None（表示可能涉及任意范围）。
+    """
+    for key in SCOPE_KEYS:
+        values = scope_values(where, key)
+        if values is not None:
+            return frozenset((key, value) for value in values)
+    if not where:
+        return None
+    for sub in where.get("$and", []):
+        tags = scope_tags(sub)
+        if tags is not None:
+            return tags
+    if where.get("$or"):
+        union = set()
+        for sub in where["$or"]:
+            tags = scope_tags(sub)
+            if tags is None:
+                return None
+            union |= tags
+        return frozenset(union)
+    return None
+
+
+def scope_partitions(where: Optional[dict]) -> Optional[List[str]]:
+    """过滤条件涉及的范围分区名（kb_{id} / conv_{id}），无法确定时返回 None"""
+    tags = scope_tags(where)
+    if tags is None:
+        return None
+    return sorted(f"{PARTITION_PREFIXES[key]}_{value}" for key, value in tags)
+
+
+def metadata_tags(metadata: Optional[dict]) -> frozenset:
+    """分块元数据所属的范围标签集合"""
+    if not metadata:
+        return frozenset()
+    return frozenset((key, metadata[key]) for key in SCOPE_KEYS if metadata.get(key) is not None)
+
+
+def _match_condition(value, condition) -> bool:
+    if not isinstance(condition, dict):
+        return value == condition
+    for operator, operand in condition.items():
+        if operator == "$eq" and not value == operand:
+            return False
+        if operator == "$ne" and not value != operand:
+            return False
+        if operator == "$in" and value not in operand:
+            return False
+        if operator == "$nin" and value in operand:
+            return False
+        if operator in ("$gt", "$gte", "$lt", "$lte"):
+            if value is None:
+                return False
+            if operator == "$gt" and not value > operand:
+                return False
+            if operator == "$gte" and not value >= operand:
+                return False
+            if operator == "$lt" and not value < operand:
+                return False
+            if operator == "$lte" and not value <= operand:
+                return False
+    return True
+
+
+def match_where(metadata: Optional[dict], where: Optional[dict]) -> bool:
+    """判断元数据是否满足过滤条件（与 Chroma where 语义一致：$and / $or 及比较运算符）"""
+    if not where:
+        return True
+    metadata = metadata or {}
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(match_where(metadata, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(match_where(metadata, sub) for sub in condition):
+                return False
+        elif not _match_condition(metadata.get(key), condition):
+            return False
+    return True
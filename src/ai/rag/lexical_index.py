@@ -0,0 +1,259 @@
+"""
+词法索引 - 基于 SQLite FTS5 的 BM25 倒排索引
+
+向量检索对课程代码、公式名、标识符这类精确词项的召回较差，词法索引与向量检索互补。
+中文没有空格分词，这里不依赖分词词典：连续的中日韩字符切分为单字和相邻双字（bigram），
+英文 / 数字按连续字母数字切分并转为小写。切分后的词项以空格连接写入 FTS5。
+"""
+import json
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+
+_TOKEN_PATTERN = re.compile(
+    r"[a-z0-9]+|[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+"
+)
+_ASCII_PATTERN = re.compile(r"[a-z0-9]+")
+
+# 单独存为带索引列的元数据字段（范围过滤走索引），其余字段从 metadata JSON 中读取
+_COLUMNS = ("knowledge_base_id", "conversation_id", "file_id")
+_COMPARISONS = {"$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+
+def tokenize(text: str) -> List[str]:
+    """将文本切分为词项：英文数字按词，中日韩文字按单字 + 双字"""
+    tokens: List[str] = []
+    for run in _TOKEN_PATTERN.findall(text.lower()):
+        if _ASCII_PATTERN.fullmatch(run):
+            tokens.append(run)
+            continue
+        tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+@dataclass
+class LexicalHit:
+    """词法检索结果"""
+    id: str
+    document: str
+    metadata: dict
+    score: float  # BM25 分数（越大越相关）
+    coverage: float  # 查询词项在该分块中出现的比例
+
+
+class LexicalIndex:
+    """BM25 倒排索引，随向量存储的写入 / 删除增量维护"""
+
+    def __init__(self, path: str):
+        """
+        初始化词法索引
+
+        Args:
+            path: SQLite 数据库文件路径
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                rowid INTEGER PRIMARY KEY,
+                id TEXT NOT NULL UNIQUE,
+                knowledge_base_id INTEGER,
+                conversation_id INTEGER,
+                file_id INTEGER,
+                document TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            )
+            """
+        )
+        for column in _COLUMNS:
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_chunks_{column} ON chunks ({column})")
+        self._conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(tokens)")
+        self._conn.commit()
+
+    # ==================== 写入 ====================
+
+    def _delete_rowids(self, rowids: List[int]) -> None:
+        for i in range(0, len(rowids), 500):
+            part = rowids[i:i + 500]
+            placeholders = ",".join("?" * len(part))
+            self._conn.execute(f"DELETE FROM chunks_fts WHERE rowid IN ({placeholders})", part)
+            self._conn.execute(f"DELETE FROM chunks WHERE rowid IN ({placeholders})", part)
+
+    def _rowids_for_ids(self, ids: List[str]) -> List[int]:
+        rowids: List[int] = []
+        for i in range(0, len(ids), 500):
+            part = ids[i:i + 500]
+            placeholders = ",".join("?" * len(part))
+            rowids.extend(
+                row[0] for row in self._conn.execute(
+                    f"SELECT rowid FROM chunks WHERE id IN ({placeholders})", part
+                )
+            )
+        return rowids
+
+    def add(self, ids: List[str], documents: List[str], metadatas: Optional[List[dict]] = None) -> None:
+        """写入分块（ID 已存在时覆盖）"""
+        with self._lock:
+            self._delete_rowids(self._rowids_for_ids(ids))
+            for i, (chunk_id, document) in enumerate(zip(ids, documents)):
+                metadata = (metadatas[i] if metadatas else None) or {}
+                cursor = self._conn.execute(
+                    "INSERT INTO chunks (id, knowledge_base_id, conversation_id, file_id, document, metadata) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        chunk_id,
+                        *(metadata.get(column) for column in _COLUMNS),
+                        document,
+                        json.dumps(metadata, ensure_ascii=False),
+                    ),
+                )
+                self._conn.execute(
+                    "INSERT INTO chunks_fts (rowid, tokens) VALUES (?, ?)",
+                    (cursor.lastrowid, " ".join(tokenize(document))),
+                )
+            self._conn.commit()
+
+    def update_metadatas(self, ids: List[str], metadatas: List[dict]) -> None:
+        """更新分块元数据（同时更新范围列）"""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE chunks SET knowledge_base_id = ?, conversation_id = ?, file_id = ?, metadata = ? WHERE id = ?",
+                [
+                    (*(metadata.get(column) for column in _COLUMNS), json.dumps(metadata, ensure_ascii=False), chunk_id)
+                    for chunk_id, metadata in zip(ids, metadatas)
+                ],
+            )
+            self._conn.commit()
+
+    def delete(self, ids: List[str]) -> None:
+        """按 ID 删除分块"""
+        with self._lock:
+            self._delete_rowids(self._rowids_for_ids(ids))
+            self._conn.commit()
+
+    def delete_where(self, where: dict) -> None:
+        """按元数据条件删除分块"""
+        with self._lock:
+            sql, params = self._where_sql(where)
+            rows = self._conn.execute(f"SELECT rowid FROM chunks WHERE {sql}", params).fetchall()
+            self._delete_rowids([row[0] for row in rows])
+            self._conn.commit()
+
+    def clear(self) -> None:
+        """清空索引"""
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks_fts")
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.commit()
+
+    # ==================== 检索 ====================
+
+    @staticmethod
+    def _condition_sql(expr: str, expr_params: list, condition) -> tuple:
+        """单个字段的条件转换为 SQL（缺失字段为 NULL，比较语义与 match_where 一致）"""
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        clauses, params = [], []
+        for operator, operand in condition.items():
+            if operator in ("$eq", "$ne"):
+                clauses.append(f"{expr} IS {'NOT ' if operator == '$ne' else ''}?")
+                params.extend([*expr_params, operand])
+            elif operator in ("$in", "$nin"):
+                if not operand:
+                    clauses.append("1 = 0" if operator == "$in" else "1 = 1")
+                    continue
+                placeholders = ",".join("?" * len(operand))
+                if operator == "$in":
+                    clauses.append(f"{expr} IN ({placeholders})")
+                    params.extend([*expr_params, *operand])
+                else:
+                    clauses.append(f"({expr} IS NULL OR {expr} NOT IN ({placeholders}))")
+                    params.extend([*expr_params, *expr_params, *operand])
+            elif operator in _COMPARISONS:
+                clauses.append(f"{expr} {_COMPARISONS[operator]} ?")
+                params.extend([*expr_params, operand])
+        return " AND ".join(clauses) or "1 = 1", params
+
+    @classmethod
+    def _where_sql(cls, where: Optional[dict], alias: str = "") -> tuple:
+        """
+        把过滤条件（Chroma where 语法）完整转换为 SQL 条件，语义与 match_where 一致
+
+        范围字段使用带索引的列，其余字段用 json_extract 从 metadata 中读取。
+        过滤在 SQL 中完成，LIMIT 之后不再丢弃结果，小范围的命中不会被其他范围的结果挤掉。
+        """
+        if not where:
+            return "1 = 1", []
+        clauses, params = [], []
+        for key, condition in where.items():
+            if key in ("$and", "$or"):
+                if not condition:
+                    clauses.append("1 = 1" if key == "$and" else "1 = 0")
+                    continue
+                parts = [cls._where_sql(sub, alias) for sub in condition]
+                joiner = " AND " if key == "$and" else " OR "
+                clauses.append(f"({joiner.join(f'({sql})' for sql, _ in parts)})")
+                for _, sub_params in parts:
+                    params.extend(sub_params)
+            elif key in _COLUMNS:
+                sql, sub_params = cls._condition_sql(f"{alias}{key}", [], condition)
+                clauses.append(sql)
+                params.extend(sub_params)
+            else:
+                path = '$."' + key.replace('"', '\\"') + '"'
+                sql, sub_params = cls._condition_sql(f"json_extract({alias}metadata, ?)", [path], condition)
+                clauses.append(sql)
+                params.extend(sub_params)
+        return " AND ".join(clauses), params
+
+    def search(self, query: str, where: Optional[dict] = None, top_k: int = 5) -> List[LexicalHit]:
+        """
+        BM25 检索
+
+        Args:
+            query: 查询文本
+            where: 元数据过滤条件（Chroma where 语法）
+            top_k: 返回的最大结果数量
+
+        Returns:
+            按 BM25 分数降序排列的结果
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or top_k <= 0:
+            return []
+
+        match = " OR ".join(f'"{term}"' for term in terms)
+        sql, params = self._where_sql(where, alias="c.")
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT c.id, c.document, c.metadata, f.tokens, bm25(chunks_fts) AS score "
+                f"FROM chunks_fts f JOIN chunks c ON c.rowid = f.rowid "
+                f"WHERE chunks_fts MATCH ? AND {sql} "
+                f"ORDER BY score LIMIT ?",
+                [match, *params, top_k],
+            ).fetchall()
+
+        hits: List[LexicalHit] = []
+        for chunk_id, document, metadata, tokens, score in rows:
+            present = set(tokens.split())
+            hits.append(LexicalHit(
+                id=chunk_id,
+                document=document,
+                metadata=json.loads(metadata),
+                score=-score,  # FTS5 的 bm25() 返回负数，越小越相关
+                coverage=sum(term in present for term in terms) / len(terms),
+            ))
+        return hits
+
+    def count(self) -> int:
+        """返回索引中的分块数量"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
@@ -0,0 +1,659 @@
+"""
+本地向量存储 - 基于内存映射文件的 BaseVectorStore 实现（可选 hnswlib 近似索引）
+
+与 Chroma 持久化客户端相比，每个 worker 进程不需要加载完整的客户端和索引：
+- 向量按分区（kb_{id} / conv_{id} / default）追加写入 float32 文件，读取时用 np.memmap 只读映射，
+  多个 uvicorn worker 通过操作系统页缓存共享同一份数据
+- 文档、元数据和行号存放在 SQLite 中；过滤条件先用索引列预筛，再按 Chroma where 语义校验
+- 分区向量数不超过 VECTOR_STORE_ANN_THRESHOLD 时用 NumPy 精确检索；超过且安装了 hnswlib 时使用 HNSW 索引
+- 删除只做标记，compact 时重写向量文件（新文件使用新的世代号，正在读取旧文件的进程不受影响）
+"""
+import fcntl
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.ai.rag.filters import SCOPE_KEYS, match_where, scope_partitions, scope_values
+from src.ai.rag.lexical_index import LexicalHit, LexicalIndex
+from src.ai.rag.scope_stats import ScopeStats
+from src.ai.rag.vector_store import BaseVectorStore, SearchHit, SearchRequest
+from src.core.config import rag as rag_config
+from src.core.config.database import vector_store_settings
+
+try:
+    import hnswlib
+except ImportError:  # 可选依赖：未安装时所有分区都使用精确检索
+    hnswlib = None
+
+
+# 可在 SQL 中直接过滤的元数据字段（带索引）
+_COLUMNS = ("knowledge_base_id", "conversation_id", "file_id")
+_DEFAULT_PARTITION = "default"
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class LocalVectorStore(BaseVectorStore):
+    """基于内存映射文件的本地向量存储"""
+
+    _instance: Optional["LocalVectorStore"] = None
+
+    def __new__(cls, *args, **kwargs):
+        """单例模式：同一进程共享内存映射和索引缓存"""
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self, path: Optional[str] = None):
+        # 避免重复初始化
+        if hasattr(self, "_initialized") and self._initialized:
+            return
+
+        self._path = Path(path or vector_store_settings.local_path)
+        self._path.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self._path / "meta.db", check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS partitions (
+                name TEXT PRIMARY KEY,
+                dim INTEGER NOT NULL,
+                rows INTEGER NOT NULL,
+                version INTEGER NOT NULL,
+                generation INTEGER NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS vectors (
+                id TEXT NOT NULL,
+                partition TEXT NOT NULL,
+                row INTEGER NOT NULL,
+                knowledge_base_id INTEGER,
+                conversation_id INTEGER,
+                file_id INTEGER,
+                document TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        # 覆盖写入时旧行只标记删除，ID 只需在未删除的行中唯一
+        self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_vectors_id ON vectors (id) WHERE deleted = 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_vectors_row ON vectors (partition, row)")
+        for column in _COLUMNS:
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_vectors_{column} ON vectors ({column})")
+        self._conn.commit()
+
+        # 进程内缓存：分区 -> (版本, 内存映射)，(分区, 版本, 过滤条件) -> 候选行号，分区 -> (已加入行数, HNSW 索引)
+        self._matrices: Dict[str, Tuple[int, np.ndarray]] = {}
+        self._candidates: "OrderedDict[tuple, Optional[np.ndarray]]" = OrderedDict()
+        self._ann: Dict[str, Tuple[int, int, object]] = {}
+        self._stats = ScopeStats(str(self._path / "scope_stats.db"))
+        self._lexical_index = (
+            LexicalIndex(str(self._path / "lexical.db")) if rag_config.hybrid_enabled else None
+        )
+        self._initialized = True
+
+    # ==================== 分区与文件 ====================
+
+    @staticmethod
+    def _partition_name(metadata: Optional[dict]) -> str:
+        """根据分块元数据确定所在分区"""
+        if metadata:
+            if metadata.get("knowledge_base_id") is not None:
+                return f"kb_{metadata['knowledge_base_id']}"
+            if metadata.get("conversation_id") is not None:
+                return f"conv_{metadata['conversation_id']}"
+        return _DEFAULT_PARTITION
+
+    def _vector_file(self, name: str, generation: int) -> Path:
+        return self._path / name / f"vectors.{generation}.f32"
+
+    def _ann_file(self, name: str, generation: int) -> Path:
+        return self._path / name / f"hnsw.{generation}.bin"
+
+    @contextmanager
+    def _write_lock(self):
+        """写入锁：进程内用线程锁，跨 worker 进程用文件锁"""
+        with self._lock, open(self._path / ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            except Exception:
+                self._conn.rollback()
+                raise
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _partition_info(self, name: str) -> Optional[tuple]:
+        """返回分区的 (dim, rows, version, generation)"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT dim, rows, version, generation FROM partitions WHERE name = ?", (name,)
+            ).fetchone()
+
+    def _partition_names(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT name FROM partitions")]
+
+    def _route(self, where: Optional[dict]) -> List[str]:
+        """根据过滤条件确定需要访问的分区；无法从条件中确定范围时访问所有分区"""
+        names = scope_partitions(where)
+        return self._partition_names() if names is None else names
+
+    def _matrix(self, name: str, info: tuple) -> np.ndarray:
+        """获取分区向量的只读内存映射（版本变化时重新映射）"""
+        dim, rows, version, generation = info
+        cached = self._matrices.get(name)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        if rows == 0:
+            matrix = np.empty((0, dim), dtype=np.float32)
+        else:
+            matrix = np.memmap(self._vector_file(name, generation), dtype=np.float32, mode="r", shape=(rows, dim))
+        self._matrices[name] = (version, matrix)
+        return matrix
+
+    @staticmethod
+    def _prefilter(where: Optional[dict]) -> tuple:
+        """把过滤条件中可直接用索引列表达的部分转换为 SQL（其余条件在 Python 中校验）"""
+        clauses, params = [], []
+        for column in _COLUMNS:
+            values = scope_values(where, column)
+            if values is not None:
+                clauses.append(f"{column} IN ({','.join('?' * len(values))})")
+                params.extend(values)
+        return "".join(f" AND {clause}" for clause in clauses), params
+
+    def _candidate_rows(self, name: str, info: tuple, where: Optional[dict]) -> Optional[np.ndarray]:
+        """
+        满足过滤条件且未删除的行号（按分区版本缓存）
+
+        Returns:
+            行号数组；分区所有行都满足条件时返回 None（检索时不需要过滤）
+        """
+        key = (name, info[2], json.dumps(where, sort_keys=True))
+        with self._lock:
+            if key in self._candidates:
+                self._candidates.move_to_end(key)
+                return self._candidates[key]
+
+            sql, params = self._prefilter(where)
+            rows = self._conn.execute(
+                f"SELECT row, metadata FROM vectors WHERE partition = ? AND deleted = 0{sql} ORDER BY row",
+                [name, *params],
+            ).fetchall()
+            selected = np.fromiter(
+                (row for row, metadata in rows if match_where(json.loads(metadata), where)),
+                dtype=np.int64,
+            )
+            candidates = None if len(selected) == info[1] else selected
+
+            self._candidates[key] = candidates
+            while len(self._candidates) > 1024:
+                self._candidates.popitem(last=False)
+        return candidates
+
+    # ==================== HNSW 索引 ====================
+
+    def _ann_index(self, name: str, info: tuple, matrix: np.ndarray):
+        """获取分区的 HNSW 索引；未安装 hnswlib 或分区较小时返回 None"""
+        dim, rows, _, generation = info
+        if hnswlib is None or rows <= vector_store_settings.ann_threshold:
+            return None
+
+        with self._lock:
+            cached = self._ann.get(name)
+            if cached is not None and cached[0] == generation:
+                _, loaded, index = cached
+            else:
+                index = hnswlib.Index(space="cosine", dim=dim)
+                path = self._ann_file(name, generation)
+                if path.exists():
+                    index.load_index(str(path), max_elements=rows)
+                else:
+                    index.init_index(
+                        max_elements=rows,
+                        M=vector_store_settings.hnsw_m,
+                        ef_construction=vector_store_settings.hnsw_ef_construction,
+                    )
+                loaded = index.get_current_count()
+
+            # 补充其他进程在索引文件保存之后追加的向量
+            if loaded < rows:
+                index.resize_index(rows)
+                index.add_items(np.asarray(matrix[loaded:rows]), np.arange(loaded, rows))
+                loaded = rows
+            self._ann[name] = (generation, loaded, index)
+            return index
+
+    def _save_ann_index(self, name: str) -> None:
+        """写入后保存分区的 HNSW 索引，其他进程加载时无需重建"""
+        info = self._partition_info(name)
+        if info is None:
+            return
+        index = self._ann_index(name, info, self._matrix(name, info))
+        if index is not None:
+            path = self._ann_file(name, info[3])
+            tmp_path = path.with_suffix(".tmp")
+            index.save_index(str(tmp_path))
+            os.replace(tmp_path, path)
+
+    # ==================== 写入 ====================
+
+    def _bump_versions(self, names) -> None:
+        self._conn.executemany(
+            "UPDATE partitions SET version = version + 1 WHERE name = ?", [(name,) for name in set(names)]
+        )
+
+    def _ids_partitions(self, ids: List[str]) -> List[str]:
+        names = set()
+        for i in range(0, len(ids), 500):
+            part = ids[i:i + 500]
+            names.update(
+                row[0] for row in self._conn.execute(
+                    f"SELECT DISTINCT partition FROM vectors WHERE deleted = 0 AND id IN ({','.join('?' * len(part))})", part
+                )
+            )
+        return list(names)
+
+    def add_vectors(
+        self,
+        vectors: np.ndarray,
+        documents: List[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None
+    ) -> List[str]:
+        """添加向量：按分区追加写入向量文件并记录元数据，ID 已存在时覆盖"""
+        if ids is None:
+            ids = [str(uuid.uuid4()) for _ in range(len(documents))]
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32).reshape(len(documents), -1))
+
+        groups: Dict[str, List[int]] = {}
+        for i in range(len(documents)):
+            groups.setdefault(self._partition_name(metadatas[i] if metadatas else None), []).append(i)
+
+        with self._write_lock():
+            # 覆盖已有 ID：旧行标记删除
+            overwritten = self._delete_ids(ids)
+            for name, rows in groups.items():
+                info = self._conn.execute(
+                    "SELECT dim, rows, generation FROM partitions WHERE name = ?", (name,)
+                ).fetchone()
+                if info is None:
+                    dim, start, generation = vectors.shape[1], 0, 0
+                    self._conn.execute(
+                        "INSERT INTO partitions (name, dim, rows, version, generation) VALUES (?, ?, 0, 0, 0)",
+                        (name, dim),
+                    )
+                else:
+                    dim, start, generation = info
+                    if dim != vectors.shape[1]:
+                        raise ValueError(f"分区 {name} 的向量维度为 {dim}，写入的向量维度为 {vectors.shape[1]}")
+
+                path = self._vector_file(name, generation)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                with open(path, "ab") as f:
+                    # 上次写入中断时文件末尾可能有未提交的数据，先截断到已提交的行数
+                    f.truncate(start * dim * 4)
+                    f.write(np.ascontiguousarray(vectors[rows]).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                self._conn.executemany(
+                    "INSERT INTO vectors (id, partition, row, knowledge_base_id, conversation_id, file_id, "
+                    "document, metadata) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (
+                            ids[i],
+                            name,
+                            start + offset,
+                            *((metadatas[i] or {}).get(column) if metadatas else None for column in _COLUMNS),
+                            documents[i],
+                            json.dumps((metadatas[i] if metadatas else None) or {}, ensure_ascii=False),
+                        )
+                        for offset, i in enumerate(rows)
+                    ],
+                )
+                self._conn.execute(
+                    "UPDATE partitions SET rows = rows + ?, version = version + 1 WHERE name = ?",
+                    (len(rows), name),
+                )
+            self._conn.commit()
+
+            for name in groups:
+                self._save_ann_index(name)
+
+        self._stats.remove(*overwritten)
+        self._stats.add(metadatas, documents, vectors.shape[1])
+        if self._lexical_index:
+            self._lexical_index.add(ids, documents, metadatas)
+        return ids
+
+    def update_metadatas(self, ids: List[str], metadatas: List[dict]) -> None:
+        """更新指定 ID 的元数据"""
+        with self._write_lock():
+            self._conn.executemany(
+                "UPDATE vectors SET metadata = ?, knowledge_base_id = ?, conversation_id = ?, file_id = ? "
+                "WHERE id = ? AND deleted = 0",
+                [
+                    (json.dumps(metadata, ensure_ascii=False), *(metadata.get(column) for column in _COLUMNS), chunk_id)
+                    for chunk_id, metadata in zip(ids, metadatas)
+                ],
+            )
+            self._bump_versions(self._ids_partitions(ids))
+            self._conn.commit()
+        if self._lexical_index:
+            self._lexical_index.update_metadatas(ids, metadatas)
+
+    # ==================== 检索 ====================
+
+    def _search_partition(
+        self,
+        name: str,
+        embeddings: np.ndarray,
+        where: Optional[dict],
+        n_results: int,
+        include_embeddings: bool = False
+    ) -> List[List[SearchHit]]:
+        """在单个分区中检索"""
+        empty = [[] for _ in range(len(embeddings))]
+        info = self._partition_info(name)
+        if info is None or info[1] == 0:
+            return empty
+
+        matrix = self._matrix(name, info)
+        candidates = self._candidate_rows(name, info, where)
+        if candidates is not None and len(candidates) == 0:
+            return empty
+
+        matches: List[List[Tuple[int, float]]] = []
+        index = self._ann_index(name, info, matrix)
+        if index is not None:
+            allowed = None if candidates is None else set(candidates.tolist())
+            k = min(n_results, info[1] if allowed is None else len(allowed))
+            try:
+                index.set_ef(max(vector_store_settings.hnsw_ef, k))
+                labels, distances = index.knn_query(
+                    embeddings, k=k, filter=None if allowed is None else allowed.__contains__
+                )
+                matches = [
+                    [(int(label), float(distance)) for label, distance in zip(row_labels, row_distances)]
+                    for row_labels, row_distances in zip(labels, distances)
+                ]
+            except RuntimeError:
+                # 过滤条件过严时 HNSW 可能找不到足够的结果，退回精确检索
+                index = None
+
+        if index is None:
+            rows = np.arange(info[1]) if candidates is None else candidates
+            subset = matrix if candidates is None else matrix[candidates]
+            similarities = _normalize(embeddings) @ np.asarray(subset).T
+            k = min(n_results, len(rows))
+            for row_similarities in similarities:
+                top = np.argpartition(-row_similarities, k - 1)[:k] if k < len(rows) else np.arange(len(rows))
+                top = top[np.argsort(-row_similarities[top], kind="stable")]
+                matches.append([(int(rows[j]), float(1.0 - row_similarities[j])) for j in top])
+
+        # 读取命中行的文档和元数据
+        needed = sorted({row for row_matches in matches for row, _ in row_matches})
+        found: Dict[int, tuple] = {}
+        with self._lock:
+            # compact 会重新编号，检索期间其他进程完成了 compact 时按新世代重新检索
+            current = self._conn.execute("SELECT generation FROM partitions WHERE name = ?", (name,)).fetchone()
+            if current is None:
+                return empty
+            if current[0] != info[3]:
+                return self._search_partition(name, embeddings, where, n_results, include_embeddings)
+            for i in range(0, len(needed), 500):
+                part = needed[i:i + 500]
+                for row, chunk_id, document, metadata in self._conn.execute(
+                    f"SELECT row, id, document, metadata FROM vectors "
+                    f"WHERE partition = ? AND deleted = 0 AND row IN ({','.join('?' * len(part))})",
+                    [name, *part],
+                ):
+                    found[row] = (chunk_id, document, json.loads(metadata))
+
+        return [
+            [
+                SearchHit(
+                    found[row][0], found[row][1], distance, found[row][2],
+                    np.array(matrix[row]) if include_embeddings else None
+                )
+                for row, distance in row_matches if row in found
+            ]
+            for row_matches in matches
+        ]
+
+    def query(self, requests: List[SearchRequest]) -> List[List[SearchHit]]:
+        """
+        批量检索
+
+        过滤条件相同的请求合并为一次矩阵运算，只访问过滤条件涉及的分区，多个分区的结果按距离合并。
+        """
+        output: List[List[SearchHit]] = [[] for _ in requests]
+
+        groups: Dict[str, List[int]] = {}
+        for i, request in enumerate(requests):
+            groups.setdefault(json.dumps(request.where, sort_keys=True), []).append(i)
+
+        for indices in groups.values():
+            where = requests[indices[0]].where
+            embeddings = np.vstack([requests[i].query_vector for i in indices]).astype(np.float32)
+            n_results = max(requests[i].top_k for i in indices)
+            include_embeddings = any(requests[i].include_embeddings for i in indices)
+
+            merged: List[List[SearchHit]] = [[] for _ in indices]
+            for name in self._route(where):
+                hits_by_query = self._search_partition(name, embeddings, where, n_results, include_embeddings)
+                for position, hits in enumerate(hits_by_query):
+                    merged[position].extend(hits)
+
+            for position, i in enumerate(indices):
+                hits = sorted(merged[position], key=lambda hit: hit.distance)
+                output[i] = hits[:requests[i].top_k]
+
+        return output
+
+    def lexical_query(self, query: str, where: Optional[dict] = None, top_k: int = 5) -> List[LexicalHit]:
+        """BM25 词法检索（未启用混合检索时返回空列表）"""
+        if not self._lexical_index:
+            return []
+        return self._lexical_index.search(query, where, top_k)
+
+    # ==================== 删除 ====================
+
+    def _delete_ids(self, ids: List[str]) -> tuple:
+        """标记删除指定 ID，返回被删除分块的 (metadatas, documents) 用于修正统计"""
+        names = self._ids_partitions(ids)
+        metadatas, documents = [], []
+        for i in range(0, len(ids), 500):
+            part = ids[i:i + 500]
+            placeholders = ",".join("?" * len(part))
+            for metadata, document in self._conn.execute(
+                f"SELECT metadata, document FROM vectors WHERE deleted = 0 AND id IN ({placeholders})", part
+            ):
+                metadatas.append(json.loads(metadata))
+                documents.append(document)
+            self._conn.execute(
+                f"UPDATE vectors SET deleted = 1 WHERE deleted = 0 AND id IN ({placeholders})", part
+            )
+        self._bump_versions(names)
+        return metadatas, documents
+
+    def delete(self, ids: List[str], where: Optional[dict] = None) -> bool:
+        """删除指定 ID 的向量（标记删除，compact 时物理清除；按 ID 索引定位分区，不需要 where 路由）"""
+        try:
+            with self._write_lock():
+                removed = self._delete_ids(ids)
+                self._conn.commit()
+            self._stats.remove(*removed)
+            if self._lexical_index:
+                self._lexical_index.delete(ids)
+            return True
+        except Exception:
+            return False
+
+    def delete_by_metadata(self, where: dict) -> bool:
+        """根据元数据条件删除向量（标记删除，compact 时物理清除）"""
+        try:
+            removed: tuple = ([], [])
+            with self._write_lock():
+                names = self._route(where)
+                key, value = next(iter(where.items()))
+                if len(where) == 1 and key in SCOPE_KEYS and not isinstance(value, dict):
+                    # 条件恰好对应整个分区（只按分区字段判断：其他字段即使只路由到一个分区，也只删除匹配的行）
+                    self._conn.execute("UPDATE vectors SET deleted = 1 WHERE partition = ?", (names[0],))
+                else:
+                    sql, params = self._prefilter(where)
+                    for name in names:
+                        rows = self._conn.execute(
+                            f"SELECT id, metadata, document FROM vectors WHERE partition = ? AND deleted = 0{sql}",
+                            [name, *params],
+                        ).fetchall()
+                        rows = [
+                            (chunk_id, json.loads(metadata), document) for chunk_id, metadata, document in rows
+                        ]
+                        rows = [row for row in rows if match_where(row[1], where)]
+                        self._conn.executemany(
+                            "UPDATE vectors SET deleted = 1 WHERE id = ? AND deleted = 0",
+                            [(row[0],) for row in rows],
+                        )
+                        removed[0].extend(row[1] for row in rows)
+                        removed[1].extend(row[2] for row in rows)
+                self._bump_versions(names)
+                self._conn.commit()
+            # 条件只涉及统计字段时直接删除统计行，否则按被删除的分块修正
+            if self._stats.covers(where):
+                self._stats.remove_where(where)
+            else:
+                self._stats.remove(*removed)
+            if self._lexical_index:
+                self._lexical_index.delete_where(where)
+            return True
+        except Exception:
+            return False
+
+    def compact(self) -> int:
+        """
+        物理清除已标记删除的向量
+
+        存在删除行的分区重写为新世代的向量文件并重新编号；分区为空时删除整个分区目录。
+
+        Returns:
+            重写的分区数量
+        """
+        with self._write_lock():
+            names = [
+                row[0] for row in self._conn.execute("SELECT DISTINCT partition FROM vectors WHERE deleted = 1")
+            ]
+            for name in names:
+                dim, rows, _, generation = self._partition_info(name)
+                live = self._conn.execute(
+                    "SELECT id, row FROM vectors WHERE partition = ? AND deleted = 0 ORDER BY row", (name,)
+                ).fetchall()
+                self._conn.execute("DELETE FROM vectors WHERE partition = ? AND deleted = 1", (name,))
+
+                if not live:
+                    self._conn.execute("DELETE FROM partitions WHERE name = ?", (name,))
+                    self._conn.commit()
+                    shutil.rmtree(self._path / name, ignore_errors=True)
+                    continue
+
+                matrix = np.memmap(self._vector_file(name, generation), dtype=np.float32, mode="r", shape=(rows, dim))
+                new_path = self._vector_file(name, generation + 1)
+                with open(new_path, "wb") as f:
+                    f.write(np.ascontiguousarray(matrix[[row for _, row in live]]).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+                del matrix
+
+                self._conn.executemany(
+                    "UPDATE vectors SET row = ? WHERE id = ?",
+                    [(new_row, chunk_id) for new_row, (chunk_id, _) in enumerate(live)],
+                )
+                self._conn.execute(
+                    "UPDATE partitions SET rows = ?, version = version + 1, generation = ? WHERE name = ?",
+                    (len(live), generation + 1, name),
+                )
+                self._conn.commit()
+
+                # 旧世代文件：已映射的进程仍可读取，删除后空间在其释放映射时回收
+                self._vector_file(name, generation).unlink(missing_ok=True)
+                self._ann_file(name, generation).unlink(missing_ok=True)
+                self._save_ann_index(name)
+            return len(names)
+
+    # ==================== 查询 / 统计 ====================
+
+    def warmup(self, max_partitions: int) -> int:
+        """预读分区向量到页缓存并加载 HNSW 索引（按向量数量从大到小，最多 max_partitions 个）"""
+        with self._lock:
+            names = [
+                row[0] for row in self._conn.execute(
+                    "SELECT name FROM partitions WHERE rows > 0 ORDER BY rows DESC LIMIT ?", (max_partitions,)
+                )
+            ]
+        for name in names:
+            info = self._partition_info(name)
+            matrix = self._matrix(name, info)
+            float(np.asarray(matrix).sum())  # 顺序读取一遍，后续检索不再触发缺页
+            self._ann_index(name, info, matrix)
+        return len(names)
+
+    def get_by_file_id(self, file_id: int) -> dict:
+        """获取指定文件的所有向量数据"""
+        result = {"ids": [], "documents": [], "metadatas": [], "embeddings": []}
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, partition, row, document, metadata FROM vectors "
+                "WHERE file_id = ? AND deleted = 0 ORDER BY partition, row",
+                (file_id,),
+            ).fetchall()
+        for chunk_id, name, row, document, metadata in rows:
+            info = self._partition_info(name)
+            result["ids"].append(chunk_id)
+            result["documents"].append(document)
+            result["metadatas"].append(json.loads(metadata))
+            result["embeddings"].append(np.array(self._matrix(name, info)[row]))
+        return result
+
+    def count(self) -> int:
+        """返回未删除的向量数量"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM vectors WHERE deleted = 0").fetchone()[0]
+
+    def get_metadatas(self, where: dict) -> Dict[str, dict]:
+        """按条件读取未删除分块的 {ID: 元数据}"""
+        sql, params = self._prefilter(where)
+        found: Dict[str, dict] = {}
+        with self._lock:
+            for name in self._route(where):
+                for chunk_id, metadata in self._conn.execute(
+                    f"SELECT id, metadata FROM vectors WHERE partition = ? AND deleted = 0{sql}", [name, *params]
+                ):
+                    metadata = json.loads(metadata)
+                    if match_where(metadata, where):
+                        found[chunk_id] = metadata
+        return found
+
+    def scope_stats(self, key: Optional[str] = None, value=None) -> dict:
+        """范围统计（由增量计数器汇总，不扫描向量）；key 为 None 时返回全部数据的统计"""
+        return self._stats.summary(key, value)
@@ -0,0 +1,58 @@
+"""
+最大边际相关性（MMR）重排 - 在相关性和多样性之间取舍，减少内容几乎相同的相邻分块
+
+每一步选择 λ · 相关性 - (1 - λ) · 与已选结果的最大相似度 最高的候选。
+候选之间的相似度矩阵一次算出，之后每步只做向量化的最大值更新，复杂度 O(n² · d + k · n)。
+"""
+from typing import List, Optional
+
+import numpy as np
+
+
+def mmr_select(
+    relevance: np.ndarray,
+    embeddings: List[Optional[np.ndarray]],
+    top_k: int,
+    lambda_mult: float
+) -> List[int]:
+    """
+    按 MMR 选取结果
+
+    Args:
+        relevance: 候选的相关性分数（越大越相关）
+        embeddings: 候选的向量；为 None 的候选（如只有词法命中）视为与其他候选都不相似
+        top_k: 选取数量
+        lambda_mult: 相关性权重 λ（1 表示只看相关性，0 表示只看多样性）
+
+    Returns:
+        按选取顺序排列的候选下标
+    """
+    count = len(relevance)
+    top_k = min(top_k, count)
+    if top_k <= 0:
+        return []
+
+    dimension = next((len(e) for e in embeddings if e is not None), 0)
+    if dimension == 0:
+        return list(np.argsort(-relevance, kind="stable")[:top_k])
+
+    matrix = np.zeros((count, dimension), dtype=np.float32)
+    for i, embedding in enumerate(embeddings):
+        if embedding is not None:
+            matrix[i] = embedding
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.where(norms == 0, 1, norms)
+    similarity = matrix @ matrix.T
+
+    relevance = np.asarray(relevance, dtype=np.float32)
+    max_similarity = np.zeros(count, dtype=np.float32)
+    available = np.ones(count, dtype=bool)
+    selected: List[int] = []
+    for _ in range(top_k):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+    return selected
@@ -0,0 +1,228 @@
+"""
+远程向量存储客户端 - 通过 HTTP 访问独立的向量存储服务进程（VECTOR_STORE_MODE=remote）
+
+多个 uvicorn worker / 容器共享同一份 Chroma 数据目录时，每个进程各自打开持久化客户端会重复加载索引，
+并发写入还可能损坏数据。服务模式下由 src.ai.rag.vector_server 单独一个进程持有向量存储
+（以及词法索引、删除标记、统计和精确检索缓存），API 进程通过带连接池的异步 HTTP 客户端访问它。
+
+接口与 AsyncVectorStore 一致；向量以 base64 编码的 float32 字节传输，避免转换为 JSON 浮点数列表。
+"""
+import base64
+from dataclasses import asdict
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from src.ai.rag.lexical_index import LexicalHit
+from src.ai.rag.vector_store import SearchHit, SearchRequest, VectorWriteError
+from src.core.config.database import vector_store_settings
+
+
+# ==================== 编解码 ====================
+
+def encode_array(array: Optional[np.ndarray]) -> Optional[dict]:
+    """把 float32 矩阵编码为可 JSON 序列化的字典"""
+    if array is None:
+        return None
+    array = np.ascontiguousarray(array, dtype=np.float32)
+    return {"shape": list(array.shape), "data": base64.b64encode(array.tobytes()).decode("ascii")}
+
+
+def decode_array(payload: Optional[dict]) -> Optional[np.ndarray]:
+    """解码 encode_array 的结果"""
+    if payload is None:
+        return None
+    data = base64.b64decode(payload["data"])
+    return np.frombuffer(data, dtype=np.float32).reshape(payload["shape"])
+
+
+def encode_requests(requests: List[SearchRequest]) -> List[dict]:
+    return [
+        {
+            "query_vector": encode_array(request.query_vector),
+            "top_k": request.top_k,
+            "where": request.where,
+            "include_embeddings": request.include_embeddings,
+        }
+        for request in requests
+    ]
+
+
+def decode_requests(payload: List[dict]) -> List[SearchRequest]:
+    return [
+        SearchRequest(
+            decode_array(item["query_vector"]), item["top_k"], item["where"], item.get("include_embeddings", False)
+        )
+        for item in payload
+    ]
+
+
+# 携带共享密钥的请求头
+API_KEY_HEADER = "X-Vector-Store-Key"
+
+
+class RemoteVectorStoreError(Exception):
+    """向量存储服务返回错误"""
+
+
+class RemoteVectorStore:
+    """向量存储服务的异步客户端（接口与 AsyncVectorStore 一致）"""
+
+    def __init__(
+        self,
+        base_url: str,
+        max_connections: int,
+        timeout: float,
+        api_key: str = ""
+    ):
+        """
+        初始化客户端
+
+        Args:
+            base_url: 向量存储服务地址，如 http://vector_store:8100
+            max_connections: 连接池最大连接数（同时也是并发请求上限）
+            timeout: 单次请求超时（秒）
+            api_key: 与服务共享的密钥，每个请求都通过 X-Vector-Store-Key 头发送
+        """
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout,
+            headers={API_KEY_HEADER: api_key},
+        )
+
+    async def _call(self, method: str, **kwargs):
+        response = await self._client.post(f"/rpc/{method}", json=kwargs)
+        if response.status_code == 409:
+            # 分批写入部分失败：还原为本地异常，调用方可以获取成功 / 失败的 ID
+            error = response.json()
+            raise VectorWriteError(
+                written_ids=error["written_ids"],
+                failed_ids=error["failed_ids"],
+                errors=[RemoteVectorStoreError(error["error"])],
+            )
+        if response.status_code != 200:
+            raise RemoteVectorStoreError(f"向量存储服务调用 {method} 失败 ({response.status_code}): {response.text}")
+        return response.json()["result"]
+
+    async def add_vectors(
+        self,
+        vectors: np.ndarray,
+        documents: List[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None
+    ) -> List[str]:
+        """添加向量"""
+        return await self._call(
+            "add_vectors", vectors=encode_array(vectors), documents=documents, metadatas=metadatas, ids=ids
+        )
+
+    async def update_metadatas(self, ids: List[str], metadatas: List[dict]) -> None:
+        """更新元数据"""
+        await self._call("update_metadatas", ids=ids, metadatas=metadatas)
+
+    async def query(self, requests: List[SearchRequest]) -> List[List[SearchHit]]:
+        """批量检索"""
+        result = await self._call("query", requests=encode_requests(requests))
+        return [[hit_from_dict(hit) for hit in hits] for hits in result]
+
+    async def search_with_filter(
+        self,
+        query_vector: np.ndarray,
+        where: Optional[dict],
+        top_k: int = 5
+    ) -> List[tuple]:
+        """使用自定义过滤条件搜索"""
+        hits = (await self.query([SearchRequest(query_vector, top_k, where)]))[0]
+        return [hit.as_tuple() for hit in hits]
+
+    async def lexical_query(self, query: str, where: Optional[dict] = None, top_k: int = 5) -> List[LexicalHit]:
+        """BM25 词法检索"""
+        result = await self._call("lexical_query", query=query, where=where, top_k=top_k)
+        return [LexicalHit(**hit) for hit in result]
+
+    async def lexical_query_many(
+        self,
+        query: str,
+        wheres: List[Optional[dict]],
+        top_k: int = 5
+    ) -> List[List[LexicalHit]]:
+        """批量词法检索（一次请求）"""
+        result = await self._call("lexical_query_many", query=query, wheres=wheres, top_k=top_k)
+        return [[LexicalHit(**hit) for hit in hits] for hits in result]
+
+    async def delete(self, ids: List[str], where: Optional[dict] = None) -> bool:
+        """删除指定 ID 的向量"""
+        return await self._call("delete", ids=ids, where=where)
+
+    async def delete_by_metadata(self, where: dict) -> bool:
+        """根据元数据条件删除向量"""
+        return await self._call("delete_by_metadata", where=where)
+
+    async def delete_by_file_id(self, file_id: int) -> bool:
+        """删除指定文件的所有向量"""
+        return await self._call("delete_by_file_id", file_id=file_id)
+
+    async def mark_scope_deleted(self, key: str, value) -> None:
+        """标记整个范围已删除"""
+        await self._call("mark_scope_deleted", key=key, value=value)
+
+    async def compact(self) -> int:
+        """物理清除已标记删除的范围"""
+        return await self._call("compact")
+
+    async def get_metadatas(self, where: dict) -> Dict[str, dict]:
+        """按条件读取分块 ID 与元数据"""
+        return await self._call("get_metadatas", where=where)
+
+    async def get_by_file_id(self, file_id: int) -> dict:
+        """获取指定文件的所有向量数据"""
+        result = await self._call("get_by_file_id", file_id=file_id)
+        result["embeddings"] = list(decode_array(result["embeddings"]))
+        return result
+
+    async def count(self) -> int:
+        """返回向量数量"""
+        return await self._call("count")
+
+    async def warmup(self, max_partitions: int) -> int:
+        """预加载索引"""
+        return await self._call("warmup", max_partitions=max_partitions)
+
+    async def scope_stats(self, key: Optional[str] = None, value=None) -> dict:
+        """范围统计"""
+        return await self._call("scope_stats", key=key, value=value)
+
+    async def aclose(self) -> None:
+        """关闭连接池（应用退出时调用）"""
+        await self._client.aclose()
+
+
+def hit_to_dict(hit) -> dict:
+    """SearchHit / LexicalHit 转换为 JSON 字典"""
+    result = asdict(hit)
+    if isinstance(hit, SearchHit):
+        result["embedding"] = encode_array(hit.embedding)
+    return result
+
+
+def hit_from_dict(payload: dict) -> SearchHit:
+    """解码 hit_to_dict 编码的 SearchHit"""
+    return SearchHit(**{**payload, "embedding": decode_array(payload.get("embedding"))})
+
+
+_remote_store: Optional[RemoteVectorStore] = None
+
+
+def get_remote_vector_store() -> RemoteVectorStore:
+    """获取远程向量存储客户端单例（进程内共享连接池）"""
+    global _remote_store
+    if _remote_store is None:
+        _remote_store = RemoteVectorStore(
+            base_url=vector_store_settings.server_url,
+            max_connections=vector_store_settings.client_max_connections,
+            timeout=vector_store_settings.client_timeout,
+            api_key=vector_store_settings.api_key,
+        )
+    return _remote_store
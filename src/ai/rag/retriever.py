@@ -2,11 +2,24 @@
 检索器 - 从向量存储中检索相关文档
 """
 from abc import ABC, abstractmethod
-from typing import List, Optional
-from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Union
+from dataclasses import dataclass, field
 
-from src.ai.rag.embedding import Embedding
-from src.ai.rag.vector_store import ChromaVectorStore, get_vector_store
+import numpy as np
+
+from src.ai.embedding.base import BaseEmbedding
+from src.ai.embedding.cache import get_query_vector_cache
+from src.ai.rag.embedding import create_embedding
+from src.ai.rag.lexical_index import LexicalHit
+from src.ai.rag.mmr import mmr_select
+from src.ai.rag.vector_store import (
+    AsyncVectorStore,
+    BaseVectorStore,
+    SearchHit,
+    SearchRequest,
+    get_async_vector_store,
+)
+from src.core.config import rag as rag_config
 
 
 @dataclass
@@ -15,60 +28,254 @@ class RetrievalResult:
     content: str
     score: float
     metadata: dict
+    vector_score: Optional[float] = None  # 余弦相似度（向量检索命中时）
+    lexical_score: Optional[float] = None  # BM25 分数（词法检索命中时）
+    embedding: Optional[np.ndarray] = field(default=None, repr=False)  # 分块向量（MMR 重排时返回）
+
+
+def knowledge_base_where(knowledge_base_ids: List[int]) -> dict:
+    """知识库范围的过滤条件"""
+    return {
+        "$and": [
+            {"source_type": "knowledge_base"},
+            {"knowledge_base_id": {"$in": knowledge_base_ids}}
+        ]
+    }
+
+
+def result_scope(metadata: dict) -> Tuple[str, Optional[int]]:
+    """检索结果所属的范围：("knowledge_base_id", id) 或 ("conversation_id", id)"""
+    if metadata.get("knowledge_base_id") is not None:
+        return "knowledge_base_id", metadata["knowledge_base_id"]
+    return "conversation_id", metadata.get("conversation_id")
 
 
 class BaseRetriever(ABC):
     """检索器抽象基类"""
     
     @abstractmethod
-    def retrieve(self, query: str, top_k: int = 5) -> List[RetrievalResult]:
+    async def retrieve(self, query: str, top_k: int = 5) -> List[RetrievalResult]:
         """根据查询检索相关文档"""
         pass
 
 
 class DocumentRetriever(BaseRetriever):
-    """基于向量相似度的文档检索器"""
+    """
+    文档检索器
+
+    启用混合检索（RAG_HYBRID_ENABLED）时，BM25 词法检索与向量检索的结果按倒数排名融合（RRF），
+    融合分数归一化到 (0, 1]：在两路中都排第一的结果得分为 1。未启用时分数为余弦相似度。
+    启用 MMR（RAG_MMR_ENABLED）时多取候选，再按相关性与多样性选出最终结果，结果按选取顺序排列。
+    """
     
     def __init__(
         self, 
-        embedding: Optional[Embedding] = None,
-        vector_store: Optional[ChromaVectorStore] = None
+        embedding: Optional[BaseEmbedding] = None,
+        vector_store: Optional[Union[BaseVectorStore, AsyncVectorStore]] = None
     ):
-        self._embedding = embedding or Embedding()
-        self._vector_store = vector_store or get_vector_store()
+        self._embedding = embedding or create_embedding()
+        # 本地向量存储的调用统一通过异步封装在专用线程池中执行（remote 模式下为 HTTP 客户端）
+        vector_store = vector_store or get_async_vector_store()
+        if isinstance(vector_store, BaseVectorStore):
+            vector_store = AsyncVectorStore(vector_store)
+        self._vector_store = vector_store
+        self._query_cache = get_query_vector_cache()
+    
+    async def embed_query(self, query: str) -> np.ndarray:
+        """
+        将查询向量化，优先使用进程内的查询向量缓存
+        
+        同一请求内需要多次检索时，应调用一次本方法并把结果作为 query_vector 传入各检索方法。
+        """
+        model_name = self._embedding.model_name
+        query_vector = self._query_cache.get(model_name, query)
+        if query_vector is None:
+            query_vector = await self._embedding.embed_text(query)
+            self._query_cache.put(model_name, query, query_vector)
+        return query_vector
+    
+    @staticmethod
+    def _to_results(hits: List[SearchHit]) -> List[RetrievalResult]:
+        """将向量存储的检索结果转换为 RetrievalResult（余弦距离转相似度）"""
+        results = []
+        for hit in hits:
+            score = 1 - hit.distance if hit.distance is not None else 0
+            results.append(RetrievalResult(
+                content=hit.document,
+                score=score,
+                metadata=hit.metadata,
+                vector_score=score,
+                embedding=hit.embedding
+            ))
+        return results
     
-    def retrieve(self, query: str, top_k: int = 5) -> List[RetrievalResult]:
+    @staticmethod
+    def _fuse(
+        vector_hits: List[SearchHit],
+        lexical_hits: List[LexicalHit],
+        top_k: int,
+        lists: int = 2
+    ) -> List[RetrievalResult]:
+        """
+        倒数排名融合：score = Σ 1 / (k + rank)，再乘以 (k + 1) / lists 归一化
+        
+        Args:
+            vector_hits: 向量检索结果（按距离升序）
+            lexical_hits: 词法检索结果（按 BM25 分数降序）
+            top_k: 返回的最大结果数量
+            lists: 参与融合的检索路数
+        """
+        k = rag_config.rrf_k
+        fused: Dict[str, RetrievalResult] = {}
+        for rank, hit in enumerate(vector_hits, 1):
+            result = fused.setdefault(hit.id, RetrievalResult(hit.document, 0.0, hit.metadata))
+            result.vector_score = 1 - hit.distance if hit.distance is not None else None
+            result.embedding = hit.embedding
+            result.score += 1 / (k + rank)
+        for rank, hit in enumerate(lexical_hits, 1):
+            result = fused.setdefault(hit.id, RetrievalResult(hit.document, 0.0, hit.metadata))
+            result.lexical_score = hit.score
+            result.score += 1 / (k + rank)
+        
+        for result in fused.values():
+            result.score = result.score * (k + 1) / lists
+        return sorted(fused.values(), key=lambda r: r.score, reverse=True)[:top_k]
+    
+    @staticmethod
+    def _is_confident(lexical_hits: List[LexicalHit]) -> bool:
+        """
+        判断词法检索结果是否足够可信，可以跳过查询向量化
+        
+        最佳结果包含全部查询词项，且是唯一包含全部词项的结果，BM25 分数领先第二名足够多。
+        """
+        if not lexical_hits or lexical_hits[0].coverage < 1:
+            return False
+        if len(lexical_hits) == 1:
+            return True
+        best, second = lexical_hits[0], lexical_hits[1]
+        return second.coverage < 1 and best.score >= rag_config.lexical_confidence_margin * second.score
+    
+    @staticmethod
+    def _merge_lexical_hits(results: List[List[LexicalHit]]) -> List[LexicalHit]:
+        """合并多个范围的词法检索结果：按 ID 去重后按 BM25 分数降序排列（同一索引的分数在范围间可直接比较）"""
+        merged: Dict[str, LexicalHit] = {}
+        for hits in results:
+            for hit in hits:
+                merged.setdefault(hit.id, hit)
+        return sorted(merged.values(), key=lambda hit: hit.score, reverse=True)
+    
+    @staticmethod
+    def _merge_hits(results: List[List[SearchHit]]) -> List[SearchHit]:
+        """合并多个范围的向量检索结果：按 ID 去重后按距离升序排列（余弦距离在各范围间可直接比较）"""
+        merged: Dict[str, SearchHit] = {}
+        for hits in results:
+            for hit in hits:
+                merged.setdefault(hit.id, hit)
+        return sorted(merged.values(), key=lambda hit: hit.distance if hit.distance is not None else 2)
+    
+    async def _search(
+        self,
+        query: str,
+        where: Optional[dict],
+        top_k: int,
+        query_vector: Optional[np.ndarray] = None,
+        scope_wheres: Optional[List[dict]] = None,
+        limit: Optional[int] = None
+    ) -> List[RetrievalResult]:
+        """
+        在指定过滤范围内检索
+        
+        启用混合检索时先做词法检索：未提供查询向量且词法结果高置信时直接返回，省去一次 Embedding 请求；
+        否则再做向量检索并与词法结果融合。
+        
+        scope_wheres 非空时向量检索和词法检索都按范围拆分为多个请求，各自在同一次批量调用中完成
+        （每个请求只访问自己的范围，小范围仍走精确检索），每个范围都有自己的候选，结果分别按距离 / BM25 分数合并。
+        
+        Args:
+            top_k: 每个范围的检索数量
+            scope_wheres: 按范围拆分的过滤条件（可选）
+            limit: 返回的最大结果数量（默认 top_k）
+        """
+        scope_wheres = scope_wheres or [where]
+        limit = limit or top_k
+        mmr = rag_config.mmr_enabled
+        candidates = max(limit, rag_config.mmr_fetch_k) if mmr else limit
+        if not rag_config.hybrid_enabled:
+            if query_vector is None:
+                query_vector = await self.embed_query(query)
+            fetch_k = max(top_k, rag_config.mmr_fetch_k) if mmr else top_k
+            results = await self._vector_store.query(
+                [SearchRequest(query_vector, fetch_k, w, include_embeddings=mmr) for w in scope_wheres]
+            )
+            return self._diversify(self._to_results(self._merge_hits(results)[:candidates]), limit)
+        
+        fetch_k = max(top_k, rag_config.hybrid_fetch_k, rag_config.mmr_fetch_k if mmr else 0)
+        if len(scope_wheres) == 1:
+            lexical_hits = await self._vector_store.lexical_query(query, scope_wheres[0], max(limit, fetch_k))
+        else:
+            lexical_hits = self._merge_lexical_hits(
+                await self._vector_store.lexical_query_many(query, scope_wheres, fetch_k)
+            )
+        if query_vector is None and rag_config.lexical_skip_embedding and self._is_confident(lexical_hits):
+            return self._fuse([], lexical_hits, limit, lists=1)
+        
+        if query_vector is None:
+            query_vector = await self.embed_query(query)
+        results = await self._vector_store.query(
+            [SearchRequest(query_vector, fetch_k, w, include_embeddings=mmr) for w in scope_wheres]
+        )
+        return self._diversify(self._fuse(self._merge_hits(results), lexical_hits, candidates), limit)
+    
+    @staticmethod
+    def _diversify(results: List[RetrievalResult], limit: int) -> List[RetrievalResult]:
+        """MMR 重排：从候选中按相关性与多样性选出 limit 个结果（未启用或候选不足时直接截断）"""
+        if not rag_config.mmr_enabled or len(results) <= limit:
+            return results[:limit]
+        order = mmr_select(
+            np.array([result.score for result in results], dtype=np.float32),
+            [result.embedding for result in results],
+            limit,
+            rag_config.mmr_lambda
+        )
+        return [results[i] for i in order]
+    
+    async def search_many(self, requests: List[SearchRequest]) -> List[List[RetrievalResult]]:
+        """
+        批量检索：多个查询向量 / 多个范围在一次向量存储往返中完成
+        
+        Args:
+            requests: 检索请求列表（查询向量、过滤条件、top_k）
+            
+        Returns:
+            与 requests 一一对应的检索结果列表
+        """
+        return [self._to_results(hits) for hits in await self._vector_store.query(requests)]
+    
+    async def retrieve(
+        self,
+        query: str,
+        top_k: int = 5,
+        query_vector: Optional[np.ndarray] = None
+    ) -> List[RetrievalResult]:
         """
         检索与查询最相关的文档
         
         Args:
             query: 查询文本
             top_k: 返回的最大结果数量
+            query_vector: 预先计算好的查询向量（可选）
             
         Returns:
             检索结果列表，按相关性排序
         """
-        # 1. 将查询向量化
-        query_vector = self._embedding.embed_text(query)
-        
-        # 2. 在向量存储中搜索
-        results = self._vector_store.search(query_vector, top_k=top_k)
-        
-        # 3. 转换为 RetrievalResult 格式
-        return [
-            RetrievalResult(
-                content=doc,
-                score=1 - distance if distance is not None else 0,  # 余弦距离转相似度
-                metadata=metadata or {}
-            )
-            for doc, distance, metadata in results
-        ]
+        return await self._search(query, None, top_k, query_vector)
     
-    def retrieve_by_file_id(
+    async def retrieve_by_file_id(
         self, 
         query: str, 
         file_id: int, 
-        top_k: int = 5
+        top_k: int = 5,
+        query_vector: Optional[np.ndarray] = None
     ) -> List[RetrievalResult]:
         """
         在指定文件范围内检索
@@ -77,24 +284,16 @@ class DocumentRetriever(BaseRetriever):
             query: 查询文本
             file_id: 文件 ID
             top_k: 返回的最大结果数量
+            query_vector: 预先计算好的查询向量（可选）
         """
-        query_vector = self._embedding.embed_text(query)
-        results = self._vector_store.search_by_file_id(query_vector, file_id, top_k=top_k)
-        
-        return [
-            RetrievalResult(
-                content=doc,
-                score=1 - distance if distance is not None else 0,
-                metadata=metadata or {}
-            )
-            for doc, distance, metadata in results
-        ]
+        return await self._search(query, {"file_id": file_id}, top_k, query_vector)
     
-    def retrieve_by_file_ids(
+    async def retrieve_by_file_ids(
         self, 
         query: str, 
         file_ids: List[int], 
-        top_k: int = 5
+        top_k: int = 5,
+        query_vector: Optional[np.ndarray] = None
     ) -> List[RetrievalResult]:
         """
         在多个文件范围内检索
@@ -103,24 +302,16 @@ class DocumentRetriever(BaseRetriever):
             query: 查询文本
             file_ids: 文件 ID 列表
             top_k: 返回的最大结果数量
+            query_vector: 预先计算好的查询向量（可选）
         """
-        query_vector = self._embedding.embed_text(query)
-        results = self._vector_store.search_by_file_ids(query_vector, file_ids, top_k=top_k)
-        
-        return [
-            RetrievalResult(
-                content=doc,
-                score=1 - distance if distance is not None else 0,
-                metadata=metadata or {}
-            )
-            for doc, distance, metadata in results
-        ]
+        return await self._search(query, {"file_id": {"$in": file_ids}}, top_k, query_vector)
     
-    def retrieve_by_conversation(
+    async def retrieve_by_conversation(
         self,
         query: str,
         conversation_id: int,
-        top_k: int = 5
+        top_k: int = 5,
+        query_vector: Optional[np.ndarray] = None
     ) -> List[RetrievalResult]:
         """
         在指定会话范围内检索（只检索会话文件）
@@ -129,28 +320,16 @@ class DocumentRetriever(BaseRetriever):
             query: 查询文本
             conversation_id: 会话 ID
             top_k: 返回的最大结果数量
+            query_vector: 预先计算好的查询向量（可选）
         """
-        query_vector = self._embedding.embed_text(query)
-        results = self._vector_store.search_with_filter(
-            query_vector, 
-            where={"conversation_id": conversation_id},
-            top_k=top_k
-        )
-        
-        return [
-            RetrievalResult(
-                content=doc,
-                score=1 - distance if distance is not None else 0,
-                metadata=metadata or {}
-            )
-            for doc, distance, metadata in results
-        ]
+        return await self._search(query, {"conversation_id": conversation_id}, top_k, query_vector)
     
-    def retrieve_by_knowledge_base(
+    async def retrieve_by_knowledge_base(
         self,
         query: str,
         knowledge_base_ids: List[int],
-        top_k: int = 5
+        top_k: int = 5,
+        query_vector: Optional[np.ndarray] = None
     ) -> List[RetrievalResult]:
         """
         在指定知识库范围内检索
@@ -159,27 +338,99 @@ class DocumentRetriever(BaseRetriever):
             query: 查询文本
             knowledge_base_ids: 知识库 ID 列表
             top_k: 返回的最大结果数量
+            query_vector: 预先计算好的查询向量（可选）
         """
-        query_vector = self._embedding.embed_text(query)
-        
         # 构建查询条件：只检索指定的知识库
-        where = {
-            "$and": [
-                {"source_type": "knowledge_base"},
-                {"knowledge_base_id": {"$in": knowledge_base_ids}}
-            ]
-        }
-        
-        results = self._vector_store.search_with_filter(query_vector, where=where, top_k=top_k)
-        
-        return [
-            RetrievalResult(
-                content=doc,
-                score=1 - distance if distance is not None else 0,
-                metadata=metadata or {}
-            )
-            for doc, distance, metadata in results
-        ]
+        return await self._search(query, knowledge_base_where(knowledge_base_ids), top_k, query_vector)
+    
+    async def retrieve_by_scopes(
+        self,
+        query: str,
+        conversation_id: Optional[int] = None,
+        knowledge_base_ids: Optional[List[int]] = None,
+        top_k: int = 5,
+        query_vector: Optional[np.ndarray] = None,
+        min_per_scope: Optional[int] = None,
+        max_per_scope: Optional[int] = None
+    ) -> List[RetrievalResult]:
+        """
+        一次检索会话文件和多个知识库，结果统一排序
+        
+        只做一次查询向量化、一次批量词法检索和一次批量向量检索（都是每个范围一个请求），
+        各范围的结果合并后统一打分，分数在范围间可直接比较。
+        可以为每个范围（会话 / 单个知识库）设置最少和最多结果数，避免某个来源被完全挤出或占满上下文。
+        
+        Args:
+            query: 查询文本
+            conversation_id: 会话 ID（可选）
+            knowledge_base_ids: 知识库 ID 列表（可选）
+            top_k: 返回的最大结果数量
+            query_vector: 预先计算好的查询向量（可选）
+            min_per_scope: 每个范围至少保留的结果数（默认 RAG_SCOPE_MIN_RESULTS，0 表示不保留）
+            max_per_scope: 每个范围最多保留的结果数（默认 RAG_SCOPE_MAX_RESULTS，0 表示不限制）
+            
+        Returns:
+            检索结果列表，按相关性排序
+        """
+        scopes: List[Tuple[str, int]] = []
+        scope_wheres: List[dict] = []
+        if conversation_id:
+            scopes.append(("conversation_id", conversation_id))
+            scope_wheres.append({"conversation_id": conversation_id})
+        for knowledge_base_id in knowledge_base_ids or []:
+            scopes.append(("knowledge_base_id", knowledge_base_id))
+            scope_wheres.append(knowledge_base_where([knowledge_base_id]))
+        if not scopes:
+            return []
+        
+        where = scope_wheres[0] if len(scope_wheres) == 1 else {"$or": scope_wheres}
+        min_per_scope = rag_config.scope_min_results if min_per_scope is None else min_per_scope
+        max_per_scope = rag_config.scope_max_results if max_per_scope is None else max_per_scope
+        if len(scopes) == 1 or not (min_per_scope or max_per_scope):
+            return await self._search(query, where, top_k, query_vector, scope_wheres)
+        
+        # 设置了配额：多取候选，保证每个范围都有足够的结果可选
+        candidates = await self._search(query, where, top_k, query_vector, scope_wheres, limit=top_k * len(scopes))
+        return self._apply_quotas(candidates, scopes, top_k, min_per_scope, max_per_scope)
+    
+    @staticmethod
+    def _apply_quotas(
+        results: List[RetrievalResult],
+        scopes: List[Tuple[str, int]],
+        top_k: int,
+        min_per_scope: int,
+        max_per_scope: int
+    ) -> List[RetrievalResult]:
+        """
+        按范围配额选取结果：先为每个范围保留排名最靠前的 min_per_scope 个（总数超过 top_k 时按排名取舍），
+        再按排名填满剩余名额，每个范围不超过 max_per_scope 个
+        
+        results 的顺序即排名（启用 MMR 时为选取顺序），返回的结果保持该顺序，不按分数重新排序。
+        """
+        if max_per_scope:
+            min_per_scope = min(min_per_scope, max_per_scope)
+        position = {id(result): i for i, result in enumerate(results)}
+        by_scope: Dict[Tuple[str, int], List[RetrievalResult]] = {scope: [] for scope in scopes}
+        for result in results:
+            by_scope.setdefault(result_scope(result.metadata), []).append(result)
+        
+        reserved = [result for scope in scopes for result in by_scope[scope][:min_per_scope]]
+        selected = sorted(reserved, key=lambda r: position[id(r)])[:top_k]
+        chosen = {id(result) for result in selected}
+        counts: Dict[Tuple[str, int], int] = {}
+        for result in selected:
+            scope = result_scope(result.metadata)
+            counts[scope] = counts.get(scope, 0) + 1
+        
+        for result in results:
+            if len(selected) >= top_k:
+                break
+            scope = result_scope(result.metadata)
+            if id(result) in chosen or (max_per_scope and counts.get(scope, 0) >= max_per_scope):
+                continue
+            selected.append(result)
+            counts[scope] = counts.get(scope, 0) + 1
+        return sorted(selected, key=lambda r: position[id(r)])
     
     def format_context(self, results: List[RetrievalResult], separator: str = "\n\n---\n\n") -> str:
         """
@@ -201,8 +452,8 @@ class DocumentRetriever(BaseRetriever):
 
 # 便捷函数
 def get_retriever(
-    embedding: Optional[Embedding] = None,
-    vector_store: Optional[ChromaVectorStore] = None
+    embedding: Optional[BaseEmbedding] = None,
+    vector_store: Optional[Union[BaseVectorStore, AsyncVectorStore]] = None
 ) -> DocumentRetriever:
     """获取检索器实例"""
     return DocumentRetriever(embedding, vector_store)
@@ -0,0 +1,201 @@
+"""
+范围统计 - 按用户 / 知识库 / 会话统计向量数量、占用字节数和分块大小分布
+
+统计随向量存储的写入 / 删除增量维护，查询时不需要扫描向量。计数按
+(用户, 知识库, 会话, 文件, 分块大小区间) 聚合为一行，行数与文件数成正比而与分块数无关；
+按文件或范围删除时直接删除对应的行，不需要读取被删除分块的元数据。
+"""
+import bisect
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from src.ai.rag.filters import match_where, scope_values
+
+
+# 参与聚合的元数据字段
+STAT_COLUMNS = ("user_id", "knowledge_base_id", "conversation_id", "file_id")
+# 分块大小区间的边界（字符数）
+CHUNK_SIZE_BOUNDARIES = (128, 256, 512, 1024, 2048)
+
+
+def _bucket_label(bucket: int) -> str:
+    if bucket == 0:
+        return f"<{CHUNK_SIZE_BOUNDARIES[0]}"
+    if bucket == len(CHUNK_SIZE_BOUNDARIES):
+        return f">={CHUNK_SIZE_BOUNDARIES[-1]}"
+    return f"{CHUNK_SIZE_BOUNDARIES[bucket - 1]}-{CHUNK_SIZE_BOUNDARIES[bucket] - 1}"
+
+
+def _where_keys(where: Any) -> set:
+    """收集过滤条件中引用的元数据字段"""
+    keys = set()
+    if isinstance(where, dict):
+        for key, value in where.items():
+            if key in ("$and", "$or"):
+                for item in value:
+                    keys |= _where_keys(item)
+            else:
+                keys.add(key)
+    return keys
+
+
+class ScopeStats:
+    """基于 SQLite 持久化的范围统计计数器"""
+
+    def __init__(self, path: str):
+        """
+        初始化范围统计
+
+        Args:
+            path: SQLite 数据库文件路径
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS scope_stats (
+                key TEXT PRIMARY KEY,
+                user_id INTEGER,
+                knowledge_base_id INTEGER,
+                conversation_id INTEGER,
+                file_id INTEGER,
+                bucket INTEGER NOT NULL,
+                vectors INTEGER NOT NULL,
+                vector_bytes INTEGER NOT NULL,
+                document_bytes INTEGER NOT NULL,
+                document_chars INTEGER NOT NULL
+            )
+            """
+        )
+        for column in STAT_COLUMNS:
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_scope_stats_{column} ON scope_stats ({column})")
+        self._conn.commit()
+
+    @staticmethod
+    def _group(metadatas: Optional[List[dict]], documents: List[str]) -> Dict[tuple, List[int]]:
+        """按 (范围字段..., 分块大小区间) 汇总分块：返回 {key: [分块数, 文档字节数, 文档字符数]}"""
+        groups: Dict[tuple, List[int]] = {}
+        for i, document in enumerate(documents):
+            metadata = (metadatas[i] if metadatas else None) or {}
+            bucket = bisect.bisect_right(CHUNK_SIZE_BOUNDARIES, len(document))
+            key = (*(metadata.get(column) for column in STAT_COLUMNS), bucket)
+            totals = groups.setdefault(key, [0, 0, 0])
+            totals[0] += 1
+            totals[1] += len(document.encode("utf-8"))
+            totals[2] += len(document)
+        return groups
+
+    # ==================== 写入 ====================
+
+    def add(self, metadatas: Optional[List[dict]], documents: List[str], dimension: int) -> None:
+        """记录新写入的分块（dimension 为向量维度，按 float32 计算字节数）"""
+        groups = self._group(metadatas, documents)
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO scope_stats (key, user_id, knowledge_base_id, conversation_id, file_id, bucket, "
+                "vectors, vector_bytes, document_bytes, document_chars) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET vectors = vectors + excluded.vectors, "
+                "vector_bytes = vector_bytes + excluded.vector_bytes, "
+                "document_bytes = document_bytes + excluded.document_bytes, "
+                "document_chars = document_chars + excluded.document_chars",
+                [
+                    (json.dumps(key), *key, count, count * dimension * 4, size, chars)
+                    for key, (count, size, chars) in groups.items()
+                ],
+            )
+            self._conn.commit()
+
+    def remove(self, metadatas: Optional[List[dict]], documents: List[str]) -> None:
+        """记录被删除的分块（按 ID 删除、覆盖写入等无法按范围删除的情况）"""
+        groups = self._group(metadatas, documents)
+        with self._lock:
+            for key, (count, size, chars) in groups.items():
+                row = self._conn.execute(
+                    "SELECT vectors, vector_bytes FROM scope_stats WHERE key = ?", (json.dumps(key),)
+                ).fetchone()
+                if row is None:
+                    continue
+                if row[0] <= count:
+                    self._conn.execute("DELETE FROM scope_stats WHERE key = ?", (json.dumps(key),))
+                    continue
+                self._conn.execute(
+                    "UPDATE scope_stats SET vectors = vectors - ?, vector_bytes = vector_bytes - ?, "
+                    "document_bytes = MAX(document_bytes - ?, 0), document_chars = MAX(document_chars - ?, 0) "
+                    "WHERE key = ?",
+                    (count, row[1] // row[0] * count, size, chars, json.dumps(key)),
+                )
+            self._conn.commit()
+
+    @staticmethod
+    def covers(where: dict) -> bool:
+        """过滤条件是否只引用统计字段（是则可以直接按条件删除统计行）"""
+        return bool(where) and _where_keys(where) <= set(STAT_COLUMNS)
+
+    def remove_where(self, where: dict) -> None:
+        """按过滤条件删除统计行（条件只能引用统计字段，见 covers）"""
+        clauses, params = ["1 = 1"], []
+        for column in STAT_COLUMNS:
+            values = scope_values(where, column)
+            if values is not None:
+                clauses.append(f"{column} IN ({','.join('?' * len(values))})")
+                params.extend(values)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, {', '.join(STAT_COLUMNS)} FROM scope_stats WHERE {' AND '.join(clauses)}", params
+            ).fetchall()
+            self._conn.executemany(
+                "DELETE FROM scope_stats WHERE key = ?",
+                [(row[0],) for row in rows if match_where(dict(zip(STAT_COLUMNS, row[1:])), where)],
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        """清空统计"""
+        with self._lock:
+            self._conn.execute("DELETE FROM scope_stats")
+            self._conn.commit()
+
+    # ==================== 查询 ====================
+
+    def summary(self, key: Optional[str] = None, value: Any = None) -> dict:
+        """
+        汇总一个范围的统计
+
+        Args:
+            key: 范围字段（user_id / knowledge_base_id / conversation_id / file_id），None 表示全部数据
+            value: 范围取值
+
+        Returns:
+            向量数量、向量与文档字节数、文件数、平均分块字符数和分块大小分布
+        """
+        if key is not None and key not in STAT_COLUMNS:
+            raise ValueError(f"只支持按以下字段统计: {STAT_COLUMNS}")
+        sql, params = ("", []) if key is None else (f" WHERE {key} = ?", [value])
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT bucket, SUM(vectors), SUM(vector_bytes), SUM(document_bytes), SUM(document_chars) "
+                f"FROM scope_stats{sql} GROUP BY bucket",
+                params,
+            ).fetchall()
+            files = self._conn.execute(
+                f"SELECT COUNT(DISTINCT file_id) FROM scope_stats{sql}", params
+            ).fetchone()[0]
+
+        vectors = sum(row[1] for row in rows)
+        chars = sum(row[4] for row in rows)
+        distribution = {_bucket_label(bucket): 0 for bucket in range(len(CHUNK_SIZE_BOUNDARIES) + 1)}
+        for row in rows:
+            distribution[_bucket_label(row[0])] = row[1]
+        return {
+            "vectors": vectors,
+            "vector_bytes": sum(row[2] for row in rows),
+            "document_bytes": sum(row[3] for row in rows),
+            "files": files,
+            "avg_chunk_chars": round(chars / vectors, 1) if vectors else 0,
+            "chunk_size_distribution": distribution,
+        }
@@ -0,0 +1,70 @@
+"""
+删除标记 - 记录已删除但尚未物理清除的范围（知识库 / 会话）
+
+删除大范围的向量需要扫描元数据并重写索引，耗时与范围大小成正比。
+删除请求只写入一条标记并立即在检索时过滤，物理清除交给后台任务。
+"""
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from src.ai.rag.filters import SCOPE_KEYS
+
+
+class TombstoneStore:
+    """基于 SQLite 持久化的删除标记集合，进程内保留一份只读快照供检索时过滤"""
+
+    def __init__(self, path: str):
+        """
+        初始化删除标记存储
+
+        Args:
+            path: SQLite 数据库文件路径
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tombstones (
+                scope_key TEXT NOT NULL,
+                scope_value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (scope_key, scope_value)
+            )
+            """
+        )
+        self._conn.commit()
+        rows = self._conn.execute("SELECT scope_key, scope_value FROM tombstones").fetchall()
+        self._tags = frozenset((key, json.loads(value)) for key, value in rows)
+
+    @property
+    def tags(self) -> frozenset:
+        """已删除范围的标签集合，如 {("knowledge_base_id", 5)}"""
+        return self._tags
+
+    def add(self, key: str, value: Any) -> None:
+        """标记范围已删除"""
+        if key not in SCOPE_KEYS:
+            raise ValueError(f"只支持按范围标记删除: {SCOPE_KEYS}")
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO tombstones (scope_key, scope_value, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time()),
+            )
+            self._conn.commit()
+            self._tags = self._tags | {(key, value)}
+
+    def remove(self, key: str, value: Any) -> None:
+        """物理清除完成后移除标记"""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM tombstones WHERE scope_key = ? AND scope_value = ?",
+                (key, json.dumps(value)),
+            )
+            self._conn.commit()
+            self._tags = self._tags - {(key, value)}
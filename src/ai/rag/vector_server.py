@@ -0,0 +1,165 @@
+"""
+向量存储服务 - 在独立进程中持有向量存储，供多个 API worker / 容器通过 HTTP 访问
+
+启动: python -m src.ai.rag.vector_server
+
+服务进程按 VECTOR_STORE_BACKEND 打开本地向量存储（Chroma 持久化客户端或内存映射存储），
+词法索引、删除标记、范围统计和精确检索缓存都只在本进程中维护，避免多进程各自持有一份并相互失效。
+阻塞调用仍在专用线程池中执行；服务必须以单个 worker 运行。
+
+访问控制：服务可以读取和删除所有用户的分块，默认只监听本机。配置了 VECTOR_STORE_API_KEY 时
+每个请求都必须在 X-Vector-Store-Key 头中携带该密钥；未配置时只接受本机请求，并且不允许监听非本机地址。
+只有 _HANDLERS / _PASSTHROUGH 中列出的方法可以调用，错误详情只记录在服务端日志中。
+"""
+import asyncio
+import hmac
+import ipaddress
+import traceback
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from src.ai.rag.remote_vector_store import (
+    API_KEY_HEADER,
+    decode_array,
+    decode_requests,
+    encode_array,
+    hit_to_dict,
+)
+from src.ai.rag.vector_store import AsyncVectorStore, VectorWriteError, get_vector_store
+from src.core.config import rag as rag_config
+from src.core.config.database import vector_store_settings
+from src.utils.executors import shutdown_executors
+
+
+store: Optional[AsyncVectorStore] = None
+
+
+async def _add_vectors(vectors, documents, metadatas=None, ids=None):
+    return await store.add_vectors(decode_array(vectors), documents, metadatas, ids)
+
+
+async def _query(requests):
+    results = await store.query(decode_requests(requests))
+    return [[hit_to_dict(hit) for hit in hits] for hits in results]
+
+
+async def _lexical_query(query, where=None, top_k=5):
+    return [hit_to_dict(hit) for hit in await store.lexical_query(query, where, top_k)]
+
+
+async def _lexical_query_many(query, wheres, top_k=5):
+    results = await store.lexical_query_many(query, wheres, top_k)
+    return [[hit_to_dict(hit) for hit in hits] for hits in results]
+
+
+async def _get_by_file_id(file_id):
+    result = await store.get_by_file_id(file_id)
+    embeddings = result["embeddings"]
+    result["embeddings"] = encode_array(
+        np.asarray(embeddings, dtype=np.float32).reshape(len(result["ids"]), -1)
+        if len(result["ids"]) else np.empty((0, 0), dtype=np.float32)
+    )
+    return result
+
+
+# 可远程调用的方法：需要编解码向量的方法单独处理，其余直接转发给 AsyncVectorStore
+_HANDLERS = {
+    "add_vectors": _add_vectors,
+    "query": _query,
+    "lexical_query": _lexical_query,
+    "lexical_query_many": _lexical_query_many,
+    "get_by_file_id": _get_by_file_id,
+}
+_PASSTHROUGH = frozenset({
+    "update_metadatas",
+    "delete",
+    "delete_by_metadata",
+    "delete_by_file_id",
+    "mark_scope_deleted",
+    "compact",
+    "get_metadatas",
+    "count",
+    "warmup",
+    "scope_stats",
+})
+
+
+def _is_loopback(host: Optional[str]) -> bool:
+    """判断地址是否为本机地址"""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except (TypeError, ValueError):
+        return False
+
+
+def _authorize(request: Request) -> None:
+    """校验共享密钥；未配置密钥时只允许本机请求"""
+    api_key = vector_store_settings.api_key
+    if api_key:
+        provided = request.headers.get(API_KEY_HEADER, "")
+        if not hmac.compare_digest(provided.encode("utf-8"), api_key.encode("utf-8")):
+            raise HTTPException(status_code=401, detail="密钥无效")
+    elif not _is_loopback(request.client.host if request.client else None):
+        raise HTTPException(status_code=403, detail="未配置 VECTOR_STORE_API_KEY 时只接受本机请求")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """启动时打开向量存储并在后台预加载索引"""
+    global store
+    store = AsyncVectorStore(get_vector_store())
+    warmup_task = None
+    if rag_config.warmup_enabled:
+        warmup_task = asyncio.create_task(store.warmup(rag_config.warmup_max_partitions))
+    yield
+    if warmup_task is not None:
+        warmup_task.cancel()
+    shutdown_executors()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.post("/rpc/{method}")
+async def rpc(method: str, arguments: dict, request: Request):
+    """调用向量存储方法：请求体为关键字参数，返回 {"result": ...}"""
+    _authorize(request)
+    if method in _HANDLERS:
+        handler = _HANDLERS[method]
+    elif method in _PASSTHROUGH:
+        handler = getattr(store, method)
+    else:
+        raise HTTPException(status_code=404, detail="未知方法")
+
+    try:
+        return {"result": await handler(**arguments)}
+    except VectorWriteError as e:
+        print(f"Vector store call {method} partially failed: {e}")
+        return JSONResponse(
+            status_code=409,
+            content={"error": "向量写入部分失败", "written_ids": e.written_ids, "failed_ids": e.failed_ids},
+        )
+    except Exception:
+        print(f"Vector store call {method} failed:")
+        traceback.print_exc()
+        return JSONResponse(status_code=500, content={"error": "向量存储服务内部错误"})
+
+
+if __name__ == "__main__":
+    if not vector_store_settings.api_key and not _is_loopback(vector_store_settings.server_host):
+        raise SystemExit(
+            f"监听 {vector_store_settings.server_host} 时必须配置 VECTOR_STORE_API_KEY（或改为只监听 127.0.0.1）"
+        )
+    uvicorn.run(app, host=vector_store_settings.server_host, port=vector_store_settings.server_port, workers=1)
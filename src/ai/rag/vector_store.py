@@ -2,60 +2,220 @@
 向量存储 - 存储和管理文档向量
 """
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, TYPE_CHECKING
+import json
+import os
+import sys
+import time
 import uuid
 
 import chromadb
+import numpy as np
 from chromadb.config import Settings
 
-from src.core.config.database import chroma_settings
+from src.ai.rag.exact_index import ExactIndex, ScopeMatrix
+from src.ai.rag.filters import metadata_tags, scope_partitions, scope_tags
+from src.ai.rag.lexical_index import LexicalHit, LexicalIndex
+from src.ai.rag.scope_stats import ScopeStats
+from src.ai.rag.tombstones import TombstoneStore
+from src.core.config import rag as rag_config
+from src.core.config.database import chroma_settings, vector_store_settings
+from src.utils.executors import BoundedExecutor, vector_store_executor
+
+if TYPE_CHECKING:
+    from src.ai.rag.remote_vector_store import RemoteVectorStore
+
+
+@dataclass
+class SearchRequest:
+    """单个检索请求：查询向量 + 过滤条件 + 返回数量"""
+    query_vector: np.ndarray
+    top_k: int = 5
+    where: Optional[dict] = None
+    include_embeddings: bool = False  # 是否在结果中返回命中分块的向量（MMR 重排需要）
+
+
+@dataclass
+class SearchHit:
+    """单条检索结果"""
+    id: str
+    document: str
+    distance: Optional[float]
+    metadata: dict
+    embedding: Optional[np.ndarray] = field(default=None, repr=False)
+
+    def as_tuple(self) -> tuple:
+        """转换为旧接口的 (document, distance, metadata) 格式"""
+        return self.document, self.distance, self.metadata
+
+
+class VectorWriteError(Exception):
+    """分批写入时部分批次在重试后仍然失败"""
+
+    def __init__(self, written_ids: List[str], failed_ids: List[str], errors: List[Exception]):
+        self.written_ids = written_ids
+        self.failed_ids = failed_ids
+        self.errors = errors
+        super().__init__(
+            f"向量写入部分失败: 成功 {len(written_ids)} 条，失败 {len(failed_ids)} 条，"
+            f"最后一次错误: {errors[-1] if errors else None}"
+        )
 
 
 class BaseVectorStore(ABC):
     """向量存储抽象基类"""
-    
+
     @abstractmethod
     def add_vectors(
-        self, 
-        vectors: List[List[float]], 
+        self,
+        vectors: np.ndarray,
         documents: List[str],
         metadatas: Optional[List[dict]] = None,
         ids: Optional[List[str]] = None
     ) -> List[str]:
-        """添加向量到存储，返回 ID 列表"""
+        """添加向量到存储（vectors 为 (n, dim) 的 float32 矩阵），返回 ID 列表"""
         pass
-    
+
     @abstractmethod
-    def search(
-        self, 
-        query_vector: List[float], 
-        top_k: int = 5
-    ) -> List[tuple]:
-        """搜索最相似的向量，返回 (document, score, metadata) 列表"""
+    def query(self, requests: List[SearchRequest]) -> List[List[SearchHit]]:
+        """
+        批量检索：每个请求可以有各自的过滤条件和 top_k
+
+        返回与 requests 一一对应的结果列表，每个结果按距离升序排列。
+        """
         pass
-    
+
     @abstractmethod
-    def delete(self, ids: List[str]) -> bool:
-        """删除指定 ID 的向量"""
+    def update_metadatas(self, ids: List[str], metadatas: List[dict]) -> None:
+        """更新指定 ID 的元数据"""
+        pass
+
+    @abstractmethod
+    def delete(self, ids: List[str], where: Optional[dict] = None) -> bool:
+        """
+        删除指定 ID 的向量
+
+        Args:
+            ids: 向量 ID 列表
+            where: 这些分块所属范围的过滤条件（可选），提供时只在匹配的分区中删除
+        """
         pass
 
+    @abstractmethod
+    def delete_by_metadata(self, where: dict) -> bool:
+        """根据元数据条件删除向量"""
+        pass
+
+    @abstractmethod
+    def get_metadatas(self, where: dict) -> Dict[str, dict]:
+        """按条件读取未删除分块的 {ID: 元数据}（不读取向量和文档）"""
+        pass
+
+    @abstractmethod
+    def get_by_file_id(self, file_id: int) -> dict:
+        """获取指定文件的所有向量数据（ids / documents / metadatas / embeddings）"""
+        pass
+
+    @abstractmethod
+    def count(self) -> int:
+        """返回未删除的向量数量（已标记删除的范围不计入）"""
+        pass
+
+    def delete_by_file_id(self, file_id: int) -> bool:
+        """删除指定文件的所有向量"""
+        return self.delete_by_metadata({"file_id": file_id})
+
+    def lexical_query(self, query: str, where: Optional[dict] = None, top_k: int = 5) -> List[LexicalHit]:
+        """BM25 词法检索；不支持词法检索的实现返回空列表"""
+        return []
+
+    def lexical_query_many(self, query: str, wheres: List[Optional[dict]], top_k: int = 5) -> List[List[LexicalHit]]:
+        """批量词法检索：同一查询在多个过滤范围内各取 top_k 个，结果与 wheres 一一对应"""
+        return [self.lexical_query(query, where, top_k) for where in wheres]
+
+    def mark_scope_deleted(self, key: str, value) -> None:
+        """
+        删除整个范围（知识库 / 会话）的向量
+
+        默认直接物理删除；支持删除标记的实现只记录标记，物理清除由 compact 完成。
+        """
+        self.delete_by_metadata({key: value})
+
+    def compact(self) -> int:
+        """物理清除已标记删除的范围，返回清除的范围数量"""
+        return 0
+
+    def warmup(self, max_partitions: int) -> int:
+        """预加载索引（应用启动时调用），返回预加载的分区数量"""
+        self.count()
+        return 0
+
+    @abstractmethod
+    def scope_stats(self, key: Optional[str] = None, value=None) -> dict:
+        """范围统计（向量数、字节数、分块大小分布）；key 为 None 时返回全部数据的统计"""
+        pass
+
+    def search_with_filter(
+        self,
+        query_vector: np.ndarray,
+        where: Optional[dict],
+        top_k: int = 5
+    ) -> List[tuple]:
+        """使用自定义过滤条件搜索向量，返回 (document, distance, metadata) 列表"""
+        hits = self.query([SearchRequest(query_vector, top_k, where)])[0]
+        return [hit.as_tuple() for hit in hits]
+
+    def search(
+        self,
+        query_vector: np.ndarray,
+        top_k: int = 5
+    ) -> List[tuple]:
+        """搜索最相似的向量，返回 (document, distance, metadata) 列表"""
+        return self.search_with_filter(query_vector, None, top_k)
+
+    def search_by_file_id(
+        self,
+        query_vector: np.ndarray,
+        file_id: int,
+        top_k: int = 5
+    ) -> List[tuple]:
+        """在指定文件范围内搜索最相似的向量"""
+        return self.search_with_filter(query_vector, {"file_id": file_id}, top_k)
+
+    def search_by_file_ids(
+        self,
+        query_vector: np.ndarray,
+        file_ids: List[int],
+        top_k: int = 5
+    ) -> List[tuple]:
+        """在多个文件范围内搜索最相似的向量"""
+        return self.search_with_filter(query_vector, {"file_id": {"$in": file_ids}}, top_k)
+
 
 class ChromaVectorStore(BaseVectorStore):
-    """基于 Chroma 的向量存储实现"""
-    
+    """
+    基于 Chroma 的向量存储实现
+
+    partition_mode = "scope" 时按范围分区：知识库分块存入 kb_{id} 集合，会话分块存入 conv_{id} 集合，
+    检索只访问过滤条件涉及的分区，检索耗时与分区大小相关而与总语料规模无关；
+    删除整个知识库 / 会话时直接删除对应集合。
+    """
+
     _instance: Optional["ChromaVectorStore"] = None
-    
+
     def __new__(cls, *args, **kwargs):
         """单例模式：确保整个应用只有一个 Chroma 客户端实例"""
         if cls._instance is None:
             cls._instance = super().__new__(cls)
         return cls._instance
-    
+
     def __init__(self, collection_name: Optional[str] = None):
         # 避免重复初始化
         if hasattr(self, "_initialized") and self._initialized:
             return
-            
+
         self._client = chromadb.PersistentClient(
             path=chroma_settings.path,
             settings=Settings(anonymized_telemetry=False)
@@ -65,167 +225,827 @@ class ChromaVectorStore(BaseVectorStore):
             name=self._collection_name,
             metadata={"hnsw:space": "cosine"}  # 使用余弦相似度
         )
+        self._partition_mode = chroma_settings.partition_mode
+        self._partitions = {self._collection_name: self._collection}
+        # scope 模式下旧的单集合中仍有数据（尚未迁移）时，检索同时覆盖旧集合，避免结果缺失
+        self._legacy_pending = self._partition_mode == "scope" and self._collection.count() > 0
+        # 分批写入：批大小在首次写入时结合客户端上限确定，并行写入的线程池懒加载
+        self._max_batch_size: Optional[int] = None
+        self._write_pool: Optional[ThreadPoolExecutor] = None
+        self._exact_index = ExactIndex(rag_config.exact_search_threshold, rag_config.exact_cache_max_bytes)
+        # 词法索引与向量同步增量维护，存放在 Chroma 数据目录中
+        self._lexical_index = (
+            LexicalIndex(os.path.join(chroma_settings.path, "lexical.db"))
+            if rag_config.hybrid_enabled else None
+        )
+        # 已标记删除、等待后台清除的范围
+        self._tombstones = TombstoneStore(os.path.join(chroma_settings.path, "tombstones.db"))
+        # 按用户 / 知识库 / 会话的增量统计
+        self._stats = ScopeStats(os.path.join(chroma_settings.path, "scope_stats.db"))
         self._initialized = True
-    
+
     @property
     def collection(self):
         """获取当前集合"""
         return self._collection
-    
+
     def get_or_create_collection(self, name: str):
         """获取或创建指定名称的集合"""
         return self._client.get_or_create_collection(
             name=name,
             metadata={"hnsw:space": "cosine"}
         )
-    
+
+    # ==================== 分区路由 ====================
+
+    def _partition_name(self, metadata: Optional[dict]) -> str:
+        """根据分块元数据确定其所在的集合名称"""
+        if self._partition_mode == "scope" and metadata:
+            if metadata.get("knowledge_base_id") is not None:
+                return f"kb_{metadata['knowledge_base_id']}"
+            if metadata.get("conversation_id") is not None:
+                return f"conv_{metadata['conversation_id']}"
+        return self._collection_name
+
+    def _get_partition(self, name: str, create: bool = False):
+        """获取分区集合，不存在且 create=False 时返回 None"""
+        collection = self._partitions.get(name)
+        if collection is None:
+            if create:
+                collection = self.get_or_create_collection(name)
+            else:
+                try:
+                    collection = self._client.get_collection(name)
+                except Exception:
+                    return None
+            self._partitions[name] = collection
+        return collection
+
+    def _deleted_partitions(self) -> set:
+        """已标记删除的分区集合名称"""
+        return {self._partition_name({key: value}) for key, value in self._tombstones.tags}
+
+    def _all_partitions(self, include_deleted: bool = False) -> list:
+        """返回所有集合（默认跳过已标记删除的分区）"""
+        if self._partition_mode == "single":
+            return [self._collection]
+        names = [getattr(c, "name", c) for c in self._client.list_collections()]
+        if not include_deleted:
+            deleted = self._deleted_partitions() - {self._collection_name}
+            names = [name for name in names if name not in deleted]
+        return [c for c in (self._get_partition(name) for name in names) if c is not None]
+
+    def _route(self, where: Optional[dict], include_deleted: bool = False) -> list:
+        """根据过滤条件确定需要访问的集合；无法从条件中确定范围时访问所有集合"""
+        if self._partition_mode == "single":
+            return [self._collection]
+
+        names = scope_partitions(where)
+        if names is None:
+            return self._all_partitions(include_deleted)
+
+        if not include_deleted:
+            deleted = self._deleted_partitions()
+            names = [name for name in names if name not in deleted]
+        if self._legacy_pending:
+            names.append(self._collection_name)
+        return [c for c in (self._get_partition(name) for name in names) if c is not None]
+
+    def _group_by_partition(self, metadatas: Optional[List[dict]], count: int) -> Dict[str, List[int]]:
+        """按所属集合对行下标分组"""
+        groups: Dict[str, List[int]] = {}
+        for i in range(count):
+            name = self._partition_name(metadatas[i] if metadatas else None)
+            groups.setdefault(name, []).append(i)
+        return groups
+
+    def _drop_partition(self, name: str) -> None:
+        """删除整个分区集合"""
+        self._client.delete_collection(name)
+        self._partitions.pop(name, None)
+
+    # ==================== 写入 ====================
+
     def add_vectors(
-        self, 
-        vectors: List[List[float]], 
+        self,
+        vectors: np.ndarray,
         documents: List[str],
         metadatas: Optional[List[dict]] = None,
         ids: Optional[List[str]] = None
     ) -> List[str]:
-        """添加向量到存储"""
+        """添加向量到存储，float32 矩阵直接交给 Chroma，不转换为 Python 列表"""
+        # 调用方指定 ID 时可能覆盖已有分块，先从写入的分区中读出旧分块以便修正统计
+        previous = None
+        if ids is not None:
+            names = self._group_by_partition(metadatas, len(documents))
+            previous = self._fetch_chunks(
+                ids=ids,
+                collections=[c for c in (self._get_partition(name) for name in names) if c is not None],
+            )
         if ids is None:
             ids = [str(uuid.uuid4()) for _ in range(len(documents))]
-        
-        self._collection.add(
-            embeddings=vectors,
-            documents=documents,
-            metadatas=metadatas,
-            ids=ids
-        )
+
+        # 写入已标记删除的范围时，先同步清除旧数据，避免新数据被后台清除
+        if self._tombstones.tags and metadatas:
+            written = frozenset().union(*(metadata_tags(metadata) for metadata in metadatas))
+            for key, value in self._tombstones.tags & written:
+                self._purge_scope(key, value)
+
+        # 按分区和批大小切分写入任务
+        batch_size = self._write_batch_size()
+        batches: List[tuple] = []
+        for name, rows in self._group_by_partition(metadatas, len(documents)).items():
+            self._get_partition(name, create=True)
+            batches.extend((name, rows[i:i + batch_size]) for i in range(0, len(rows), batch_size))
+
+        if len(batches) > 1 and chroma_settings.write_concurrency > 1:
+            failures = list(self._get_write_pool().map(
+                lambda batch: self._write_batch(batch[0], vectors, documents, metadatas, ids, batch[1]),
+                batches
+            ))
+        else:
+            failures = [self._write_batch(name, vectors, documents, metadatas, ids, rows) for name, rows in batches]
+
+        # 成功写入的批次同步更新检索缓存和词法索引，失败的批次汇总后抛出
+        failed_rows = sorted(i for (_, rows), error in zip(batches, failures) if error for i in rows)
+        written_rows = sorted(set(range(len(ids))) - set(failed_rows))
+        written_metadatas = [metadatas[i] for i in written_rows] if metadatas else None
+
+        self._exact_index.invalidate(written_metadatas or [])
+        if written_rows:
+            if previous and previous[0]:
+                written = {ids[i] for i in written_rows}
+                overwritten = [i for i, chunk_id in enumerate(previous[0]) if chunk_id in written]
+                self._stats.remove(
+                    [previous[1][i] for i in overwritten], [previous[2][i] for i in overwritten]
+                )
+            self._stats.add(written_metadatas, [documents[i] for i in written_rows], vectors.shape[1])
+        if self._lexical_index and written_rows:
+            self._lexical_index.add(
+                [ids[i] for i in written_rows], [documents[i] for i in written_rows], written_metadatas
+            )
+        if failed_rows:
+            raise VectorWriteError(
+                written_ids=[ids[i] for i in written_rows],
+                failed_ids=[ids[i] for i in failed_rows],
+                errors=[error for error in failures if error],
+            )
         return ids
-    
-    def search(
-        self, 
-        query_vector: List[float], 
-        top_k: int = 5
-    ) -> List[tuple]:
-        """搜索最相似的向量"""
-        results = self._collection.query(
-            query_embeddings=[query_vector],
-            n_results=top_k,
-            include=["documents", "metadatas", "distances"]
+
+    def _fetch_chunks(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[dict] = None,
+        collections: Optional[list] = None
+    ) -> tuple:
+        """读取分块的 (ids, metadatas, documents)，用于删除 / 覆盖前修正统计"""
+        if collections is None:
+            collections = self._all_partitions(include_deleted=True) if where is None else self._route(where, True)
+        found_ids, metadatas, documents = [], [], []
+        for collection in collections:
+            result = collection.get(ids=ids, where=where, include=["metadatas", "documents"])
+            found_ids.extend(result["ids"])
+            metadatas.extend(result["metadatas"])
+            documents.extend(result["documents"])
+        return found_ids, metadatas, documents
+
+    def _write_batch_size(self) -> int:
+        """单次写入的向量数量，不超过 Chroma 客户端允许的最大批大小"""
+        if self._max_batch_size is None:
+            try:
+                self._max_batch_size = self._client.get_max_batch_size()
+            except Exception:
+                self._max_batch_size = chroma_settings.write_batch_size
+        return max(1, min(chroma_settings.write_batch_size, self._max_batch_size))
+
+    def _get_write_pool(self) -> ThreadPoolExecutor:
+        """并行写入多个批次时使用的线程池（懒加载）"""
+        if self._write_pool is None:
+            self._write_pool = ThreadPoolExecutor(
+                max_workers=chroma_settings.write_concurrency,
+                thread_name_prefix="chroma-write",
+            )
+        return self._write_pool
+
+    def _write_batch(
+        self,
+        name: str,
+        vectors: np.ndarray,
+        documents: List[str],
+        metadatas: Optional[List[dict]],
+        ids: List[str],
+        rows: List[int]
+    ) -> Optional[Exception]:
+        """
+        写入一批向量，失败时按指数退避重试
+
+        使用 upsert 而不是 add：超时等情况下批次可能已部分写入，重试不会因 ID 重复而失败。
+
+        Returns:
+            重试后仍然失败时返回最后一次的异常，成功返回 None
+        """
+        collection = self._get_partition(name, create=True)
+        error: Optional[Exception] = None
+        for attempt in range(chroma_settings.write_retries + 1):
+            if attempt:
+                time.sleep(chroma_settings.write_retry_delay * 2 ** (attempt - 1))
+            try:
+                collection.upsert(
+                    embeddings=vectors[rows],
+                    documents=[documents[i] for i in rows],
+                    metadatas=[metadatas[i] for i in rows] if metadatas else None,
+                    ids=[ids[i] for i in rows]
+                )
+                return None
+            except Exception as e:
+                error = e
+                print(f"向量写入失败（分区 {name}，{len(rows)} 条，第 {attempt + 1} 次）: {e}")
+        return error
+
+    def update_metadatas(self, ids: List[str], metadatas: List[dict]) -> None:
+        """更新指定 ID 的向量元数据"""
+        for name, rows in self._group_by_partition(metadatas, len(ids)).items():
+            self._get_partition(name, create=True).update(
+                ids=[ids[i] for i in rows],
+                metadatas=[metadatas[i] for i in rows]
+            )
+        self._exact_index.invalidate(metadatas)
+        if self._lexical_index:
+            self._lexical_index.update_metadatas(ids, metadatas)
+
+    # ==================== 检索 ====================
+
+    @staticmethod
+    def _to_hits(results: dict, index: int, top_k: int) -> List[SearchHit]:
+        """把 Chroma 查询结果中第 index 个查询的结果整理为 SearchHit 列表"""
+        if not results["ids"] or not results["ids"][index]:
+            return []
+
+        ids = results["ids"][index][:top_k]
+        documents = results["documents"][index]
+        distances = results["distances"][index] if results["distances"] else None
+        metadatas = results["metadatas"][index] if results["metadatas"] else None
+        embeddings = results["embeddings"][index] if results.get("embeddings") is not None else None
+        return [
+            SearchHit(
+                id=ids[i],
+                document=documents[i],
+                distance=distances[i] if distances else None,
+                metadata=(metadatas[i] if metadatas else None) or {},
+                embedding=np.asarray(embeddings[i], dtype=np.float32) if embeddings is not None else None,
+            )
+            for i in range(len(ids))
+        ]
+
+    def _is_deleted(self, metadata: Optional[dict]) -> bool:
+        """分块是否属于已标记删除的范围"""
+        return bool(self._tombstones.tags & metadata_tags(metadata))
+
+    def _needs_tombstone_filter(self, where: Optional[dict]) -> bool:
+        """
+        检索结果是否可能包含已标记删除的分块
+
+        分区模式下已删除的分区不会被访问；单集合（或尚未迁移的旧集合）中的分块需要在检索后过滤。
+        """
+        tags = self._tombstones.tags
+        if not tags:
+            return False
+        if self._partition_mode == "scope" and not self._legacy_pending:
+            return False
+        request_tags = scope_tags(where)
+        return request_tags is None or bool(request_tags & tags)
+
+    def _query_partitions(
+        self,
+        partitions: list,
+        embeddings: np.ndarray,
+        where: Optional[dict],
+        n_results: int,
+        include_embeddings: bool = False
+    ) -> tuple:
+        """
+        在多个集合中检索并按距离合并
+
+        Returns:
+            (每个查询的结果列表, 是否有集合返回了满额结果)
+        """
+        merged: List[List[SearchHit]] = [[] for _ in range(len(embeddings))]
+        saturated = False
+        for collection in partitions:
+            results = collection.query(
+                query_embeddings=embeddings,
+                n_results=n_results,
+                where=where,
+                include=["documents", "metadatas", "distances"] + (["embeddings"] if include_embeddings else [])
+            )
+            for position in range(len(embeddings)):
+                hits = self._to_hits(results, position, n_results)
+                saturated = saturated or len(hits) >= n_results
+                merged[position].extend(hits)
+
+        if len(partitions) > 1:
+            for hits in merged:
+                hits.sort(key=lambda hit: hit.distance)
+        return merged, saturated
+
+    def _load_exact_scope(self, key: str, where: dict) -> ScopeMatrix:
+        """获取过滤范围的缓存矩阵，未缓存时从集合中读取（最多读取阈值 + 1 条以判断范围大小）"""
+        entry = self._exact_index.get(key)
+        if entry is not None:
+            return entry
+
+        generation = self._exact_index.generation
+        limit = self._exact_index.threshold + 1
+        ids, documents, metadatas, embeddings = [], [], [], []
+        for collection in self._route(where):
+            result = collection.get(
+                where=where,
+                limit=limit,
+                include=["documents", "metadatas", "embeddings"]
+            )
+            if not result["ids"]:
+                continue
+            rows = [
+                row for row, metadata in enumerate(result["metadatas"])
+                if not self._is_deleted(metadata)
+            ]
+            ids.extend(result["ids"][row] for row in rows)
+            documents.extend(result["documents"][row] for row in rows)
+            metadatas.extend(result["metadatas"][row] or {} for row in rows)
+            embeddings.append(np.asarray(result["embeddings"], dtype=np.float32)[rows])
+            if len(ids) >= limit:
+                break
+
+        entry = self._exact_index.build(
+            scope_tags(where),
+            ids,
+            documents,
+            metadatas,
+            np.vstack(embeddings) if embeddings else None
         )
-        
-        # 整理返回格式: (document, distance, metadata)
-        output = []
-        if results["documents"] and results["documents"][0]:
-            for i in range(len(results["documents"][0])):
-                doc = results["documents"][0][i]
-                distance = results["distances"][0][i] if results["distances"] else None
-                metadata = results["metadatas"][0][i] if results["metadatas"] else None
-                output.append((doc, distance, metadata))
-        
+        self._exact_index.put(key, entry, generation)
+        return entry
+
+    def query(self, requests: List[SearchRequest]) -> List[List[SearchHit]]:
+        """
+        批量检索
+
+        过滤条件相同的请求合并为一次 collection.query 调用（Chroma 支持一次传入多个查询向量），
+        n_results 取组内最大的 top_k，再按各自的 top_k 截断。
+        分区模式下每组只查询过滤条件涉及的分区，多个分区的结果按距离合并。
+        过滤范围内的向量数不超过 RAG_EXACT_SEARCH_THRESHOLD 时改用缓存矩阵做精确检索。
+        结果可能包含已标记删除的分块时，按 CHROMA_TOMBSTONE_OVERFETCH 倍数多取并过滤，不足时加倍重试。
+        """
+        output: List[List[SearchHit]] = [[] for _ in requests]
+
+        # 按过滤条件分组
+        groups: Dict[str, List[int]] = {}
+        for i, request in enumerate(requests):
+            key = json.dumps(request.where, sort_keys=True)
+            groups.setdefault(key, []).append(i)
+
+        for key, indices in groups.items():
+            where = requests[indices[0]].where
+            embeddings = np.vstack([requests[i].query_vector for i in indices])
+            n_results = max(requests[i].top_k for i in indices)
+            include_embeddings = any(requests[i].include_embeddings for i in indices)
+
+            # 过滤范围已全部标记删除
+            request_tags = scope_tags(where)
+            if request_tags and request_tags <= self._tombstones.tags:
+                continue
+
+            # 小范围：精确检索
+            if where and self._exact_index.enabled:
+                entry = self._load_exact_scope(key, where)
+                if entry.is_small:
+                    matches = ExactIndex.search(entry, embeddings, n_results)
+                    for position, i in enumerate(indices):
+                        output[i] = [
+                            SearchHit(
+                                entry.ids[row], entry.documents[row], distance, entry.metadatas[row],
+                                entry.matrix[row] if include_embeddings else None
+                            )
+                            for row, distance in matches[position][:requests[i].top_k]
+                        ]
+                    continue
+
+            partitions = self._route(where)
+            if not self._needs_tombstone_filter(where):
+                merged, _ = self._query_partitions(partitions, embeddings, where, n_results, include_embeddings)
+            else:
+                fetch = n_results * chroma_settings.tombstone_overfetch
+                while True:
+                    merged, saturated = self._query_partitions(
+                        partitions, embeddings, where, fetch, include_embeddings
+                    )
+                    merged = [[hit for hit in hits if not self._is_deleted(hit.metadata)] for hits in merged]
+                    if not saturated or min(len(hits) for hits in merged) >= n_results:
+                        break
+                    fetch *= 2
+
+            for position, i in enumerate(indices):
+                output[i] = merged[position][:requests[i].top_k]
+
         return output
-    
-    def delete(self, ids: List[str]) -> bool:
-        """删除指定 ID 的向量"""
+
+    def lexical_query(self, query: str, where: Optional[dict] = None, top_k: int = 5) -> List[LexicalHit]:
+        """BM25 词法检索（未启用混合检索时返回空列表）"""
+        if not self._lexical_index:
+            return []
+        if not self._tombstones.tags:
+            return self._lexical_index.search(query, where, top_k)
+        hits = self._lexical_index.search(query, where, top_k * chroma_settings.tombstone_overfetch)
+        return [hit for hit in hits if not self._is_deleted(hit.metadata)][:top_k]
+
+    # ==================== 删除 ====================
+
+    def delete(self, ids: List[str], where: Optional[dict] = None) -> bool:
+        """删除指定 ID 的向量；提供 where 时只访问其路由到的分区，否则访问所有分区"""
         try:
-            self._collection.delete(ids=ids)
+            collections = self._all_partitions() if where is None else self._route(where)
+            _, metadatas, documents = self._fetch_chunks(ids=ids, where=where, collections=collections)
+            for collection in collections:
+                collection.delete(ids=ids, where=where)
+            self._stats.remove(metadatas, documents)
+            if where is None:
+                self._exact_index.invalidate()
+            else:
+                self._exact_index.invalidate(metadatas)
+            if self._lexical_index:
+                self._lexical_index.delete(ids)
             return True
         except Exception:
             return False
-    
+
     def delete_by_metadata(self, where: dict) -> bool:
-        """根据元数据条件删除向量"""
+        """根据元数据条件删除向量；条件恰好对应整个分区时直接删除该集合"""
         try:
-            self._collection.delete(where=where)
+            scope = None
+            if len(where) == 1 and not isinstance(next(iter(where.values())), dict):
+                scope = self._partition_name(where)
+            # 条件只涉及统计字段时直接删除统计行，否则先读出被删除的分块
+            removed = None if self._stats.covers(where) else self._fetch_chunks(where=where)
+            for collection in self._route(where, include_deleted=True):
+                if collection.name == scope and scope != self._collection_name:
+                    self._drop_partition(scope)
+                else:
+                    collection.delete(where=where)
+            if removed is None:
+                self._stats.remove_where(where)
+            else:
+                self._stats.remove(removed[1], removed[2])
+            self._exact_index.invalidate()
+            if self._lexical_index:
+                self._lexical_index.delete_where(where)
             return True
         except Exception:
             return False
-    
-    def delete_by_file_id(self, file_id: int) -> bool:
-        """删除指定文件的所有向量"""
-        return self.delete_by_metadata({"file_id": file_id})
-    
-    def search_by_file_id(
-        self, 
-        query_vector: List[float], 
-        file_id: int,
-        top_k: int = 5
-    ) -> List[tuple]:
-        """在指定文件范围内搜索最相似的向量"""
-        results = self._collection.query(
-            query_embeddings=[query_vector],
-            n_results=top_k,
-            where={"file_id": file_id},  # 只在该文件的chunks中搜索
-            include=["documents", "metadatas", "distances"]
-        )
-        
-        output = []
-        if results["documents"] and results["documents"][0]:
-            for i in range(len(results["documents"][0])):
-                doc = results["documents"][0][i]
-                distance = results["distances"][0][i] if results["distances"] else None
-                metadata = results["metadatas"][0][i] if results["metadatas"] else None
-                output.append((doc, distance, metadata))
-        
-        return output
-    
-    def search_by_file_ids(
-        self, 
-        query_vector: List[float], 
-        file_ids: List[int],
-        top_k: int = 5
-    ) -> List[tuple]:
-        """在多个文件范围内搜索最相似的向量"""
-        results = self._collection.query(
-            query_embeddings=[query_vector],
-            n_results=top_k,
-            where={"file_id": {"$in": file_ids}},  # 在这些文件中搜索
-            include=["documents", "metadatas", "distances"]
+
+    def mark_scope_deleted(self, key: str, value) -> None:
+        """
+        标记整个范围（知识库 / 会话）已删除
+
+        只写入一条删除标记，检索时立即过滤，耗时与范围大小无关；物理清除由 compact 在后台完成。
+        """
+        self._tombstones.add(key, value)
+        self._stats.remove_where({key: value})
+        self._exact_index.invalidate([{key: value}])
+
+    def _purge_scope(self, key: str, value) -> None:
+        """物理清除一个已标记删除的范围并移除标记"""
+        where = {key: value}
+        if self._partition_mode == "scope":
+            name = self._partition_name(where)
+            if self._get_partition(name) is not None:
+                self._drop_partition(name)
+            if self._legacy_pending:
+                self._collection.delete(where=where)
+        else:
+            self._collection.delete(where=where)
+        if self._lexical_index:
+            self._lexical_index.delete_where(where)
+        self._exact_index.invalidate([where])
+        self._tombstones.remove(key, value)
+
+    def compact(self) -> int:
+        """物理清除所有已标记删除的范围，返回清除的范围数量"""
+        purged = 0
+        for key, value in self._tombstones.tags:
+            self._purge_scope(key, value)
+            purged += 1
+        return purged
+
+    # ==================== 查询 / 统计 ====================
+
+    def warmup(self, max_partitions: int) -> int:
+        """
+        预加载分区的 HNSW 索引
+
+        Chroma 在集合第一次检索时才把索引段加载到内存，这里对每个分区（按向量数量从大到小，
+        最多 max_partitions 个）执行一次检索，让部署后的第一个请求不再承担加载耗时。
+        """
+        partitions = sorted(
+            ((collection.count(), collection) for collection in self._all_partitions()),
+            key=lambda item: item[0],
+            reverse=True,
         )
-        
-        output = []
-        if results["documents"] and results["documents"][0]:
-            for i in range(len(results["documents"][0])):
-                doc = results["documents"][0][i]
-                distance = results["distances"][0][i] if results["distances"] else None
-                metadata = results["metadatas"][0][i] if results["metadatas"] else None
-                output.append((doc, distance, metadata))
-        
-        return output
-    
-    def search_with_filter(
+        warmed = 0
+        for count, collection in partitions[:max_partitions]:
+            if count == 0:
+                continue
+            sample = collection.peek(1)["embeddings"]
+            collection.query(query_embeddings=np.asarray(sample, dtype=np.float32), n_results=1)
+            warmed += 1
+        return warmed
+
+    def get_by_file_id(self, file_id: int) -> dict:
+        """获取指定文件的所有向量数据"""
+        results = [
+            collection.get(
+                where={"file_id": file_id},
+                include=["documents", "metadatas", "embeddings"]
+            )
+            for collection in self._route({"file_id": file_id})
+        ]
+        if len(results) == 1:
+            return results[0]
+
+        merged = {"ids": [], "documents": [], "metadatas": [], "embeddings": []}
+        for result in results:
+            for key, values in merged.items():
+                if result.get(key) is not None:
+                    values.extend(result[key])
+        return merged
+
+    def count(self) -> int:
+        """返回未删除的向量数量（不含已标记删除、尚未物理清除的范围）"""
+        total = sum(collection.count() for collection in self._all_partitions())
+        tags = self._tombstones.tags
+        if tags and (self._partition_mode == "single" or self._legacy_pending):
+            # 已删除的分区不会被计入，单集合（或尚未迁移的旧集合）中的已删除分块需要扣除
+            deleted_ids = set()
+            for key, value in tags:
+                deleted_ids.update(self._collection.get(where={key: value}, include=[])["ids"])
+            total -= len(deleted_ids)
+        return total
+
+    def scope_stats(self, key: Optional[str] = None, value=None) -> dict:
+        """范围统计（由增量计数器汇总，不扫描向量）；key 为 None 时返回全部数据的统计"""
+        return self._stats.summary(key, value)
+
+    def get_metadatas(self, where: dict) -> Dict[str, dict]:
+        """按条件读取未删除分块的 {ID: 元数据}（跳过已标记删除的范围）"""
+        found: Dict[str, dict] = {}
+        for collection in self._route(where):
+            result = collection.get(where=where, include=["metadatas"])
+            for chunk_id, metadata in zip(result["ids"], result["metadatas"]):
+                if not self._is_deleted(metadata):
+                    found[chunk_id] = metadata
+        return found
+
+    # ==================== 迁移 ====================
+
+    def migrate_to_partitions(self, batch_size: Optional[int] = None) -> int:
+        """
+        将旧的单集合数据迁移到分区集合（scope 模式）
+
+        分批读取旧集合，按元数据写入对应分区后从旧集合删除，可中断后重复执行。
+        无法确定范围的分块保留在旧集合中。
+
+        Returns:
+            迁移的向量数量
+        """
+        if self._partition_mode != "scope":
+            raise ValueError("仅在 CHROMA_PARTITION_MODE=scope 时需要迁移")
+
+        batch_size = batch_size or chroma_settings.migrate_batch_size
+        moved, skipped = 0, 0
+        while True:
+            batch = self._collection.get(
+                limit=batch_size,
+                offset=skipped,
+                include=["documents", "metadatas", "embeddings"]
+            )
+            ids = batch["ids"]
+            if not ids:
+                break
+
+            metadatas = batch["metadatas"]
+            moved_ids: List[str] = []
+            for name, rows in self._group_by_partition(metadatas, len(ids)).items():
+                if name == self._collection_name:
+                    skipped += len(rows)
+                    continue
+                row_ids = [ids[i] for i in rows]
+                self._get_partition(name, create=True).upsert(
+                    ids=row_ids,
+                    embeddings=np.asarray(batch["embeddings"], dtype=np.float32)[rows],
+                    documents=[batch["documents"][i] for i in rows],
+                    metadatas=[metadatas[i] for i in rows]
+                )
+                moved_ids.extend(row_ids)
+
+            if moved_ids:
+                self._collection.delete(ids=moved_ids)
+            moved += len(moved_ids)
+            print(f"已迁移 {moved} 条向量，保留在旧集合 {skipped} 条")
+
+        self._legacy_pending = self._collection.count() > 0
+        self._exact_index.invalidate()
+        return moved
+
+    def rebuild_lexical_index(self, batch_size: Optional[int] = None) -> int:
+        """
+        根据向量存储中的全部分块重建词法索引
+
+        首次启用混合检索时，已有数据尚未进入词法索引，需要执行一次。
+
+        Returns:
+            写入词法索引的分块数量
+        """
+        if not self._lexical_index:
+            raise ValueError("仅在 RAG_HYBRID_ENABLED=True 时需要重建词法索引")
+
+        batch_size = batch_size or chroma_settings.migrate_batch_size
+        self._lexical_index.clear()
+        total = 0
+        for collection in self._all_partitions():
+            offset = 0
+            while True:
+                batch = collection.get(limit=batch_size, offset=offset, include=["documents", "metadatas"])
+                if not batch["ids"]:
+                    break
+                self._lexical_index.add(batch["ids"], batch["documents"], batch["metadatas"])
+                offset += len(batch["ids"])
+                total += len(batch["ids"])
+                print(f"已写入词法索引 {total} 条分块")
+        return total
+
+    def rebuild_scope_stats(self, batch_size: Optional[int] = None) -> int:
+        """
+        根据向量存储中的全部分块重建范围统计
+
+        统计在写入 / 删除时增量维护，启用统计之前已有的数据需要执行一次。
+
+        Returns:
+            计入统计的分块数量
+        """
+        batch_size = batch_size or chroma_settings.migrate_batch_size
+        self._stats.clear()
+        total = 0
+        for collection in self._all_partitions():
+            sample = collection.peek(1)["embeddings"]
+            if sample is None or len(sample) == 0:
+                continue
+            dimension = len(sample[0])
+            offset = 0
+            while True:
+                batch = collection.get(limit=batch_size, offset=offset, include=["documents", "metadatas"])
+                if not batch["ids"]:
+                    break
+                self._stats.add(batch["metadatas"], batch["documents"], dimension)
+                offset += len(batch["ids"])
+                total += len(batch["ids"])
+                print(f"已计入统计 {total} 条分块")
+        return total
+
+
+class AsyncVectorStore:
+    """
+    向量存储的异步封装
+
+    Chroma 的调用都是同步阻塞的，这里把它们放到专用的有界线程池中执行，避免阻塞事件循环。
+    """
+
+    def __init__(self, store: BaseVectorStore, executor: Optional[BoundedExecutor] = None):
+        self._store = store
+        self._executor = executor or vector_store_executor
+
+    @property
+    def store(self) -> BaseVectorStore:
+        """获取被封装的同步向量存储"""
+        return self._store
+
+    async def add_vectors(
+        self,
+        vectors: np.ndarray,
+        documents: List[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None
+    ) -> List[str]:
+        """添加向量到存储，返回 ID 列表"""
+        return await self._executor.run(self._store.add_vectors, vectors, documents, metadatas, ids)
+
+    async def update_metadatas(self, ids: List[str], metadatas: List[dict]) -> None:
+        """更新指定 ID 的向量元数据"""
+        if ids:
+            await self._executor.run(self._store.update_metadatas, ids, metadatas)
+
+    async def query(self, requests: List[SearchRequest]) -> List[List[SearchHit]]:
+        """批量检索"""
+        return await self._executor.run(self._store.query, requests)
+
+    async def search_with_filter(
         self,
-        query_vector: List[float],
-        where: dict,
+        query_vector: np.ndarray,
+        where: Optional[dict],
         top_k: int = 5
     ) -> List[tuple]:
         """使用自定义过滤条件搜索向量"""
-        results = self._collection.query(
-            query_embeddings=[query_vector],
-            n_results=top_k,
-            where=where,
-            include=["documents", "metadatas", "distances"]
-        )
-        
-        output = []
-        if results["documents"] and results["documents"][0]:
-            for i in range(len(results["documents"][0])):
-                doc = results["documents"][0][i]
-                distance = results["distances"][0][i] if results["distances"] else None
-                metadata = results["metadatas"][0][i] if results["metadatas"] else None
-                output.append((doc, distance, metadata))
-        
-        return output
-    
-    def get_by_file_id(self, file_id: int) -> dict:
+        return await self._executor.run(self._store.search_with_filter, query_vector, where, top_k)
+
+    async def lexical_query(self, query: str, where: Optional[dict] = None, top_k: int = 5) -> List[LexicalHit]:
+        """BM25 词法检索"""
+        return await self._executor.run(self._store.lexical_query, query, where, top_k)
+
+    async def lexical_query_many(
+        self,
+        query: str,
+        wheres: List[Optional[dict]],
+        top_k: int = 5
+    ) -> List[List[LexicalHit]]:
+        """批量词法检索（一次线程池调用）"""
+        return await self._executor.run(self._store.lexical_query_many, query, wheres, top_k)
+
+    async def delete(self, ids: List[str], where: Optional[dict] = None) -> bool:
+        """删除指定 ID 的向量"""
+        return await self._executor.run(self._store.delete, ids, where)
+
+    async def delete_by_metadata(self, where: dict) -> bool:
+        """根据元数据条件删除向量"""
+        return await self._executor.run(self._store.delete_by_metadata, where)
+
+    async def delete_by_file_id(self, file_id: int) -> bool:
+        """删除指定文件的所有向量"""
+        return await self._executor.run(self._store.delete_by_file_id, file_id)
+
+    async def mark_scope_deleted(self, key: str, value) -> None:
+        """标记整个范围已删除"""
+        await self._executor.run(self._store.mark_scope_deleted, key, value)
+
+    async def compact(self) -> int:
+        """物理清除已标记删除的范围"""
+        return await self._executor.run(self._store.compact)
+
+    async def get_metadatas(self, where: dict) -> Dict[str, dict]:
+        """按条件读取分块 ID 与元数据"""
+        return await self._executor.run(self._store.get_metadatas, where)
+
+    async def get_by_file_id(self, file_id: int) -> dict:
         """获取指定文件的所有向量数据"""
-        return self._collection.get(
-            where={"file_id": file_id},
-            include=["documents", "metadatas", "embeddings"]
-        )
-    
-    def count(self) -> int:
-        """返回集合中的向量数量"""
-        return self._collection.count()
+        return await self._executor.run(self._store.get_by_file_id, file_id)
+
+    async def count(self) -> int:
+        """返回向量数量"""
+        return await self._executor.run(self._store.count)
+
+    async def warmup(self, max_partitions: int) -> int:
+        """预加载索引"""
+        return await self._executor.run(self._store.warmup, max_partitions)
+
+    async def scope_stats(self, key: Optional[str] = None, value=None) -> dict:
+        """范围统计"""
+        return await self._executor.run(self._store.scope_stats, key, value)
+
+    async def aclose(self) -> None:
+        """释放资源（与远程客户端接口一致；线程池由 shutdown_executors 统一关闭）"""
+        pass
 
 
 # 创建全局单例实例（懒加载方式使用）
-def get_vector_store(collection_name: Optional[str] = None) -> ChromaVectorStore:
-    """获取向量存储实例"""
+def get_vector_store(collection_name: Optional[str] = None) -> BaseVectorStore:
+    """获取向量存储实例（由 VECTOR_STORE_BACKEND 选择实现）"""
+    if vector_store_settings.backend == "local":
+        from src.ai.rag.local_vector_store import LocalVectorStore
+        return LocalVectorStore()
     return ChromaVectorStore(collection_name)
+
+
+def get_async_vector_store(collection_name: Optional[str] = None) -> "AsyncVectorStore | RemoteVectorStore":
+    """
+    获取向量存储的异步接口
+
+    VECTOR_STORE_MODE=remote 时返回访问向量存储服务的 HTTP 客户端，否则在专用线程池中执行本地存储的阻塞调用。
+    """
+    if vector_store_settings.mode == "remote":
+        from src.ai.rag.remote_vector_store import get_remote_vector_store
+        return get_remote_vector_store()
+    return AsyncVectorStore(get_vector_store(collection_name))
+
+
+if __name__ == '__main__':
+    # 切换到 CHROMA_PARTITION_MODE=scope 后执行: python -m src.ai.rag.vector_store
+    # 首次启用混合检索后执行: python -m src.ai.rag.vector_store rebuild-lexical
+    # 升级后首次启用范围统计时执行: python -m src.ai.rag.vector_store rebuild-stats
+    store = ChromaVectorStore()
+    command = sys.argv[1] if len(sys.argv) > 1 else "migrate"
+    if command == "rebuild-lexical":
+        total = store.rebuild_lexical_index()
+        print(f"重建完成，共写入 {total} 条分块")
+    elif command == "rebuild-stats":
+        total = store.rebuild_scope_stats()
+        print(f"重建完成，共统计 {total} 条分块")
+    else:
+        total = store.migrate_to_partitions()
+        print(f"迁移完成，共迁移 {total} 条向量")
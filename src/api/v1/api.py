@@ -7,6 +7,7 @@ from src.api.v1.endpoints.model import router as model_router
 from src.api.v1.endpoints.knowledge_base import router as knowledge_base_router
 from src.api.v1.endpoints.conversation_log import router as conversation_log_router
 from src.api.v1.endpoints.user import router as user_router
+from src.api.v1.endpoints.health import router as health_router
 router = APIRouter()
 
 # 保持原有 API 接口不变
@@ -17,4 +18,5 @@ router.include_router(messages_router, prefix="/messages")
 router.include_router(model_router, prefix="/model")
 router.include_router(knowledge_base_router, prefix="/knowledge-base")
 router.include_router(conversation_log_router, prefix="/conversation-logs")
-router.include_router(user_router, prefix="/user")
\ No newline at end of file
+router.include_router(user_router, prefix="/user")
+router.include_router(health_router, prefix="/health")
\ No newline at end of file
@@ -8,6 +8,7 @@ from src.db.models.user import User
 from src.crud.user import create_user, get_user_by_email, get_user_hash_password
 from src.api.deps import get_db
 from src.utils.authentic import create_access_token, get_current_user
+from src.utils.executors import auth_executor
 
 router = APIRouter()
 
@@ -15,7 +16,10 @@ async def verify_password(db: AsyncSession, email: str, login_password: str) ->
     hashed_password = await get_user_hash_password(db, email)
     if not hashed_password:
         return False
-    return bcrypt.checkpw(login_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    # bcrypt 是有意设计的慢哈希，放到专用线程池中执行，避免登录高峰阻塞事件循环
+    return await auth_executor.run(
+        bcrypt.checkpw, login_password.encode('utf-8'), hashed_password.encode('utf-8')
+    )
 
 
 @router.post("/sign-up")
@@ -23,7 +27,9 @@ async def sign_up(user_data: UserRegister, db: AsyncSession = Depends(get_db)):
     user = await get_user_by_email(db, user_data.email)
     if user:
         return APIResponse(retcode=400, message="Email already registered")
-    user_data.password = bcrypt.hashpw(user_data.password.encode('utf-8'), bcrypt.gensalt())
+    user_data.password = await auth_executor.run(
+        bcrypt.hashpw, user_data.password.encode('utf-8'), bcrypt.gensalt()
+    )
     user = User(**user_data.model_dump())
     await create_user(db, user)
     return APIResponse(retcode=0, message="success")
@@ -43,7 +43,7 @@ async def delete_conversation(
     # 1. 删除 Chroma 向量库中该会话的所有向量
     rag_service = get_rag_service()
     try:
-        rag_service.delete_conversation_vectors(conversation_id)
+        await rag_service.delete_conversation_vectors(conversation_id)
     except Exception as e:
         print(f"Failed to delete vectors for conversation {conversation_id}: {e}")
     
@@ -62,3 +62,20 @@ async def delete_conversation(
         return APIResponse(retcode=0, message="success")
     else:
         return APIResponse(retcode=400, message="Failed to delete conversation")
+
+
+@router.get("/vector-stats/{conversation_id}")
+async def get_conversation_vector_stats(
+    conversation_id: int,
+    user_id: int = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """获取会话文件的向量统计（向量数量、占用字节数、分块大小分布）"""
+    conversation = await get_conversation_by_id(db, conversation_id)
+    if not conversation:
+        return APIResponse(retcode=400, message="Conversation not found")
+    if conversation.user_id != user_id:
+        return APIResponse(retcode=400, message="Unauthorized access to conversation")
+    
+    stats = await get_rag_service().get_scope_stats("conversation_id", conversation_id)
+    return APIResponse(retcode=0, message="success", data=stats)
@@ -0,0 +1,39 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from src.ai.client_registry import client_registry
+from src.ai.embedding import get_embedding_cache, get_rate_limiter_stats
+from src.schemas.api_response import APIResponse
+from src.services.warmup import warmup_state
+from src.utils.executors import get_executor_stats
+
+router = APIRouter()
+
+
+@router.get("/live", response_model=APIResponse)
+async def live():
+    """存活检查：进程能处理请求即返回成功"""
+    return APIResponse(retcode=0, message="success")
+
+
+@router.get("/ready", response_model=APIResponse)
+async def ready():
+    """
+    就绪检查：启动预热完成后才返回成功，预热期间返回 503
+
+    同时返回线程池、限流器、嵌入缓存和客户端注册表的运行状态。
+    """
+    embedding_cache = get_embedding_cache()
+    data = {
+        "warmup": warmup_state.as_dict(),
+        "executors": get_executor_stats(),
+        "rate_limiters": get_rate_limiter_stats(),
+        "embedding_cache": embedding_cache.stats() if embedding_cache else None,
+        "client_registry": client_registry.stats(),
+    }
+    if not warmup_state.ready:
+        return JSONResponse(
+            status_code=503,
+            content=APIResponse(retcode=503, message="warming up", data=data).model_dump(),
+        )
+    return APIResponse(retcode=0, message="success", data=data)
@@ -2,6 +2,7 @@
 知识库 API 端点
 """
 import asyncio
+from dataclasses import asdict
 from datetime import datetime
 from pathlib import Path
 from typing import List, Optional
@@ -10,11 +11,13 @@ from fastapi import APIRouter, Depends, Form, File, UploadFile, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.schemas.api_response import APIResponse
+from src.schemas.knowledge_base import KnowledgeBaseRetrievalSettings
 from src.utils.authentic import get_current_user
 from src.api.deps import get_db
 from src.db.models.knowledge_base import KnowledgeBase, KnowledgeBaseStatus
 from src.services.knowledge_base_file_service import KnowledgeBaseFileService
 from src.services.rag_service import get_rag_service
+from src.ai.rag.context_policy import ContextPolicy
 
 
 router = APIRouter()
@@ -54,14 +57,22 @@ async def process_knowledge_base_files_background(
         for file in files:
             try:
                 # Embed 文件
-                result = rag_service.embed_knowledge_base_file(
+                result = await rag_service.embed_knowledge_base_file(
                     file_path=Path(file.file_path),
                     file_id=file.id,
                     knowledge_base_id=knowledge_base_id,
                     user_id=kb.user_id,
-                    file_name=file.file_name
+                    file_name=file.file_name,
+                    on_progress=lambda p, name=file.file_name: print(
+                        f"文件 {name} 第 {p.batch_index + 1} 批完成: "
+                        f"已读取 {p.chunk_count} 个分块，已写入 {p.stored_count} 个"
+                    )
+                )
+                print(
+                    f"文件 {file.file_name} 处理完成: {result.chunk_count} 个分块，"
+                    f"去重后 {result.unique_chunk_count} 个，未变化跳过 {result.skipped_chunk_count} 个，"
+                    f"删除过期分块 {result.stale_chunk_count} 个"
                 )
-                print(f"文件 {file.file_name} 处理完成: {result.chunk_count} 个分块")
                 
                 # 收集文件信息
                 file_list.append({
@@ -228,7 +239,7 @@ async def delete_knowledge_base(
     
     # 删除向量
     rag_service = get_rag_service()
-    rag_service.delete_knowledge_base_vectors(knowledge_base_id)
+    await rag_service.delete_knowledge_base_vectors(knowledge_base_id)
     
     # 删除知识库记录
     success = await kb_crud.delete_knowledge_base(db, knowledge_base_id)
@@ -237,3 +248,76 @@ async def delete_knowledge_base(
         return APIResponse(retcode=500, message="删除知识库失败", data=None)
     
     return APIResponse(retcode=0, message="success", data=None)
+
+
+@router.get("/vector-stats/{knowledge_base_id}", response_model=APIResponse)
+async def get_knowledge_base_vector_stats(
+    knowledge_base_id: int,
+    user_id: int = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """获取知识库的向量统计（向量数量、占用字节数、分块大小分布）"""
+    from src.crud import knowledge_base as kb_crud
+    
+    kb = await kb_crud.get_knowledge_base_by_id(db, knowledge_base_id)
+    if not kb:
+        return APIResponse(retcode=404, message="知识库不存在", data=None)
+    if kb.user_id != user_id:
+        return APIResponse(retcode=403, message="无权查看此知识库", data=None)
+    
+    rag_service = get_rag_service()
+    stats = await rag_service.get_scope_stats("knowledge_base_id", knowledge_base_id)
+    return APIResponse(retcode=0, message="success", data=stats)
+
+
+@router.get("/retrieval-settings/{knowledge_base_id}", response_model=APIResponse)
+async def get_knowledge_base_retrieval_settings(
+    knowledge_base_id: int,
+    user_id: int = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """获取知识库的 RAG 上下文筛选配置（settings 为知识库单独设置的字段，effective 为实际生效的配置）"""
+    from src.crud import knowledge_base as kb_crud
+    
+    kb = await kb_crud.get_knowledge_base_by_id(db, knowledge_base_id)
+    if not kb:
+        return APIResponse(retcode=404, message="知识库不存在", data=None)
+    if kb.user_id != user_id:
+        return APIResponse(retcode=403, message="无权查看此知识库", data=None)
+    
+    return APIResponse(
+        retcode=0,
+        message="success",
+        data={
+            "settings": kb.retrieval_settings or {},
+            "effective": asdict(ContextPolicy.from_settings(kb.retrieval_settings)),
+        },
+    )
+
+
+@router.post("/retrieval-settings/{knowledge_base_id}", response_model=APIResponse)
+async def update_knowledge_base_retrieval_settings(
+    knowledge_base_id: int,
+    settings: KnowledgeBaseRetrievalSettings,
+    user_id: int = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """设置知识库的 RAG 上下文筛选配置，未提供的字段恢复为部署级配置"""
+    from src.crud import knowledge_base as kb_crud
+    
+    kb = await kb_crud.get_knowledge_base_by_id(db, knowledge_base_id)
+    if not kb:
+        return APIResponse(retcode=404, message="知识库不存在", data=None)
+    if kb.user_id != user_id:
+        return APIResponse(retcode=403, message="无权修改此知识库", data=None)
+    
+    overrides = settings.model_dump(exclude_none=True)
+    kb = await kb_crud.update_knowledge_base_retrieval_settings(db, knowledge_base_id, overrides or None)
+    return APIResponse(
+        retcode=0,
+        message="success",
+        data={
+            "settings": kb.retrieval_settings or {},
+            "effective": asdict(ContextPolicy.from_settings(kb.retrieval_settings)),
+        },
+    )
@@ -20,6 +20,7 @@ from src.crud.model import (
     delete_model_config as crud_delete_model_config,
 )
 from src.schemas.api_response import APIResponse
+from src.ai.client_registry import client_registry
 from src.crud.user import get_user_default_model_config_id, set_user_default_model_config
 
 router = APIRouter()
@@ -118,6 +119,9 @@ async def update_model_config(
     if model_config.user_id != user_id:
         return APIResponse(retcode=403, message="Unauthorized access to this config", data=None)
     
+    # 记录旧凭据，更新后使对应的复用客户端失效
+    old_api_key, old_base_url = model_config.api_key, model_config.base_url
+    
     # 3. 更新配置（全量更新）
     updated_config = await crud_update_model_config(
         db=db,
@@ -133,6 +137,8 @@ async def update_model_config(
     if not updated_config:
         return APIResponse(retcode=1, message="Failed to update config", data=None)
     
+    client_registry.invalidate(old_api_key, old_base_url)
+    
     # 4. 如果需要设为默认，更新用户的默认配置
     if config.is_default is True:
         await set_user_default_model_config(db, user_id, config.id)
@@ -167,10 +173,14 @@ async def delete_model_config(
     is_default = (default_model_id == request.id)
     
     # 4. 删除配置
+    api_key, base_url = model_config.api_key, model_config.base_url
     success = await crud_delete_model_config(db, request.id)
     if not success:
         return APIResponse(retcode=1, message="Failed to delete config", data=None)
     
+    # 使该配置对应的复用客户端失效
+    client_registry.invalidate(api_key, base_url)
+    
     # 5. 如果删除的是默认配置，清空用户的默认配置
     if is_default:
         await set_user_default_model_config(db, user_id, None)
@@ -6,6 +6,7 @@ from src.utils.authentic import get_current_user
 from src.schemas.api_response import APIResponse
 from src.crud.user import get_user_by_id
 from src.schemas.user import UserResponse
+from src.services.rag_service import get_rag_service
 
 router = APIRouter()
 
@@ -17,3 +18,9 @@ async def get_user(user_id: int = Depends(get_current_user), db: AsyncSession =
     response = UserResponse.model_validate(user)
     return APIResponse(retcode=0, message="success", data=response)
 
+
+@router.get("/vector-stats")
+async def get_user_vector_stats(user_id: int = Depends(get_current_user)):
+    """获取当前用户所有会话文件和知识库的向量统计"""
+    stats = await get_rag_service().get_scope_stats("user_id", user_id)
+    return APIResponse(retcode=0, message="success", data=stats)
@@ -2,8 +2,9 @@ from functools import lru_cache
 from .settings import Settings
 from .database import DatabaseSettings
 from .auth import AuthSettings
-from .ai import LLMSettings, EmbeddingSettings
+from .ai import LLMSettings, EmbeddingSettings, AIClientSettings, RAGSettings
 from .cors import CORSSettings
+from .executor import ExecutorSettings
 
 
 # 导出配置实例（带缓存）
@@ -32,16 +33,34 @@ def get_embedding_settings() -> EmbeddingSettings:
     return EmbeddingSettings()
 
 
+@lru_cache
+def get_ai_client_settings() -> AIClientSettings:
+    return AIClientSettings()
+
+
+@lru_cache
+def get_rag_settings() -> RAGSettings:
+    return RAGSettings()
+
+
 @lru_cache
 def get_cors_settings() -> CORSSettings:
     return CORSSettings()
 
 
+@lru_cache
+def get_executor_settings() -> ExecutorSettings:
+    return ExecutorSettings()
+
+
 # 便捷导出实例
 settings = get_settings()
 database = get_database_settings()
 auth = get_auth_settings()
 llm = get_llm_settings()
 embedding = get_embedding_settings()
+ai_client = get_ai_client_settings()
+rag = get_rag_settings()
 cors = get_cors_settings()
+executor = get_executor_settings()
 
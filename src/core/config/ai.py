@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
 
@@ -18,9 +20,35 @@ class LLMSettings(BaseSettings):
 
 class EmbeddingSettings(BaseSettings):
     """Embedding 配置"""
+    # 后端类型：openai（远程 OpenAI 兼容接口）/ sentence_transformers（本地模型）/ hashing（本地特征哈希，用于测试）
+    backend: Literal["openai", "sentence_transformers", "hashing"] = Field(
+        default="openai", validation_alias="EMBEDDING_BACKEND"
+    )
     api_key: str | None = Field(default=None, validation_alias="DASHSCOPE_API_KEY")
     base_url: str | None = Field(default=None, validation_alias="QWEN_BASE_URL")
     model_name: str | None = Field(default="text-embedding-v1", validation_alias="TONGYI_MODEL_NAME")
+    # 单次请求的最大文本条数（DashScope 兼容接口单批上限为 10~25，视模型而定）
+    batch_size: int = Field(default=10, ge=1, validation_alias="EMBEDDING_BATCH_SIZE")
+    # 同时在途的批次数上限
+    max_concurrency: int = Field(default=4, ge=1, validation_alias="EMBEDDING_MAX_CONCURRENCY")
+    # 自适应限流（按 API Key，单位：请求/秒）与重试
+    rate_limit: float = Field(default=10, gt=0, validation_alias="EMBEDDING_RATE_LIMIT")
+    rate_limit_min: float = Field(default=0.5, gt=0, validation_alias="EMBEDDING_RATE_LIMIT_MIN")
+    rate_limit_max: float = Field(default=50, gt=0, validation_alias="EMBEDDING_RATE_LIMIT_MAX")
+    max_retries: int = Field(default=5, ge=0, validation_alias="EMBEDDING_MAX_RETRIES")
+    retry_base_delay: float = Field(default=0.5, gt=0, validation_alias="EMBEDDING_RETRY_BASE_DELAY")
+    retry_max_delay: float = Field(default=30, gt=0, validation_alias="EMBEDDING_RETRY_MAX_DELAY")
+    # 本地后端配置
+    local_model_name: str = Field(default="BAAI/bge-small-zh-v1.5", validation_alias="EMBEDDING_LOCAL_MODEL")
+    local_device: str = Field(default="cpu", validation_alias="EMBEDDING_LOCAL_DEVICE")
+    hashing_dimension: int = Field(default=512, ge=8, validation_alias="EMBEDDING_HASHING_DIMENSION")
+    # 本地持久化向量缓存
+    cache_enabled: bool = Field(default=True, validation_alias="EMBEDDING_CACHE_ENABLED")
+    cache_path: str = Field(default="./cache/embeddings.db", validation_alias="EMBEDDING_CACHE_PATH")
+    cache_max_entries: int = Field(default=200_000, ge=1, validation_alias="EMBEDDING_CACHE_MAX_ENTRIES")
+    # 进程内查询向量缓存
+    query_cache_size: int = Field(default=1024, ge=1, validation_alias="EMBEDDING_QUERY_CACHE_SIZE")
+    query_cache_ttl: float = Field(default=600, gt=0, validation_alias="EMBEDDING_QUERY_CACHE_TTL")
     
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -28,3 +56,61 @@ class EmbeddingSettings(BaseSettings):
         extra="ignore",
     )
 
+
+class AIClientSettings(BaseSettings):
+    """模型客户端复用配置"""
+    idle_ttl: float = 600  # 空闲超时（秒）
+    max_entries: int = 256  # 最多缓存的客户端数量
+    close_delay: float = 120  # 被淘汰 / 失效的客户端延迟关闭的时间（秒），让仍在使用它的请求完成
+    
+    model_config = SettingsConfigDict(
+        env_prefix="AI_CLIENT_",
+        env_file=".env",
+        env_file_encoding="utf-8",
+        extra="ignore",
+    )
+
+
+class RAGSettings(BaseSettings):
+    """RAG 入库与检索配置"""
+    # 分块去重：完全重复与近似重复（MinHash 估计的 Jaccard 相似度 >= 阈值）的分块只嵌入一次
+    dedup_enabled: bool = True
+    dedup_threshold: float = Field(default=0.9, gt=0, le=1)
+    # 流式入库：每批读取、嵌入并写入的分块数量
+    ingest_batch_size: int = Field(default=64, ge=1)
+    # 精确检索：过滤范围内的向量数不超过阈值时，用缓存的 float32 矩阵做暴力余弦 top-k（0 表示禁用）
+    exact_search_threshold: int = Field(default=2000, ge=0)
+    # 缓存矩阵和文本的总字节数上限（每个 worker 进程各一份；2000 个 1536 维向量约 12 MB）
+    exact_cache_max_bytes: int = Field(default=256 * 1024 * 1024, ge=0)
+    # 混合检索：BM25 词法检索与向量检索的结果按倒数排名融合（RRF）
+    hybrid_enabled: bool = True
+    hybrid_fetch_k: int = Field(default=20, ge=1)  # 每路检索的候选数量
+    rrf_k: int = Field(default=60, ge=1)  # RRF 平滑常数
+    # 词法检索高置信（最佳结果包含全部查询词项，且分数领先第二名足够多）时跳过查询向量化
+    lexical_skip_embedding: bool = True
+    lexical_confidence_margin: float = Field(default=1.5, ge=1)
+    # 多范围检索（会话文件 + 多个知识库）的配额：每个范围至少 / 最多保留的结果数（0 表示不限制）
+    scope_min_results: int = Field(default=0, ge=0)
+    scope_max_results: int = Field(default=0, ge=0)
+    # RAG 上下文筛选：最多注入 top_k 个分块；相似度低于下限、低于最佳结果 relative_score_cutoff 倍
+    # 或超出 token 预算的分块不注入（0 表示不限制）。知识库可以单独覆盖这些配置
+    top_k: int = Field(default=5, ge=1)
+    min_score: float = Field(default=0.2, ge=0, le=1)
+    relative_score_cutoff: float = Field(default=0.5, ge=0, le=1)
+    context_max_tokens: int = Field(default=2000, ge=0)
+    # MMR 多样性重排：多取 mmr_fetch_k 个候选（带向量），按 λ · 相关性 - (1 - λ) · 冗余度 选出最终结果
+    mmr_enabled: bool = True
+    mmr_lambda: float = Field(default=0.7, ge=0, le=1)
+    mmr_fetch_k: int = Field(default=20, ge=1)
+    # 启动预热：应用启动后预加载向量索引、创建 RAG 服务并预热模型连接，完成前就绪检查返回 503
+    warmup_enabled: bool = True
+    warmup_max_partitions: int = Field(default=32, ge=0)  # 最多预加载的分区数量（按向量数量从大到小）
+    warmup_embedding: bool = True  # 发送一次嵌入请求以建立模型服务连接（使用 API 时计一次调用）
+    warmup_timeout: float = Field(default=120, gt=0)  # 预热超时（秒），超时后仍标记为就绪
+    
+    model_config = SettingsConfigDict(
+        env_prefix="RAG_",
+        env_file=".env",
+        env_file_encoding="utf-8",
+        extra="ignore",
+    )
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -30,6 +32,17 @@ class ChromaSettings(BaseSettings):
     """Chroma 向量数据库配置"""
     path: str = "./chroma_data"  # 默认持久化路径
     collection_name: str = "documents"  # 默认集合名称
+    # 分区模式：single 所有向量存入同一集合；scope 按知识库 / 会话拆分为 kb_{id} / conv_{id} 集合
+    partition_mode: Literal["single", "scope"] = "single"
+    migrate_batch_size: int = 500  # 旧集合迁移到分区集合时每批搬运的向量数量
+    # 删除标记：删除知识库 / 会话时只写标记，后台定期物理清除
+    compaction_interval: float = 60  # 后台清除的间隔（秒）
+    tombstone_overfetch: int = 2  # 检索结果可能包含已删除分块时的多取倍数
+    # 分批写入：每批不超过客户端允许的最大批大小，失败的批次单独重试
+    write_batch_size: int = 1000  # 单次写入的向量数量
+    write_concurrency: int = 1  # 同时写入的批次数量（1 表示顺序写入）
+    write_retries: int = 2  # 每批失败后的重试次数
+    write_retry_delay: float = 0.5  # 首次重试前的等待时间（秒），之后按指数退避
     
     model_config = SettingsConfigDict(
         env_prefix="CHROMA_",
@@ -39,5 +52,35 @@ class ChromaSettings(BaseSettings):
     )
 
 
+class VectorStoreSettings(BaseSettings):
+    """向量存储后端配置"""
+    # 后端类型：chroma（Chroma 持久化客户端）/ local（内存映射文件 + 可选 hnswlib）
+    backend: Literal["chroma", "local"] = "chroma"
+    local_path: str = "./vector_data"  # local 后端的数据目录
+    # local 后端：分区向量数超过该值且安装了 hnswlib 时使用 HNSW 索引，否则精确检索
+    ann_threshold: int = 20000
+    hnsw_m: int = 16
+    hnsw_ef_construction: int = 200
+    hnsw_ef: int = 64
+    # 部署模式：embedded 每个进程各自打开向量存储；remote 通过 HTTP 访问独立的向量存储服务进程
+    mode: Literal["embedded", "remote"] = "embedded"
+    server_url: str = "http://localhost:8100"  # remote 模式下 API 进程访问的服务地址
+    # 向量存储服务监听地址：默认只监听本机；需要被其他主机 / 容器访问时改为 0.0.0.0，并且必须配置 api_key
+    server_host: str = "127.0.0.1"
+    server_port: int = 8100
+    # 服务与客户端共享的密钥（请求头 X-Vector-Store-Key）；未配置时服务只接受本机请求
+    api_key: str = ""
+    client_max_connections: int = 32  # remote 模式下每个 API 进程的连接池大小
+    client_timeout: float = 60  # remote 模式下单次请求超时（秒）
+    
+    model_config = SettingsConfigDict(
+        env_prefix="VECTOR_STORE_",
+        env_file=".env",
+        env_file_encoding="utf-8",
+        extra="ignore",
+    )
+
+
 # 创建配置单例
-chroma_settings = ChromaSettings()
\ No newline at end of file
+chroma_settings = ChromaSettings()
+vector_store_settings = VectorStoreSettings()
\ No newline at end of file
@@ -0,0 +1,16 @@
+from pydantic import Field
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class ExecutorSettings(BaseSettings):
+    """阻塞任务线程池配置：每类阻塞任务使用独立的线程池和并发上限"""
+    vector_store_workers: int = Field(default=4, ge=1)  # Chroma 读写
+    parse_workers: int = Field(default=2, ge=1)  # 文档解析与分块
+    auth_workers: int = Field(default=2, ge=1)  # bcrypt 哈希与校验
+    
+    model_config = SettingsConfigDict(
+        env_prefix="EXECUTOR_",
+        env_file=".env",
+        env_file_encoding="utf-8",
+        extra="ignore",
+    )
@@ -40,6 +40,19 @@ async def get_knowledge_base_by_id(
     return result.scalar_one_or_none()
 
 
+async def get_knowledge_bases_by_ids(
+    db: AsyncSession,
+    kb_ids: List[int]
+) -> List[KnowledgeBase]:
+    """根据 ID 列表批量获取知识库"""
+    if not kb_ids:
+        return []
+    result = await db.execute(
+        select(KnowledgeBase).where(KnowledgeBase.id.in_(kb_ids))
+    )
+    return list(result.scalars().all())
+
+
 async def delete_knowledge_base(db: AsyncSession, kb_id: int) -> bool:
     """删除知识库"""
     knowledge_base = await get_knowledge_base_by_id(db, kb_id)
@@ -124,4 +137,19 @@ async def update_knowledge_base_file_list(
     kb.file_list = file_list
     await db.commit()
     await db.refresh(kb)
-    return kb
\ No newline at end of file
+    return kb
+
+async def update_knowledge_base_retrieval_settings(
+    db: AsyncSession,
+    kb_id: int,
+    retrieval_settings: Optional[Dict[str, Any]]
+) -> Optional[KnowledgeBase]:
+    """更新知识库的 RAG 上下文筛选配置"""
+    kb = await get_knowledge_base_by_id(db, kb_id)
+    if not kb:
+        return None
+    
+    kb.retrieval_settings = retrieval_settings
+    await db.commit()
+    await db.refresh(kb)
+    return kb
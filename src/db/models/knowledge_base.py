@@ -22,6 +22,8 @@ class KnowledgeBase(Base):
     status = Column(Integer, nullable=False, default=KnowledgeBaseStatus.UPLOADING)
     # 存储文件信息列表: [{"file_id": 1, "file_name": "xxx.pdf"}, ...]
     file_list = Column(JSON, nullable=True, default=list)
+    # RAG 上下文筛选配置（覆盖部署级 RAG_* 配置）: {"top_k": 5, "min_score": 0.3, ...}，为空时使用部署级配置
+    retrieval_settings = Column(JSON, nullable=True)
     
     # 关联关系
     knowledge_base_files = relationship("KnowledgeBaseFile", back_populates="knowledge_base", cascade="all, delete-orphan")
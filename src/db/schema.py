@@ -0,0 +1,43 @@
+"""
+数据库结构升级 - 为已存在的表补齐模型中新增的列
+
+Base.metadata.create_all 只创建不存在的表，不会修改已有的表。给已有模型新增列时在 ADDED_COLUMNS 中登记，
+应用启动时在 create_all 之后执行 add_missing_columns，缺少的列用 ALTER TABLE 补上；列已存在时不做任何操作，可重复执行。
+登记的列必须允许为空（已有的行没有值）。
+"""
+from typing import List, Tuple
+
+from sqlalchemy import Table, inspect, text
+from sqlalchemy.engine import Connection
+
+from src.db.models import KnowledgeBase
+
+
+# (表, 列名)：按新增顺序登记
+ADDED_COLUMNS: List[Tuple[Table, str]] = [
+    (KnowledgeBase.__table__, "retrieval_settings"),
+]
+
+
+def add_missing_columns(conn: Connection) -> List[str]:
+    """
+    为已存在的表补齐 ADDED_COLUMNS 中缺少的列（同步函数，通过 AsyncConnection.run_sync 调用）
+
+    Returns:
+        新增的列（"表名.列名"）
+    """
+    inspector = inspect(conn)
+    preparer = conn.dialect.identifier_preparer
+    added: List[str] = []
+    for table, name in ADDED_COLUMNS:
+        if not inspector.has_table(table.name):
+            continue
+        if name in {column["name"] for column in inspector.get_columns(table.name)}:
+            continue
+        column = table.c[name]
+        conn.execute(text(
+            f"ALTER TABLE {preparer.format_table(table)} "
+            f"ADD COLUMN {preparer.format_column(column)} {column.type.compile(dialect=conn.dialect)} NULL"
+        ))
+        added.append(f"{table.name}.{name}")
+    return added
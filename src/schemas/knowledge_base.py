@@ -1,7 +1,6 @@
-from ast import List
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class KnowledgeBaseBase(BaseModel):
     name: str = Field(..., description="知识库名称")
@@ -16,3 +15,11 @@ class KnowledgeBaseResponse(KnowledgeBaseBase):
     files_sizes: List[int] = Field(..., description="知识库文件大小列表")
     created_at: datetime = Field(..., description="知识库创建时间")
     updated_at: datetime = Field(..., description="知识库更新时间")
+
+
+class KnowledgeBaseRetrievalSettings(BaseModel):
+    """知识库的 RAG 上下文筛选配置，未设置的字段使用部署级配置（RAG_*）"""
+    top_k: Optional[int] = Field(None, ge=1, le=50, description="最多注入的分块数")
+    min_score: Optional[float] = Field(None, ge=0, le=1, description="相似度下限")
+    relative_score_cutoff: Optional[float] = Field(None, ge=0, le=1, description="相对最佳结果的分数比例下限")
+    context_max_tokens: Optional[int] = Field(None, ge=0, description="上下文 token 预算（0 表示不限制）")
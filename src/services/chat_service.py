@@ -17,6 +17,7 @@ from src.crud.conversation import (
     get_conversation_by_id,
 )
 from src.crud.conversation_file import get_files_by_conversation
+from src.crud.knowledge_base import get_knowledge_bases_by_ids
 from src.crud.conversation_log import (
     get_or_create_log_session,
     create_log_round,
@@ -34,7 +35,6 @@ from src.db.models.model_config import ModelConfig
 
 MAX_CHAT_ROUND = 20  # 保留最近 K 轮对话
 SUMMARY_TRIGGER_INTERVAL = 20  # 每 N 条消息触发一次总结
-RAG_TOP_K = 5  # RAG 检索返回的最大结果数量
 
 
 class ChatService:
@@ -183,16 +183,16 @@ class ChatService:
                 files_result_data = files_result  # 保存到日志变量
                 yield f'{{"files": {json.dumps(files_result)}}}\n'
                 
-                # 对上传的文件进行嵌入处理
+                # 对上传的文件进行嵌入处理（每个文件内去重）
                 for saved_file in saved_files:
                     try:
                         file_path = self.file_service.get_file_path(saved_file)
-                        self.rag_service.embed_conversation_file(
+                        await self.rag_service.embed_conversation_file(
                             file_path=file_path,
                             file_id=saved_file.id,
                             conversation_id=conversation_id,
                             user_id=user_id,
-                            file_name=saved_file.file_name  # 传递文件名用于 RAG 上下文展示
+                            file_name=saved_file.file_name,  # 传递文件名用于 RAG 上下文展示
                         )
                     except Exception as embed_error:
                         # 嵌入失败不阻塞聊天流程，只记录错误
@@ -204,34 +204,25 @@ class ChatService:
                 conversation_files = await get_files_by_conversation(self.db, conversation_id)
                 file_names = [f.file_name for f in conversation_files]
             
-            # RAG 检索：根据参数决定检索范围
+            # RAG 检索：会话文件和知识库在一次检索中完成，结果统一排序
+            # 查询向量按需生成并缓存在进程内；词法检索高置信时不需要向量化
+            # 只注入达到分数下限且在 token 预算内的分块，知识库可以单独设置这些阈值
             rag_results = []
-            
-            # 1. 检索会话文件
-            if conversation_id:
-                conversation_results = self.rag_service.retrieve_by_conversation(
+            if conversation_id or knowledge_base_ids:
+                knowledge_base_settings = {}
+                if knowledge_base_ids:
+                    knowledge_bases = await get_knowledge_bases_by_ids(self.db, knowledge_base_ids)
+                    knowledge_base_settings = {
+                        kb.id: kb.retrieval_settings for kb in knowledge_bases if kb.retrieval_settings
+                    }
+                rag_results = await self.rag_service.retrieve_context(
                     query=user_message,
                     conversation_id=conversation_id,
-                    top_k=RAG_TOP_K
-                )
-                rag_results.extend(conversation_results)
-            
-            # 2. 检索知识库
-            if knowledge_base_ids:
-                kb_results = self.rag_service.retrieve_by_knowledge_base(
-                    query=user_message,
                     knowledge_base_ids=knowledge_base_ids,
-                    top_k=RAG_TOP_K
+                    knowledge_base_settings=knowledge_base_settings
                 )
-                rag_results.extend(kb_results)
             
-            # 3. 如果有检索结果，按分数排序并限制数量
             if rag_results:
-                # 按相似度分数降序排序
-                rag_results = sorted(rag_results, key=lambda x: x.score, reverse=True)
-                # 限制最终结果数量
-                rag_results = rag_results[:RAG_TOP_K]
-                
                 # 返回 RAG 检索结果给前端
                 rag_results_data = {
                     "count": len(rag_results),
@@ -1,25 +1,53 @@
 """
 RAG 服务 - 提供文件嵌入和检索的统一接口
 """
+import time
+from itertools import islice
 from pathlib import Path
-from typing import List, Optional, TYPE_CHECKING
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TYPE_CHECKING
 from dataclasses import dataclass
 
-from src.ai.rag.chunking import FileChunker
-from src.ai.rag.embedding import Embedding
-from src.ai.rag.vector_store import get_vector_store
+import numpy as np
+from langchain_core.documents import Document
+
+from src.ai.client_registry import client_registry
+from src.ai.rag.chunking import FileChunker, chunk_id
+from src.ai.rag.compaction import get_compactor
+from src.ai.rag.context_policy import ContextPolicy, select_context
+from src.ai.rag.dedup import ChunkDeduplicator
+from src.ai.rag.embedding import create_embedding
+from src.ai.rag.vector_store import SearchRequest, VectorWriteError, get_async_vector_store
 from src.ai.rag.retriever import RetrievalResult, get_retriever
+from src.core.config import rag as rag_config
+from src.utils.executors import parse_executor
 
 if TYPE_CHECKING:
     from src.db.models.model_config import ModelConfig
 
 
+def _take(iterator: Iterator[Document], count: int) -> List[Document]:
+    """从分块迭代器中取出至多 count 个分块"""
+    return list(islice(iterator, count))
+
+
 @dataclass
 class EmbedResult:
     """嵌入结果"""
     file_id: int
     chunk_count: int
     vector_ids: List[str]
+    unique_chunk_count: int = 0  # 去重后存储的分块数量
+    skipped_chunk_count: int = 0  # 内容未变化、跳过向量化的分块数量
+    stale_chunk_count: int = 0  # 重新处理时删除的过期分块数量
+
+
+@dataclass
+class IngestProgress:
+    """流式入库进度（每批写入完成后回调一次）"""
+    file_id: int
+    batch_index: int
+    chunk_count: int  # 已读取的分块数量
+    stored_count: int  # 已写入向量存储的分块数量
 
 
 class RAGService:
@@ -36,27 +64,150 @@ class RAGService:
         self._chunker = FileChunker()
         
         # 如果提供了 model_config，使用其中的配置初始化 Embedding
+        # 后端类型由 EMBEDDING_BACKEND 决定，启用缓存时文件嵌入和查询嵌入都先查本地缓存
         if model_config:
-            self._embedding = Embedding(
+            self._embedding = create_embedding(
                 api_key=model_config.api_key,
                 base_url=model_config.base_url,
                 # model_name 使用环境变量中的 embedding 模型配置，因为 model_config 是 LLM 配置
             )
         else:
-            self._embedding = Embedding()
+            self._embedding = create_embedding()
         
-        self._vector_store = get_vector_store()
+        # Chroma 调用和文档解析都是阻塞操作，分别在专用线程池中执行
+        self._vector_store = get_async_vector_store()
         self._retriever = get_retriever(self._embedding, self._vector_store)
 
     # ==================== 嵌入相关 ====================
 
-    def embed_conversation_file(
+    @staticmethod
+    def create_deduplicator() -> Optional[ChunkDeduplicator]:
+        """
+        创建分块去重器，未启用去重时返回 None
+        
+        去重只在单个文件内进行：被合并的分块只存储在代表分块所属的文件下，
+        跨文件合并会导致删除或重新处理一个文件时丢失另一个文件的内容。
+        """
+        if not rag_config.dedup_enabled:
+            return None
+        return ChunkDeduplicator(threshold=rag_config.dedup_threshold)
+
+    async def _ingest(
+        self,
+        chunks: Iterable[Document],
+        file_id: int,
+        file_where: dict,
+        on_progress: Optional[Callable[[IngestProgress], None]] = None
+    ) -> EmbedResult:
+        """
+        流式入库：惰性读取分块，按批去重、向量化并写入向量存储
+        
+        每批写入完成后即可被检索，峰值内存只与批大小相关，与文件大小无关。
+        分块 ID 由 (来源类型, 文件 ID, 分块序号, 内容哈希) 确定，重复处理同一文件是幂等的：
+        内容未变化的分块跳过向量化，处理完成后删除文件中已不存在的旧分块。
+        
+        Args:
+            chunks: 分块迭代器
+            file_id: 文件 ID
+            file_where: 匹配该文件已有分块的过滤条件
+            on_progress: 每批完成后的进度回调（可选）
+        """
+        deduplicator = self.create_deduplicator()
+        chunk_iter = iter(chunks)
+        vector_ids: List[str] = []
+        unchanged: List[Document] = []
+        chunk_count = 0
+        batch_index = 0
+        
+        # 文件已有的分块（上次处理的结果，或中断前已写入的部分）
+        existing = await self._vector_store.get_metadatas(file_where)
+        
+        while True:
+            # 文档解析与分块在解析线程池中按批拉取，保持流式读取且不阻塞事件循环
+            batch = await parse_executor.run(_take, chunk_iter, rag_config.ingest_batch_size)
+            if not batch:
+                break
+            chunk_count += len(batch)
+            
+            # 1. 去重：重复分块只嵌入一次，来源信息保留在代表分块的元数据中
+            unique_chunks = deduplicator.deduplicate(batch) if deduplicator else batch
+            
+            if unique_chunks:
+                ids = [chunk_id(chunk.metadata) for chunk in unique_chunks]
+                
+                # 2. 内容未变化的分块已在向量存储中，跳过向量化和写入
+                fresh = [i for i, vector_id in enumerate(ids) if vector_id not in existing]
+                unchanged.extend(unique_chunks[i] for i, vector_id in enumerate(ids) if vector_id in existing)
+                
+                if fresh:
+                    # 3. 向量化
+                    texts = [unique_chunks[i].page_content for i in fresh]
+                    vectors = await self._embedding.embed_texts(texts)
+                    metadatas = [unique_chunks[i].metadata for i in fresh]
+                    
+                    # 4. 存入向量存储（按批写入，失败的批次在存储内部重试）
+                    try:
+                        await self._vector_store.add_vectors(vectors, texts, metadatas, ids=[ids[i] for i in fresh])
+                    except VectorWriteError as e:
+                        # 已写入的分块 ID 是确定的，重新处理该文件时会跳过它们，只补写失败的部分
+                        print(
+                            f"文件 {file_id} 第 {batch_index + 1} 批写入失败，已读取 {chunk_count} 个分块，"
+                            f"本批成功 {len(e.written_ids)} 条，失败 {len(e.failed_ids)} 条"
+                        )
+                        raise
+                if deduplicator:
+                    deduplicator.mark_stored(unique_chunks, ids)
+                vector_ids.extend(ids)
+            
+            if on_progress:
+                on_progress(IngestProgress(
+                    file_id=file_id,
+                    batch_index=batch_index,
+                    chunk_count=chunk_count,
+                    stored_count=len(vector_ids)
+                ))
+            batch_index += 1
+        
+        # 5. 回写元数据：已写入分块在后续批次中新增的重复来源，以及内容未变但元数据（如文件名）变化的分块
+        updates = {}
+        if deduplicator:
+            updates.update(zip(*deduplicator.pop_updated()))
+        for chunk in unchanged:
+            vector_id = chunk_id(chunk.metadata)
+            if chunk.metadata != existing[vector_id]:
+                updates[vector_id] = chunk.metadata
+        if updates:
+            await self._vector_store.update_metadatas(list(updates), list(updates.values()))
+        
+        # 6. 删除文件中已不存在的旧分块（内容变化、分块数减少或旧版本的随机 ID）
+        current = set(vector_ids)
+        stale = [vector_id for vector_id in existing if vector_id not in current]
+        if stale and not await self._vector_store.delete(stale, where=file_where):
+            # 过期分块仍可被检索到：作为写入失败抛出，重新处理该文件时会再次清理
+            print(f"文件 {file_id} 删除 {len(stale)} 个过期分块失败")
+            raise VectorWriteError(
+                written_ids=[],
+                failed_ids=stale,
+                errors=[RuntimeError(f"删除文件 {file_id} 的过期分块失败")],
+            )
+        
+        return EmbedResult(
+            file_id=file_id,
+            chunk_count=chunk_count,
+            vector_ids=vector_ids,
+            unique_chunk_count=len(vector_ids),
+            skipped_chunk_count=len(unchanged),
+            stale_chunk_count=len(stale)
+        )
+
+    async def embed_conversation_file(
         self,
         file_path: Path,
         file_id: int,
         conversation_id: int,
         user_id: int,
-        file_name: Optional[str] = None
+        file_name: Optional[str] = None,
+        on_progress: Optional[Callable[[IngestProgress], None]] = None
     ) -> EmbedResult:
         """
         嵌入会话文件
@@ -67,40 +218,33 @@ class RAGService:
             conversation_id: 会话 ID
             user_id: 用户 ID
             file_name: 文件名（用于在 RAG 检索结果中显示来源）
+            on_progress: 每批写入完成后的进度回调（可选）
             
         Returns:
             嵌入结果，包含分块数量和向量 ID 列表
         """
-        # 1. 分块
-        chunks = self._chunker.split_conversation_file(
+        chunks = self._chunker.iter_conversation_file(
             doc_path=file_path,
             file_id=file_id,
             conversation_id=conversation_id,
             user_id=user_id,
             file_name=file_name
         )
-        
-        # 2. 向量化
-        texts = [chunk.page_content for chunk in chunks]
-        vectors = self._embedding.embed_texts(texts)
-        metadatas = [chunk.metadata for chunk in chunks]
-        
-        # 3. 存入向量存储
-        vector_ids = self._vector_store.add_vectors(vectors, texts, metadatas)
-        
-        return EmbedResult(
-            file_id=file_id,
-            chunk_count=len(chunks),
-            vector_ids=vector_ids
-        )
+        file_where = {"$and": [
+            {"source_type": "conversation_file"},
+            {"conversation_id": conversation_id},
+            {"file_id": file_id},
+        ]}
+        return await self._ingest(chunks, file_id, file_where, on_progress)
 
-    def embed_knowledge_base_file(
+    async def embed_knowledge_base_file(
         self,
         file_path: Path,
         file_id: int,
         knowledge_base_id: int,
         user_id: int,
-        file_name: Optional[str] = None
+        file_name: Optional[str] = None,
+        on_progress: Optional[Callable[[IngestProgress], None]] = None
     ) -> EmbedResult:
         """
         嵌入知识库文件
@@ -111,40 +255,45 @@ class RAGService:
             knowledge_base_id: 知识库 ID
             user_id: 用户 ID
             file_name: 文件名（可选）
+            on_progress: 每批写入完成后的进度回调（可选）
             
         Returns:
             嵌入结果
         """
-        # 1. 分块
-        chunks = self._chunker.split_knowledge_base_file(
+        chunks = self._chunker.iter_knowledge_base_file(
             doc_path=file_path,
             file_id=file_id,
             knowledge_base_id=knowledge_base_id,
             user_id=user_id,
             file_name=file_name
         )
-        
-        # 2. 向量化
-        texts = [chunk.page_content for chunk in chunks]
-        vectors = self._embedding.embed_texts(texts)
-        metadatas = [chunk.metadata for chunk in chunks]
-        
-        # 3. 存入向量存储
-        vector_ids = self._vector_store.add_vectors(vectors, texts, metadatas)
-        
-        return EmbedResult(
-            file_id=file_id,
-            chunk_count=len(chunks),
-            vector_ids=vector_ids
-        )
+        file_where = {"$and": [
+            {"source_type": "knowledge_base"},
+            {"knowledge_base_id": knowledge_base_id},
+            {"file_id": file_id},
+        ]}
+        return await self._ingest(chunks, file_id, file_where, on_progress)
 
     # ==================== 检索相关 ====================
 
-    def retrieve_by_conversation(
+    async def embed_query(self, query: str) -> np.ndarray:
+        """
+        将查询向量化（带进程内缓存）
+        
+        一次请求需要检索多个范围时，先调用本方法，再把向量传给各检索方法，
+        避免对同一问题重复请求 Embedding 接口。
+        
+        Args:
+            query: 查询文本
+        """
+        return await self._retriever.embed_query(query)
+
+    async def retrieve_by_conversation(
         self,
         query: str,
         conversation_id: int,
-        top_k: int = 5
+        top_k: int = 5,
+        query_vector: Optional[np.ndarray] = None
     ) -> List[RetrievalResult]:
         """
         在指定会话范围内检索
@@ -153,14 +302,18 @@ class RAGService:
             query: 查询文本
             conversation_id: 会话 ID
             top_k: 返回的最大结果数量
+            query_vector: 预先计算好的查询向量（可选）
         """
-        return self._retriever.retrieve_by_conversation(query, conversation_id, top_k)
+        return await self._retriever.retrieve_by_conversation(
+            query, conversation_id, top_k, query_vector=query_vector
+        )
 
-    def retrieve_by_knowledge_base(
+    async def retrieve_by_knowledge_base(
         self,
         query: str,
         knowledge_base_ids: List[int],
-        top_k: int = 5
+        top_k: int = 5,
+        query_vector: Optional[np.ndarray] = None
     ) -> List[RetrievalResult]:
         """
         在指定知识库范围内检索（纯知识库 RAG）
@@ -169,11 +322,63 @@ class RAGService:
             query: 查询文本
             knowledge_base_ids: 知识库 ID 列表
             top_k: 返回的最大结果数量
+            query_vector: 预先计算好的查询向量（可选）
+        """
+        return await self._retriever.retrieve_by_knowledge_base(
+            query, knowledge_base_ids, top_k, query_vector=query_vector
+        )
+
+    async def retrieve_by_scopes(
+        self,
+        query: str,
+        conversation_id: Optional[int] = None,
+        knowledge_base_ids: Optional[List[int]] = None,
+        top_k: int = 5,
+        query_vector: Optional[np.ndarray] = None
+    ) -> List[RetrievalResult]:
+        """
+        一次检索会话文件和多个知识库，结果统一排序（按 RAG_SCOPE_* 配置应用范围配额）
+        
+        Args:
+            query: 查询文本
+            conversation_id: 会话 ID（可选）
+            knowledge_base_ids: 知识库 ID 列表（可选）
+            top_k: 返回的最大结果数量
+            query_vector: 预先计算好的查询向量（可选）
         """
-        return self._retriever.retrieve_by_knowledge_base(
-            query, knowledge_base_ids, top_k
+        return await self._retriever.retrieve_by_scopes(
+            query, conversation_id, knowledge_base_ids, top_k, query_vector=query_vector
         )
 
+    async def retrieve_context(
+        self,
+        query: str,
+        conversation_id: Optional[int] = None,
+        knowledge_base_ids: Optional[List[int]] = None,
+        knowledge_base_settings: Optional[Dict[int, dict]] = None
+    ) -> List[RetrievalResult]:
+        """
+        检索并筛选注入提示词的 RAG 上下文
+        
+        按 top_k 检索后，丢弃低于相似度下限 / 相对下限以及超出 token 预算的分块，
+        实际返回的数量随结果质量变化；覆盖了配置的知识库，其结果按该知识库的 top_k、分数下限和 token 预算筛选
+        （见 src.ai.rag.context_policy）。
+        
+        Args:
+            query: 查询文本
+            conversation_id: 会话 ID（可选）
+            knowledge_base_ids: 知识库 ID 列表（可选）
+            knowledge_base_settings: {知识库 ID: retrieval_settings}，覆盖部署级配置（可选）
+        """
+        policy = ContextPolicy.from_settings()
+        knowledge_base_policies = {
+            knowledge_base_id: ContextPolicy.from_settings(settings)
+            for knowledge_base_id, settings in (knowledge_base_settings or {}).items()
+        }
+        top_k = max([policy.top_k] + [p.top_k for p in knowledge_base_policies.values()])
+        results = await self.retrieve_by_scopes(query, conversation_id, knowledge_base_ids, top_k)
+        return select_context(results, policy, knowledge_base_policies)
+
     def format_context(
         self,
         results: List[RetrievalResult],
@@ -191,38 +396,92 @@ class RAGService:
 
     # ==================== 删除相关 ====================
 
-    def delete_file_vectors(self, file_id: int) -> bool:
+    async def delete_file_vectors(self, file_id: int) -> bool:
         """
         删除指定文件的所有向量
         
         Args:
             file_id: 文件 ID
         """
-        return self._vector_store.delete_by_file_id(file_id)
+        return await self._vector_store.delete_by_file_id(file_id)
 
-    def delete_conversation_vectors(self, conversation_id: int) -> bool:
+    async def delete_conversation_vectors(self, conversation_id: int) -> bool:
         """
         删除指定会话的所有向量
         
+        只写入删除标记（检索时立即生效），物理清除由后台任务完成。
+        
         Args:
             conversation_id: 会话 ID
         """
-        return self._vector_store.delete_by_metadata({"conversation_id": conversation_id})
+        await self._vector_store.mark_scope_deleted("conversation_id", conversation_id)
+        get_compactor().notify()
+        return True
 
-    def delete_knowledge_base_vectors(self, knowledge_base_id: int) -> bool:
+    async def delete_knowledge_base_vectors(self, knowledge_base_id: int) -> bool:
         """
         删除指定知识库的所有向量
         
+        只写入删除标记（检索时立即生效），物理清除由后台任务完成。
+        
         Args:
             knowledge_base_id: 知识库 ID
         """
-        return self._vector_store.delete_by_metadata({"knowledge_base_id": knowledge_base_id})
+        await self._vector_store.mark_scope_deleted("knowledge_base_id", knowledge_base_id)
+        get_compactor().notify()
+        return True
 
     # ==================== 统计相关 ====================
 
-    def get_total_vector_count(self) -> int:
+    async def get_total_vector_count(self) -> int:
         """获取向量总数"""
-        return self._vector_store.count()
+        return await self._vector_store.count()
+
+    async def get_scope_stats(self, key: Optional[str] = None, value: Optional[int] = None) -> dict:
+        """
+        获取范围统计：向量数量、向量与文档字节数、文件数和分块大小分布
+        
+        统计由写入 / 删除时维护的增量计数器汇总，不扫描向量，可用于容量规划和按范围选择检索策略。
+        
+        Args:
+            key: 范围字段（user_id / knowledge_base_id / conversation_id / file_id），None 表示全部数据
+            value: 范围取值
+        """
+        return await self._vector_store.scope_stats(key, value)
+
+    # ==================== 预热 ====================
+
+    async def warmup(self, max_partitions: int, embed: bool = True) -> dict:
+        """
+        预热检索链路：预加载向量索引和词法索引，可选地发送一次嵌入请求并执行一次完整检索
+
+        Args:
+            max_partitions: 最多预加载的分区数量
+            embed: 是否发送嵌入请求（建立模型服务的 HTTP 连接）
+
+        Returns:
+            各步骤耗时（毫秒）与预加载的分区数量
+        """
+        timings = {}
+
+        start = time.perf_counter()
+        partitions = await self._vector_store.warmup(max_partitions)
+        timings["vector_index_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+        start = time.perf_counter()
+        await self._vector_store.lexical_query("warmup", None, 1)
+        timings["lexical_index_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+        if embed:
+            start = time.perf_counter()
+            query_vector = await self._retriever.embed_query("warmup")
+            timings["embedding_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+            start = time.perf_counter()
+            await self._vector_store.query([SearchRequest(query_vector, 1, None)])
+            timings["query_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+        return {"partitions": partitions, **timings}
 
 
 # 便捷函数：获取 RAG 服务
@@ -234,15 +493,21 @@ def get_rag_service(model_config: Optional["ModelConfig"] = None) -> RAGService:
     获取 RAG 服务实例
     
     Args:
-        model_config: 模型配置。如果提供，将创建使用该配置的新实例；
+        model_config: 模型配置。如果提供，将返回按该配置凭据复用的实例；
                      如果未提供，将返回使用环境变量配置的单例实例。
     
     Returns:
         RAGService 实例
     """
-    # 如果提供了 model_config，每次都创建新实例（因为不同用户可能有不同的配置）
+    # 如果提供了 model_config，按凭据从注册表中复用实例（不同用户可能有不同的配置）
     if model_config:
-        return RAGService(model_config=model_config)
+        return client_registry.get_or_create(
+            "rag",
+            model_config.api_key,
+            model_config.base_url,
+            None,
+            lambda: RAGService(model_config=model_config),
+        )
     
     # 否则使用全局单例
     global _rag_service_instance
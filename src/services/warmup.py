@@ -0,0 +1,86 @@
+"""
+启动预热 - 应用启动后预加载向量存储、RAG 服务和模型客户端，并提供就绪状态
+
+RAG 服务和向量索引都是懒加载的，部署后的第一个聊天请求需要承担打开向量存储、加载 HNSW 索引、
+导入 langchain 和建立模型服务连接的耗时。预热在后台完成这些工作，完成前就绪检查返回未就绪，
+滚动部署时负载均衡不会把请求转发到尚未预热的实例。
+"""
+import asyncio
+import time
+from typing import Optional
+
+from src.core.config import llm as llm_config
+from src.core.config import rag as rag_config
+from src.services.rag_service import get_rag_service
+
+
+class WarmupState:
+    """预热状态"""
+
+    def __init__(self):
+        self.status = "pending"  # pending / running / ready / failed / timeout / disabled
+        self.steps: dict = {}
+        self.error: Optional[str] = None
+        self.duration_ms: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        """预热结束（包括失败和超时）后即视为就绪：预热失败只影响首个请求的耗时，不影响正确性"""
+        return self.status not in ("pending", "running")
+
+    def as_dict(self) -> dict:
+        return {
+            "status": self.status,
+            "steps": self.steps,
+            "error": self.error,
+            "duration_ms": self.duration_ms,
+        }
+
+
+warmup_state = WarmupState()
+
+
+async def _warmup() -> None:
+    """依次预热 RAG 服务（含向量存储与嵌入模型）和聊天模型客户端"""
+    # 创建 RAG 服务会打开向量存储、加载嵌入模型，在线程中执行以免阻塞存活检查
+    start = time.perf_counter()
+    rag_service = await asyncio.to_thread(get_rag_service)
+    warmup_state.steps["rag_service_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    warmup_state.steps.update(
+        await rag_service.warmup(rag_config.warmup_max_partitions, embed=rag_config.warmup_embedding)
+    )
+
+    if llm_config.api_key:
+        from src.ai.llm.chat_model import ChatModel
+
+        start = time.perf_counter()
+        ChatModel()
+        warmup_state.steps["chat_model_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+
+async def run_warmup() -> None:
+    """执行预热并记录结果，失败或超时时仍标记为就绪"""
+    if not rag_config.warmup_enabled:
+        warmup_state.status = "disabled"
+        return
+
+    warmup_state.status = "running"
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(_warmup(), timeout=rag_config.warmup_timeout)
+        warmup_state.status = "ready"
+    except asyncio.TimeoutError:
+        warmup_state.status = "timeout"
+        print(f"Warmup timed out after {rag_config.warmup_timeout}s")
+    except Exception as e:
+        warmup_state.status = "failed"
+        warmup_state.error = str(e)
+        print(f"Warmup failed: {e}")
+    warmup_state.duration_ms = round((time.perf_counter() - start) * 1000, 1)
+    print(f"Warmup finished ({warmup_state.status}): {warmup_state.steps}")
+
+
+def start_warmup() -> asyncio.Task:
+    """在后台启动预热（应用启动时调用），不阻塞存活检查"""
+    return asyncio.create_task(run_warmup())
@@ -0,0 +1,113 @@
+"""
+阻塞任务执行器 - 为不同类型的同步阻塞调用提供独立的有界线程池
+
+Chroma 读写、文档解析、bcrypt 都是同步阻塞调用，直接在事件循环中执行会卡住所有请求。
+每类任务使用独立的线程池和并发上限，互不抢占：大文件解析不会拖慢检索，登录高峰也不会占满向量存储的线程。
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from src.core.config import executor as executor_config
+
+T = TypeVar("T")
+
+
+class BoundedExecutor:
+    """带统计信息的有界线程池，任务超出线程数时在队列中等待"""
+
+    def __init__(self, name: str, max_workers: int):
+        """
+        初始化执行器
+
+        Args:
+            name: 执行器名称（同时作为线程名前缀）
+            max_workers: 最大线程数，即该类任务的并发上限
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._completed = 0
+        self._busy_time = 0.0
+        self._wait_time = 0.0
+        self._started_at = time.monotonic()
+
+    async def run(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """在线程池中执行阻塞函数并等待结果"""
+        submitted_at = time.monotonic()
+
+        def call():
+            started_at = time.monotonic()
+            with self._lock:
+                self._queued -= 1
+                self._active += 1
+                self._wait_time += started_at - submitted_at
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._completed += 1
+                    self._busy_time += time.monotonic() - started_at
+
+        with self._lock:
+            self._queued += 1
+        future = self._pool.submit(call)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # 任务尚未开始执行时直接从队列中取消
+            if future.cancel():
+                with self._lock:
+                    self._queued -= 1
+            raise
+
+    def stats(self) -> dict:
+        """
+        返回执行器状态
+
+        - queue_depth: 等待线程的任务数
+        - utilization: 当前忙碌线程占比
+        - busy_ratio: 启动以来线程的平均忙碌占比
+        - avg_wait_ms: 任务平均排队时间
+        """
+        with self._lock:
+            uptime = max(time.monotonic() - self._started_at, 1e-9)
+            return {
+                "name": self.name,
+                "max_workers": self.max_workers,
+                "active": self._active,
+                "queue_depth": self._queued,
+                "completed": self._completed,
+                "utilization": round(self._active / self.max_workers, 3),
+                "busy_ratio": round(self._busy_time / (uptime * self.max_workers), 3),
+                "avg_wait_ms": round(self._wait_time / self._completed * 1000, 3) if self._completed else 0.0,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """关闭线程池"""
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+
+# 各类阻塞任务的执行器
+vector_store_executor = BoundedExecutor("vector-store", executor_config.vector_store_workers)
+parse_executor = BoundedExecutor("parse", executor_config.parse_workers)
+auth_executor = BoundedExecutor("auth", executor_config.auth_workers)
+
+_executors = (vector_store_executor, parse_executor, auth_executor)
+
+
+def get_executor_stats() -> list:
+    """返回所有执行器的状态"""
+    return [executor.stats() for executor in _executors]
+
+
+def shutdown_executors() -> None:
+    """关闭所有执行器（应用退出时调用）"""
+    for executor in _executors:
+        executor.shutdown(wait=False)
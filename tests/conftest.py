@@ -0,0 +1,14 @@
+"""
+测试环境配置：导入 src 时会实例化全部配置类，数据库和 JWT 配置没有默认值，这里提供占位值
+（测试不连接数据库）
+"""
+import os
+
+for key, value in {
+    "DB_HOST": "localhost",
+    "DB_NAME": "test",
+    "DB_USER": "test",
+    "DB_PASSWORD": "test",
+    "JWT_SECRET_KEY": "test",
+}.items():
+    os.environ.setdefault(key, value)
@@ -0,0 +1,45 @@
+"""
+Chroma 向量存储测试：标记删除的范围立即从计数和检索中消失
+"""
+import numpy as np
+import pytest
+
+from src.ai.rag.vector_store import ChromaVectorStore, SearchRequest, chroma_settings
+
+
+@pytest.fixture(params=["single", "scope"])
+def store(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(chroma_settings, "path", str(tmp_path / "chroma"))
+    monkeypatch.setattr(chroma_settings, "partition_mode", request.param)
+    monkeypatch.setattr(ChromaVectorStore, "_instance", None)
+    return ChromaVectorStore()
+
+
+def _add(store, knowledge_base_id, count, seed):
+    vectors = np.random.default_rng(seed).normal(size=(count, 16)).astype(np.float32)
+    metadatas = [
+        {"source_type": "knowledge_base", "knowledge_base_id": knowledge_base_id, "file_id": knowledge_base_id}
+        for _ in range(count)
+    ]
+    ids = [f"kb{knowledge_base_id}-{i}" for i in range(count)]
+    store.add_vectors(vectors, [f"doc {i}" for i in range(count)], metadatas, ids)
+    return vectors
+
+
+def test_count_excludes_scopes_marked_deleted(store):
+    _add(store, 1, 5, seed=1)
+    _add(store, 2, 3, seed=2)
+    assert store.count() == 8
+
+    store.mark_scope_deleted("knowledge_base_id", 1)
+    assert store.count() == 3
+
+    assert store.compact() == 1
+    assert store.count() == 3
+
+
+def test_deleted_scope_is_not_searchable(store):
+    vectors = _add(store, 1, 5, seed=1)
+    store.mark_scope_deleted("knowledge_base_id", 1)
+    hits = store.query([SearchRequest(vectors[0], 5, {"knowledge_base_id": 1})])[0]
+    assert hits == []
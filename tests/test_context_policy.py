@@ -0,0 +1,86 @@
+"""
+上下文筛选测试：余弦分数下限只作用于有 vector_score 的结果，知识库的配置只约束该知识库的结果
+"""
+from src.ai.rag.context_policy import ContextPolicy, select_context
+from src.ai.rag.retriever import RetrievalResult
+
+
+def _policy(**overrides):
+    values = dict(top_k=5, min_score=0.3, relative_score_cutoff=0.5, context_max_tokens=0)
+    values.update(overrides)
+    return ContextPolicy(**values)
+
+
+def _result(content, score, vector_score=None):
+    return RetrievalResult(
+        content=content,
+        score=score,
+        metadata={"source_type": "conversation", "conversation_id": 1},
+        vector_score=vector_score,
+    )
+
+
+def test_lexical_only_hits_bypass_score_thresholds():
+    results = [
+        _result("vector", 0.032, vector_score=0.8),
+        _result("lexical", 0.016),
+        _result("weak", 0.015, vector_score=0.2),
+    ]
+    selected = select_context(results, _policy())
+    assert [r.content for r in selected] == ["vector", "lexical"]
+
+
+def test_relative_cutoff_uses_best_vector_score():
+    results = [
+        _result("lexical", 0.033),
+        _result("best", 0.032, vector_score=0.9),
+        _result("close", 0.031, vector_score=0.5),
+        _result("far", 0.030, vector_score=0.4),
+    ]
+    selected = select_context(results, _policy())
+    assert [r.content for r in selected] == ["lexical", "best", "close"]
+
+
+def test_lexical_only_hits_still_respect_top_k():
+    results = [_result(f"lexical-{i}", 0.016 - i * 0.001) for i in range(4)]
+    selected = select_context(results, _policy(top_k=2))
+    assert [r.content for r in selected] == ["lexical-0", "lexical-1"]
+
+
+def _kb_result(content, knowledge_base_id, vector_score=0.8):
+    return RetrievalResult(
+        content=content,
+        score=vector_score,
+        metadata={"source_type": "knowledge_base", "knowledge_base_id": knowledge_base_id},
+        vector_score=vector_score,
+    )
+
+
+def test_knowledge_base_can_tighten_top_k_and_min_score():
+    results = [
+        _kb_result("strict-1", 1, 0.9),
+        _kb_result("strict-2", 1, 0.85),
+        _kb_result("loose-1", 2, 0.6),
+        _kb_result("strict-3", 1, 0.8),
+        _kb_result("loose-2", 2, 0.55),
+        _kb_result("loose-3", 2, 0.5),
+    ]
+    strict = _policy(top_k=2, min_score=0.82)
+    selected = select_context(results, _policy(top_k=5), {1: strict})
+
+    # 知识库 1 最多 2 个且分数不低于 0.82；知识库 2 使用部署级配置
+    assert [r.content for r in selected] == ["strict-1", "strict-2", "loose-1", "loose-2", "loose-3"]
+
+
+def test_knowledge_base_can_tighten_token_budget():
+    chunk = "字" * 100
+    results = [_kb_result(f"{chunk}{i}", 1) for i in range(3)] + [_kb_result(f"{chunk}{i}", 2) for i in range(3)]
+    selected = select_context(results, _policy(context_max_tokens=2000), {1: _policy(context_max_tokens=150)})
+
+    assert [r.metadata["knowledge_base_id"] for r in selected] == [1, 2, 2, 2]
+
+
+def test_knowledge_base_can_raise_top_k():
+    results = [_kb_result(f"kb1-{i}", 1) for i in range(8)]
+    selected = select_context(results, _policy(top_k=3), {1: _policy(top_k=6)})
+    assert len(selected) == 6
@@ -0,0 +1,46 @@
+"""
+分块去重测试：不相关的文本不会被合并，重复与近似重复的文本会被合并
+"""
+import random
+import string
+
+from langchain_core.documents import Document
+
+from src.ai.rag.dedup import ChunkDeduplicator
+
+
+def _chunks(texts):
+    return [Document(page_content=text, metadata={"file_id": 1, "chunk_index": i}) for i, text in enumerate(texts)]
+
+
+def _random_paragraph(rng: random.Random, words: int = 80) -> str:
+    return " ".join(
+        "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 9)))
+        for _ in range(words)
+    )
+
+
+def test_unrelated_paragraphs_are_never_merged():
+    rng = random.Random(0)
+    texts = [_random_paragraph(rng) for _ in range(200)]
+    assert len(ChunkDeduplicator(threshold=0.9).deduplicate(_chunks(texts))) == len(texts)
+
+
+def test_similar_source_code_is_not_merged_below_threshold():
+    # 结构相似但内容不同的代码片段（Jaccard 明显低于阈值）
+    texts = [
+        f"def handler_{i}(request):\n    value = request.get('field_{i}')\n    return process_{i * 7}(value, {i})\n"
+        for i in range(100)
+    ]
+    assert len(ChunkDeduplicator(threshold=0.9).deduplicate(_chunks(texts))) == len(texts)
+
+
+def test_exact_and_near_duplicates_are_merged():
+    rng = random.Random(1)
+    base = _random_paragraph(rng, words=120)
+    near = base[:-3] + "xyz"
+    other = _random_paragraph(rng, words=120)
+    deduplicator = ChunkDeduplicator(threshold=0.9)
+    unique = deduplicator.deduplicate(_chunks([base, base, near, other]))
+    assert [chunk.page_content for chunk in unique] == [base, other]
+    assert unique[0].metadata["duplicate_count"] == 3
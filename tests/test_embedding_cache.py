@@ -0,0 +1,70 @@
+"""
+Embedding 缓存测试：命中时不再调用底层服务，超出容量时淘汰最久未访问的条目
+"""
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+
+import src.ai.embedding.cache as cache_module
+from src.ai.embedding.base import BaseEmbedding
+from src.ai.embedding.cache import CachedEmbedding, EmbeddingCache, text_hash
+
+
+class CountingEmbedding(BaseEmbedding):
+    """记录每次调用传入的文本"""
+
+    model_name = "counting"
+
+    def __init__(self):
+        self.calls = []
+
+    async def embed_text(self, text):
+        return (await self.embed_texts([text]))[0]
+
+    async def embed_texts(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[len(text), ord(text[0])] for text in texts], dtype=np.float32)
+
+
+def _vector(value):
+    return np.array([value, value], dtype=np.float32)
+
+
+def test_cached_embedding_only_embeds_misses(tmp_path):
+    embedding = CountingEmbedding()
+    cached = CachedEmbedding(embedding, EmbeddingCache(str(tmp_path / "cache.db"), max_entries=100))
+
+    first = asyncio.run(cached.embed_texts(["alpha", "beta", "alpha"]))
+    # 规范化后相同的文本视为同一条
+    second = asyncio.run(cached.embed_texts(["beta", "  alpha ", "gamma"]))
+
+    assert embedding.calls == [["alpha", "beta"], ["gamma"]]
+    np.testing.assert_array_equal(first[0], first[2])
+    np.testing.assert_array_equal(second[0], first[1])
+    np.testing.assert_array_equal(second[1], first[0])
+    assert cached._cache.stats()["hits"] == 2
+
+
+def test_cache_persists_across_instances(tmp_path):
+    path = str(tmp_path / "cache.db")
+    EmbeddingCache(path, max_entries=100).put_many("m", {text_hash("alpha"): _vector(1)})
+
+    found = EmbeddingCache(path, max_entries=100).get_many("m", [text_hash("alpha"), text_hash("beta")])
+    assert list(found) == [text_hash("alpha")]
+    np.testing.assert_array_equal(found[text_hash("alpha")], _vector(1))
+
+
+def test_cache_evicts_least_recently_accessed(tmp_path, monkeypatch):
+    clock = iter(range(100))
+    monkeypatch.setattr(cache_module, "time", SimpleNamespace(time=lambda: next(clock)))
+    cache = EmbeddingCache(str(tmp_path / "cache.db"), max_entries=2)
+
+    cache.put_many("m", {"a": _vector(1)})
+    cache.put_many("m", {"b": _vector(2)})
+    # 访问 a 后，b 成为最久未访问的条目
+    assert list(cache.get_many("m", ["a"])) == ["a"]
+    cache.put_many("m", {"c": _vector(3)})
+
+    assert sorted(cache.get_many("m", ["a", "b", "c"])) == ["a", "c"]
+    assert cache.stats()["size"] == 2
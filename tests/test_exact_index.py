@@ -0,0 +1,53 @@
+"""
+精确检索索引测试：缓存按总字节数淘汰，检索结果与暴力计算一致
+"""
+import numpy as np
+
+from src.ai.rag.exact_index import ExactIndex
+
+
+def _entry(index, scope, rows, dimension=64):
+    rng = np.random.default_rng(rows)
+    return index.build(
+        frozenset({("conversation_id", scope)}),
+        [f"{scope}-{i}" for i in range(rows)],
+        ["" for _ in range(rows)],
+        [{"conversation_id": scope} for _ in range(rows)],
+        rng.normal(size=(rows, dimension)).astype(np.float32),
+    )
+
+
+def test_cache_is_bounded_by_bytes():
+    entry_bytes = _entry(ExactIndex(100, 0), 0, 100).nbytes
+    index = ExactIndex(threshold=100, max_bytes=entry_bytes * 2)
+    for scope in range(3):
+        index.put(f"s{scope}", _entry(index, scope, 100), index.generation)
+
+    assert index.get("s0") is None
+    assert index.get("s1") is not None and index.get("s2") is not None
+    assert index.nbytes == entry_bytes * 2
+
+
+def test_oversized_scope_is_not_cached():
+    index = ExactIndex(threshold=1000, max_bytes=1024)
+    index.put("big", _entry(index, 1, 100), index.generation)
+    assert index.get("big") is None
+    assert index.nbytes == 0
+
+
+def test_invalidate_releases_bytes():
+    index = ExactIndex(threshold=100, max_bytes=10 * 1024 * 1024)
+    index.put("s1", _entry(index, 1, 10), index.generation)
+    index.put("s2", _entry(index, 2, 10), index.generation)
+    index.invalidate([{"conversation_id": 1}])
+    assert index.get("s1") is None
+    assert index.nbytes == index.get("s2").nbytes
+
+
+def test_search_matches_brute_force():
+    index = ExactIndex(threshold=100, max_bytes=10 * 1024 * 1024)
+    entry = _entry(index, 1, 50)
+    query = np.random.default_rng(7).normal(size=(1, 64)).astype(np.float32)
+    rows = [row for row, _ in ExactIndex.search(entry, query, 5)[0]]
+    expected = np.argsort(-(entry.matrix @ (query[0] / np.linalg.norm(query[0]))))[:5]
+    assert rows == list(expected)
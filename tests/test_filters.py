@@ -0,0 +1,31 @@
+"""
+过滤条件解析测试：$or 条件能确定范围时只路由到相关分区
+"""
+from src.ai.rag.filters import scope_partitions, scope_tags, scope_values
+
+
+def _knowledge_base(knowledge_base_id):
+    return {"$and": [{"source_type": "knowledge_base"}, {"knowledge_base_id": {"$in": [knowledge_base_id]}}]}
+
+
+def test_scope_values_or_returns_union_when_every_branch_constrains_key():
+    where = {"$or": [{"conversation_id": 1}, {"conversation_id": {"$in": [2, 1]}}]}
+    assert scope_values(where, "conversation_id") == [1, 2]
+
+
+def test_scope_values_or_is_unknown_when_a_branch_is_unconstrained():
+    where = {"$or": [{"conversation_id": 1}, {"file_id": 3}]}
+    assert scope_values(where, "conversation_id") is None
+    assert scope_partitions(where) is None
+
+
+def test_multi_scope_or_routes_to_each_partition():
+    where = {"$or": [{"conversation_id": 5}, _knowledge_base(1), _knowledge_base(2)]}
+    assert scope_tags(where) == {("conversation_id", 5), ("knowledge_base_id", 1), ("knowledge_base_id", 2)}
+    assert scope_partitions(where) == ["conv_5", "kb_1", "kb_2"]
+
+
+def test_or_nested_in_and():
+    where = {"$and": [{"$or": [{"knowledge_base_id": 1}, {"knowledge_base_id": 2}]}, {"file_id": 3}]}
+    assert scope_values(where, "knowledge_base_id") == [1, 2]
+    assert scope_partitions(where) == ["kb_1", "kb_2"]
@@ -0,0 +1,70 @@
+"""
+词法索引测试：中日韩文字按单字 + 双字切分，过滤条件在 SQL 中完成，范围内的命中不会被范围外的结果挤掉
+"""
+from src.ai.rag.lexical_index import LexicalIndex, tokenize
+
+
+def _metadata(**fields):
+    return {"source_type": "knowledge_base", **fields}
+
+
+def test_tokenize_cjk_into_unigrams_and_bigrams():
+    assert tokenize("向量检索 HNSW_index") == ["向", "量", "检", "索", "向量", "量检", "检索", "hnsw", "index"]
+
+
+def test_bm25_ranks_documents_with_more_query_terms_first(tmp_path):
+    index = LexicalIndex(str(tmp_path / "lexical.db"))
+    index.add(
+        ["a", "b", "c"],
+        ["苹果的种植需要充足的光照", "香蕉的运输依赖冷链", "苹果种植与苹果储藏"],
+        [_metadata(knowledge_base_id=1)] * 3,
+    )
+
+    hits = index.search("苹果种植", top_k=3)
+    assert [hit.id for hit in hits] == ["c", "a"]
+    assert hits[0].score >= hits[1].score > 0
+    assert hits[0].coverage == 1.0
+
+
+def test_filtered_matches_are_not_crowded_out(tmp_path):
+    index = LexicalIndex(str(tmp_path / "lexical.db"))
+    # 同一知识库的其他文件中有大量更相关的命中，过滤字段 file_name 不是索引列
+    others = [f"o{i}" for i in range(100)]
+    index.add(others, ["缓存 缓存 缓存 淘汰"] * 100, [_metadata(knowledge_base_id=1, file_name="a.md")] * 100)
+    index.add(["target"], ["这里顺带提到缓存"], [_metadata(knowledge_base_id=1, file_name="b.md")])
+
+    where = {"$and": [{"knowledge_base_id": 1}, {"file_name": "b.md"}]}
+    assert [hit.id for hit in index.search("缓存淘汰", where=where, top_k=1)] == ["target"]
+
+
+def test_non_column_and_or_filters_are_applied_in_sql(tmp_path):
+    index = LexicalIndex(str(tmp_path / "lexical.db"))
+    index.add(
+        ["kb", "conv", "other"],
+        ["检索增强生成"] * 3,
+        [
+            _metadata(knowledge_base_id=1),
+            {"source_type": "conversation", "conversation_id": 5},
+            _metadata(knowledge_base_id=2),
+        ],
+    )
+    where = {
+        "$or": [
+            {"$and": [{"source_type": "knowledge_base"}, {"knowledge_base_id": {"$in": [1]}}]},
+            {"conversation_id": 5},
+        ]
+    }
+    assert sorted(hit.id for hit in index.search("检索", where=where, top_k=5)) == ["conv", "kb"]
+    assert [hit.id for hit in index.search("检索", where={"source_type": {"$ne": "knowledge_base"}})] == ["conv"]
+
+    index.delete_where({"$and": [{"source_type": "knowledge_base"}, {"knowledge_base_id": 2}]})
+    assert index.count() == 2
+
+
+def test_update_metadatas_moves_chunk_between_scopes(tmp_path):
+    index = LexicalIndex(str(tmp_path / "lexical.db"))
+    index.add(["a"], ["混合检索"], [_metadata(knowledge_base_id=1, file_id=3)])
+    index.update_metadatas(["a"], [_metadata(knowledge_base_id=2, file_id=3)])
+
+    assert index.search("检索", where={"knowledge_base_id": 1}) == []
+    assert [hit.id for hit in index.search("检索", where={"knowledge_base_id": 2})] == ["a"]
@@ -0,0 +1,68 @@
+"""
+本地向量存储测试：写入、检索、删除、compact 以及重新打开后数据仍然可用
+"""
+import numpy as np
+import pytest
+
+from src.ai.rag.local_vector_store import LocalVectorStore
+from src.ai.rag.vector_store import SearchRequest
+
+
+def _open(path):
+    LocalVectorStore._instance = None
+    return LocalVectorStore(str(path))
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).normal(size=(6, 16)).astype(np.float32)
+
+
+@pytest.fixture
+def store(tmp_path, vectors):
+    store = _open(tmp_path)
+    metadatas = [
+        {"source_type": "knowledge_base", "knowledge_base_id": 1, "file_id": 10 + i % 2} for i in range(4)
+    ] + [
+        {"source_type": "conversation", "conversation_id": 7, "file_id": 20} for _ in range(2)
+    ]
+    store.add_vectors(vectors, [f"doc {i}" for i in range(6)], metadatas, [f"c{i}" for i in range(6)])
+    yield store
+    LocalVectorStore._instance = None
+
+
+def _search(store, vector, where, top_k=3):
+    return store.query([SearchRequest(vector, top_k, where)])[0]
+
+
+def test_query_returns_nearest_vector_within_scope(store, vectors):
+    hits = _search(store, vectors[2], {"knowledge_base_id": 1})
+    assert hits[0].id == "c2"
+    assert hits[0].distance == pytest.approx(0.0, abs=1e-5)
+    assert all(hit.metadata["knowledge_base_id"] == 1 for hit in hits)
+
+    assert sorted(hit.id for hit in _search(store, vectors[2], {"conversation_id": 7})) == ["c4", "c5"]
+
+
+def test_delete_hides_vectors_and_compact_keeps_the_rest(store, vectors):
+    assert store.delete(["c2"])
+    assert store.delete_by_metadata({"file_id": 11})
+    assert store.count() == 3
+    assert "c2" not in [hit.id for hit in _search(store, vectors[2], {"knowledge_base_id": 1})]
+
+    store.compact()
+    assert store.count() == 3
+    assert _search(store, vectors[0], {"knowledge_base_id": 1}, top_k=1)[0].id == "c0"
+    assert sorted(store.get_metadatas({"knowledge_base_id": 1})) == ["c0"]
+
+
+def test_data_survives_reopen(store, tmp_path, vectors):
+    store.delete(["c5"])
+    reopened = _open(tmp_path)
+
+    assert reopened.count() == 5
+    assert _search(reopened, vectors[4], {"conversation_id": 7}, top_k=2)[0].id == "c4"
+    result = reopened.get_by_file_id(20)
+    assert result["ids"] == ["c4"]
+    # 向量归一化后存储（按余弦检索）
+    np.testing.assert_allclose(result["embeddings"][0], vectors[4] / np.linalg.norm(vectors[4]), rtol=1e-5)
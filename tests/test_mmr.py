@@ -0,0 +1,33 @@
+"""
+MMR 重排测试：在相关性接近时选择与已选结果不同的候选，而不是近似重复的分块
+"""
+import numpy as np
+
+from src.ai.rag.mmr import mmr_select
+
+
+def _unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_prefers_diverse_hit_over_near_duplicate():
+    relevance = np.array([0.95, 0.94, 0.80], dtype=np.float32)
+    embeddings = [_unit(1, 0, 0), _unit(1, 0.01, 0), _unit(0, 1, 0)]
+
+    assert mmr_select(relevance, embeddings, top_k=2, lambda_mult=0.7) == [0, 2]
+
+
+def test_lambda_one_keeps_relevance_order():
+    relevance = np.array([0.95, 0.94, 0.80], dtype=np.float32)
+    embeddings = [_unit(1, 0, 0), _unit(1, 0.01, 0), _unit(0, 1, 0)]
+
+    assert mmr_select(relevance, embeddings, top_k=3, lambda_mult=1.0) == [0, 1, 2]
+
+
+def test_candidates_without_embeddings_are_treated_as_dissimilar():
+    relevance = np.array([0.9, 0.85, 0.5], dtype=np.float32)
+    embeddings = [_unit(1, 0), _unit(1, 0), None]
+
+    assert mmr_select(relevance, embeddings, top_k=2, lambda_mult=0.5) == [0, 2]
+    assert mmr_select(relevance, [None, None, None], top_k=2, lambda_mult=0.5) == [0, 1]
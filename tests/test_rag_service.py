@@ -0,0 +1,95 @@
+"""
+RAG 入库测试：重复处理未变化的文件不写入向量，文件变化后删除过期分块
+"""
+import asyncio
+
+import pytest
+
+from src.ai.embedding.local import HashingEmbedding
+from src.ai.rag.chunking import FileChunker
+from src.ai.rag.local_vector_store import LocalVectorStore
+from src.ai.rag.vector_store import AsyncVectorStore, VectorWriteError
+from src.services.rag_service import RAGService
+
+
+class CountingEmbedding(HashingEmbedding):
+    """记录向量化的文本数量"""
+
+    def __init__(self):
+        super().__init__(dimension=64)
+        self.embedded = 0
+
+    async def embed_texts(self, texts):
+        self.embedded += len(texts)
+        return await super().embed_texts(texts)
+
+
+@pytest.fixture
+def service(tmp_path):
+    LocalVectorStore._instance = None
+    service = RAGService.__new__(RAGService)
+    service._chunker = FileChunker()
+    service._embedding = CountingEmbedding()
+    service._vector_store = AsyncVectorStore(LocalVectorStore(str(tmp_path / "vectors")))
+    yield service
+    LocalVectorStore._instance = None
+
+
+def _write(path, paragraphs):
+    path.write_text("\n\n".join(paragraphs), encoding="utf-8")
+    return path
+
+
+def _paragraphs(count):
+    return [f"第{i}段：关于主题 {i} 的说明，" * 20 for i in range(count)]
+
+
+def _embed(service, path):
+    return asyncio.run(service.embed_knowledge_base_file(path, file_id=11, knowledge_base_id=3, user_id=1))
+
+
+def test_reingesting_unchanged_file_writes_nothing(service, tmp_path):
+    path = _write(tmp_path / "doc.txt", _paragraphs(30))
+    first = _embed(service, path)
+    embedded = service._embedding.embedded
+    writes = []
+    original_add = service._vector_store.add_vectors
+
+    async def counting_add(*args, **kwargs):
+        writes.append(args)
+        return await original_add(*args, **kwargs)
+
+    service._vector_store.add_vectors = counting_add
+    second = _embed(service, path)
+
+    assert writes == []
+    assert service._embedding.embedded == embedded
+    assert second.vector_ids == first.vector_ids
+    assert second.skipped_chunk_count == len(first.vector_ids)
+    assert second.stale_chunk_count == 0
+
+
+def test_changed_file_deletes_stale_chunks(service, tmp_path):
+    paragraphs = _paragraphs(30)
+    first = _embed(service, _write(tmp_path / "doc.txt", paragraphs))
+
+    paragraphs[5] = "这一段的内容已经改写。" * 10
+    second = _embed(service, _write(tmp_path / "doc.txt", paragraphs[:25]))
+
+    stored = asyncio.run(service._vector_store.get_metadatas({"file_id": 11}))
+    assert sorted(stored) == sorted(second.vector_ids)
+    assert second.stale_chunk_count == len(set(first.vector_ids) - set(second.vector_ids)) > 0
+    assert asyncio.run(service._vector_store.count()) == len(second.vector_ids)
+
+
+def test_failed_stale_delete_raises(service, tmp_path):
+    paragraphs = _paragraphs(10)
+    _embed(service, _write(tmp_path / "doc.txt", paragraphs))
+
+    async def failing_delete(ids, where=None):
+        return False
+
+    service._vector_store.delete = failing_delete
+    with pytest.raises(VectorWriteError) as error:
+        _embed(service, _write(tmp_path / "doc.txt", paragraphs[:5]))
+    assert error.value.failed_ids
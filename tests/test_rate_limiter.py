@@ -0,0 +1,65 @@
+"""
+自适应限流测试：遇到 429 时成倍降速，成功后逐步恢复，速率始终在上下限之间
+"""
+import asyncio
+import time
+
+from src.ai.embedding.rate_limiter import AdaptiveRateLimiter
+
+
+def _limiter(**overrides):
+    values = dict(rate=8.0, min_rate=1.0, max_rate=10.0)
+    values.update(overrides)
+    return AdaptiveRateLimiter(**values)
+
+
+def test_throttle_halves_rate_once_per_period():
+    limiter = _limiter()
+    limiter.on_throttle()
+    assert limiter.rate == 4.0
+    # 同一时刻在途的其他请求也收到 429，不再重复降速
+    limiter.on_throttle()
+    assert limiter.rate == 4.0
+    assert limiter.stats()["throttled"] == 2
+
+
+def test_throttle_never_drops_below_min_rate():
+    limiter = _limiter(rate=1.5)
+    for _ in range(5):
+        limiter._last_decrease_at = 0.0
+        limiter.on_throttle()
+    assert limiter.rate == 1.0
+
+
+def test_success_recovers_rate_up_to_max():
+    limiter = _limiter()
+    limiter.on_throttle()
+    rates = [limiter.rate]
+    for _ in range(200):
+        limiter.on_success()
+        rates.append(limiter.rate)
+    assert rates == sorted(rates)
+    assert rates[1] > rates[0]
+    assert limiter.rate == 10.0
+
+
+def test_retry_after_blocks_acquire():
+    limiter = _limiter(rate=100.0, max_rate=100.0)
+    limiter.on_throttle(retry_after=0.2)
+
+    started = time.monotonic()
+    asyncio.run(limiter.acquire())
+    assert time.monotonic() - started >= 0.15
+
+
+def test_acquire_paces_requests_at_current_rate():
+    limiter = _limiter(rate=20.0, max_rate=20.0)
+
+    async def acquire_many(count):
+        for _ in range(count):
+            await limiter.acquire()
+
+    started = time.monotonic()
+    asyncio.run(acquire_many(6))
+    # 第一个令牌立即可用，其余 5 个按 20 次/秒发放
+    assert time.monotonic() - started >= 0.2
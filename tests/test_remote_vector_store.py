@@ -0,0 +1,111 @@
+"""
+远程向量存储测试：向量与检索结果的编解码往返、VectorWriteError 的回传、服务端的访问控制
+"""
+import asyncio
+
+import httpx
+import numpy as np
+import pytest
+
+import src.ai.rag.vector_server as vector_server
+from src.ai.rag.remote_vector_store import (
+    API_KEY_HEADER,
+    RemoteVectorStore,
+    RemoteVectorStoreError,
+    decode_array,
+    decode_requests,
+    encode_array,
+    encode_requests,
+    hit_from_dict,
+    hit_to_dict,
+)
+from src.ai.rag.vector_store import SearchHit, SearchRequest, VectorWriteError
+from src.core.config.database import vector_store_settings
+
+
+def test_array_round_trip():
+    array = np.random.default_rng(0).normal(size=(3, 5)).astype(np.float32)
+    decoded = decode_array(encode_array(array))
+    np.testing.assert_array_equal(decoded, array)
+    assert decoded.dtype == np.float32
+    assert decode_array(encode_array(None)) is None
+
+
+def test_request_and_hit_round_trip():
+    vector = np.arange(4, dtype=np.float32)
+    [request] = decode_requests(encode_requests([SearchRequest(vector, 3, {"conversation_id": 1}, True)]))
+    np.testing.assert_array_equal(request.query_vector, vector)
+    assert (request.top_k, request.where, request.include_embeddings) == (3, {"conversation_id": 1}, True)
+
+    hit = SearchHit("a", "doc", 0.25, {"file_id": 1}, vector)
+    decoded = hit_from_dict(hit_to_dict(hit))
+    assert (decoded.id, decoded.document, decoded.distance, decoded.metadata) == ("a", "doc", 0.25, {"file_id": 1})
+    np.testing.assert_array_equal(decoded.embedding, vector)
+
+
+class FakeStore:
+    """只实现测试用到的方法"""
+
+    def __init__(self):
+        self.added = None
+
+    async def add_vectors(self, vectors, documents, metadatas=None, ids=None):
+        self.added = vectors
+        raise VectorWriteError(written_ids=["a"], failed_ids=["b"], errors=[RuntimeError("/data/secret 不可写")])
+
+    async def count(self):
+        return 3
+
+    async def get_metadatas(self, where):
+        raise RuntimeError("/data/secret 不可读")
+
+
+@pytest.fixture
+def remote(monkeypatch):
+    monkeypatch.setattr(vector_server, "store", FakeStore())
+    monkeypatch.setattr(vector_store_settings, "api_key", "secret")
+
+    def connect(api_key="secret", client_host="127.0.0.1"):
+        remote = RemoteVectorStore("http://vector-store", 4, 5, api_key=api_key)
+        remote._client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=vector_server.app, client=(client_host, 1234)),
+            base_url="http://vector-store",
+            headers={API_KEY_HEADER: api_key},
+        )
+        return remote
+
+    return connect
+
+
+def test_vector_write_error_is_passed_back(remote):
+    vectors = np.ones((2, 4), dtype=np.float32)
+    with pytest.raises(VectorWriteError) as error:
+        asyncio.run(remote().add_vectors(vectors, ["a", "b"], ids=["a", "b"]))
+    assert (error.value.written_ids, error.value.failed_ids) == (["a"], ["b"])
+    assert "secret" not in str(error.value)
+    np.testing.assert_array_equal(vector_server.store.added, vectors)
+
+
+def test_internal_errors_are_not_returned_to_caller(remote):
+    with pytest.raises(RemoteVectorStoreError) as error:
+        asyncio.run(remote().get_metadatas({"file_id": 1}))
+    assert "secret" not in str(error.value)
+    assert "500" in str(error.value)
+
+
+def test_requests_require_the_shared_key(remote):
+    assert asyncio.run(remote().count()) == 3
+    with pytest.raises(RemoteVectorStoreError, match="401"):
+        asyncio.run(remote(api_key="wrong").count())
+
+
+def test_methods_outside_the_allow_list_are_rejected(remote):
+    with pytest.raises(RemoteVectorStoreError, match="404"):
+        asyncio.run(remote()._call("_purge_scope", key="knowledge_base_id", value=1))
+
+
+def test_without_key_only_local_requests_are_accepted(remote, monkeypatch):
+    monkeypatch.setattr(vector_store_settings, "api_key", "")
+    assert asyncio.run(remote(api_key="").count()) == 3
+    with pytest.raises(RemoteVectorStoreError, match="403"):
+        asyncio.run(remote(api_key="", client_host="10.0.0.5").count())
@@ -0,0 +1,89 @@
+"""
+检索器测试：倒数排名融合的排序、范围配额保持输入顺序、多范围词法检索批量执行
+"""
+import asyncio
+
+from src.ai.embedding.local import HashingEmbedding
+from src.ai.rag.lexical_index import LexicalHit
+from src.ai.rag.retriever import DocumentRetriever, RetrievalResult, knowledge_base_where
+from src.ai.rag.vector_store import SearchHit
+
+
+def _vector_hit(chunk_id, distance):
+    return SearchHit(chunk_id, chunk_id, distance, {"conversation_id": 1})
+
+
+def _lexical_hit(chunk_id, score):
+    return LexicalHit(chunk_id, chunk_id, {"conversation_id": 1}, score, 1.0)
+
+
+def test_rrf_prefers_hits_found_by_both_retrievers():
+    vector_hits = [_vector_hit("a", 0.1), _vector_hit("b", 0.2), _vector_hit("c", 0.3)]
+    lexical_hits = [_lexical_hit("c", 9.0), _lexical_hit("d", 5.0), _lexical_hit("a", 1.0)]
+
+    fused = DocumentRetriever._fuse(vector_hits, lexical_hits, top_k=4)
+
+    # a: 1/61 + 1/63，c: 1/63 + 1/61 并列；b 与 d 只出现在一路中
+    assert [result.metadata for result in fused] == [{"conversation_id": 1}] * 4
+    assert {fused[0].content, fused[1].content} == {"a", "c"}
+    assert [result.content for result in fused[2:]] == ["b", "d"]
+    assert fused[0].score == fused[1].score
+    assert fused[0].vector_score is not None and fused[0].lexical_score is not None
+    assert fused[3].vector_score is None
+
+
+def test_rrf_score_is_one_when_first_in_both_lists():
+    fused = DocumentRetriever._fuse([_vector_hit("a", 0.0)], [_lexical_hit("a", 3.0)], top_k=1)
+    assert abs(fused[0].score - 1.0) < 1e-9
+    assert fused[0].vector_score == 1.0
+
+
+def _result(content, score, scope):
+    return RetrievalResult(content, score, {"source_type": "knowledge_base", "knowledge_base_id": scope})
+
+
+def test_quotas_keep_incoming_order():
+    # 输入为 MMR 选取顺序，分数并非单调递减
+    results = [_result("a", 0.5, 1), _result("b", 0.9, 1), _result("c", 0.2, 2), _result("d", 0.8, 1)]
+    scopes = [("knowledge_base_id", 1), ("knowledge_base_id", 2)]
+
+    selected = DocumentRetriever._apply_quotas(results, scopes, top_k=3, min_per_scope=1, max_per_scope=2)
+    assert [result.content for result in selected] == ["a", "b", "c"]
+
+
+class RecordingStore:
+    """记录调用的向量存储替身：每个范围返回一个分块"""
+
+    def __init__(self):
+        self.calls = []
+
+    @staticmethod
+    def _scope(where):
+        return where["$and"][1]["knowledge_base_id"]["$in"][0]
+
+    async def lexical_query(self, query, where=None, top_k=5):
+        self.calls.append(("lexical_query", where))
+        return []
+
+    async def lexical_query_many(self, query, wheres, top_k=5):
+        self.calls.append(("lexical_query_many", wheres))
+        return [
+            [LexicalHit(f"kb{self._scope(w)}", "doc", {"knowledge_base_id": self._scope(w)}, 10.0 / self._scope(w), 0.5)]
+            for w in wheres
+        ]
+
+    async def query(self, requests):
+        self.calls.append(("query", [request.where for request in requests]))
+        return [[] for _ in requests]
+
+
+def test_multi_scope_hybrid_search_batches_lexical_queries():
+    store = RecordingStore()
+    retriever = DocumentRetriever(HashingEmbedding(dimension=16), store)
+
+    results = asyncio.run(retriever.retrieve_by_scopes("问题", knowledge_base_ids=[1, 2, 3], top_k=5))
+
+    assert [name for name, _ in store.calls] == ["lexical_query_many", "query"]
+    assert store.calls[0][1] == [knowledge_base_where([i]) for i in (1, 2, 3)]
+    assert [result.content for result in results] == ["doc"] * 3
+    assert [result.metadata["knowledge_base_id"] for result in results] == [1, 2, 3]
@@ -0,0 +1,31 @@
+"""
+数据库结构升级测试：已有的表缺少新增列时补上，重复执行不做任何操作
+"""
+from sqlalchemy import create_engine, inspect, text
+
+from src.db.schema import add_missing_columns
+
+
+def _columns(engine, table):
+    return {column["name"] for column in inspect(engine).get_columns(table)}
+
+
+def test_adds_missing_column_to_existing_table(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    with engine.begin() as conn:
+        # 新增 retrieval_settings 之前的 knowledge_base 表
+        conn.execute(text("CREATE TABLE knowledge_base (id INTEGER PRIMARY KEY, name VARCHAR(255) NOT NULL)"))
+        conn.execute(text("INSERT INTO knowledge_base (id, name) VALUES (1, 'kb')"))
+
+    with engine.begin() as conn:
+        assert add_missing_columns(conn) == ["knowledge_base.retrieval_settings"]
+    with engine.begin() as conn:
+        assert add_missing_columns(conn) == []
+        assert conn.execute(text("SELECT retrieval_settings FROM knowledge_base")).scalar() is None
+    assert "retrieval_settings" in _columns(engine, "knowledge_base")
+
+
+def test_skips_tables_that_do_not_exist(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    with engine.begin() as conn:
+        assert add_missing_columns(conn) == []